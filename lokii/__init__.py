@@ -1,4 +1,6 @@
 from lokii.main import Lokii
+from lokii.reference import ref
+from lokii.lookup_index import lookup
 
 __all__ = Lokii.__name__
 __version__ = "1.1.6"
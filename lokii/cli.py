@@ -1,10 +1,13 @@
 import argparse
 import logging
 import sys
+from datetime import datetime
 
 from lokii import Lokii
 from lokii.logger.context import LoggingContext
 from lokii.config import CONFIG
+from lokii.storage.dataset_cache import DatasetCache
+from lokii.util.byte_size import format_bytes
 
 LOKII_ASCII = r"""
 ▄▄▄▄▄   ▄▄▄▄▄▄▄▄▄▄▄▄▄ ▄▄▄▄▄▄▄▄▄▄▄
@@ -85,6 +88,53 @@ class Command:
             help="purge cache database after generation",
         )
 
+        parser.add_argument(
+            "-r",
+            "--resume",
+            action="store_true",
+            help="resume interrupted node generation from the last completed batch",
+        )
+
+        parser.add_argument(
+            "-s",
+            "--seed",
+            action="store",
+            metavar="SEED",
+            type=int,
+            help="seed random generators of each chunk to generate the same data on "
+            "every run, implies --ordered",
+        )
+
+        parser.add_argument(
+            "-o",
+            "--ordered",
+            action="store_true",
+            help="merge generated chunks in source order regardless of worker count",
+        )
+
+        subparsers = parser.add_subparsers(dest="command", metavar="COMMAND")
+        cache_parser = subparsers.add_parser(
+            "cache",
+            help="inspect and prune the dataset cache shared between projects",
+            description="inspect and prune the dataset cache at %s"
+            % CONFIG.cache.dir_path,
+        )
+        cache_parser.add_argument(
+            "action",
+            nargs="?",
+            choices=["list", "prune", "clear"],
+            default="list",
+            help="list cached datasets, prune least recently used datasets "
+            "or clear all datasets (default: list)",
+        )
+        cache_parser.add_argument(
+            "--max-size",
+            action="store",
+            metavar="BYTES",
+            type=int,
+            help="size limit used when pruning (default: %d)" % CONFIG.cache.max_size,
+        )
+
         arguments = parser.parse_args(self.argv[1:])
 
         verbose = logging.INFO
@@ -95,13 +145,63 @@ class Command:
 
         with LoggingContext(level=verbose, filename=arguments.log_file):
             try:
+                if arguments.command == "cache":
+                    exec_cache(arguments.action, arguments.max_size)
+                    return
                 print(LOKII_ASCII)
-                _lokii = Lokii(arguments.source_folder)
+                _lokii = Lokii(
+                    arguments.source_folder,
+                    arguments.resume,
+                    arguments.seed,
+                    arguments.ordered,
+                )
                 _lokii.generate(arguments.export, arguments.purge)
             except Exception as err:
                 logging.critical(str(err), exc_info=True)
 
 
+def exec_cache(action: str, max_size: int = None) -> None:
+    """
+    Lists, prunes or clears cached datasets.
+
+    :param action: `list`, `prune` or `clear`
+    :param max_size: size limit used when pruning, configured max size by default
+    """
+    cache = DatasetCache(max_size=max_size)
+    if action == "prune":
+        removed = cache.evict()
+    elif action == "clear":
+        removed = cache.clear()
+    else:
+        entries = cache.entries()[::-1]
+        for e in entries:
+            used = datetime.fromtimestamp(e["used"]).strftime("%Y-%m-%d %H:%M:%S")
+            print(
+                "%s  %-24s %-12s %10s  %s"
+                % (
+                    e["key"][:12],
+                    e["name"],
+                    e["version"][:12],
+                    format_bytes(e["size"]),
+                    used,
+                )
+            )
+        print(
+            "%d datasets, %s of %s in %s"
+            % (
+                len(entries),
+                format_bytes(sum(e["size"] for e in entries)),
+                format_bytes(cache.max_size),
+                cache.dir_path,
+            )
+        )
+        return
+    print(
+        "%d datasets removed, %s freed"
+        % (len(removed), format_bytes(sum(e["size"] for e in removed)))
+    )
+
+
 def exec_cmd(argv=None) -> None:
     command = Command(argv)
     command.execute()
@@ -0,0 +1,211 @@
+from typing import Callable, Any, Sequence
+
+import numpy as np
+
+
+class ColumnContext:
+    """
+    Chunk information passed to column generators.
+
+    :var size: number of rows in the chunk
+    :type size: int
+    :var index: stable row ids of source rows in the chunk
+    :type index: np.ndarray
+    :var id: row ids starting from 1
+    :type id: np.ndarray
+    :var params: source query columns
+    :type params: dict[str, np.ndarray]
+    :var rng: random number generator of the chunk
+    :type rng: np.random.Generator
+    """
+
+    def __init__(
+        self,
+        size: int,
+        index: np.ndarray,
+        params: dict[str, np.ndarray] = None,
+        rng: np.random.Generator = None,
+    ):
+        self.size = size
+        self.index = index
+        self.id = index + 1
+        self.params = params or {}
+        self.rng = rng or np.random.default_rng()
+
+
+ColumnFunc = Callable[[ColumnContext], Any]
+
+
+def generate(columns: dict[str, ColumnFunc], ctx: ColumnContext) -> dict[str, Any]:
+    """
+    Generates declared columns for given chunk.
+
+    :param columns: column generators by column name
+    :param ctx: chunk information
+    :return: generated values by column name
+    """
+    data = {}
+    for name, func in columns.items():
+        values = func(ctx)
+        if np.ndim(values) == 0:
+            values = np.full(ctx.size, values)
+        if len(values) != ctx.size:
+            raise ValueError(
+                "Column `%s` generated %d values for %d rows"
+                % (name, len(values), ctx.size)
+            )
+        data[name] = values
+    return data
+
+
+def sequence(start: int = 1, step: int = 1) -> ColumnFunc:
+    """
+    :param start: value of the first source row
+    :param step: difference between consecutive source rows
+    :return: generator of values derived from stable row ids
+    """
+    return lambda ctx: start + ctx.index * step
+
+
+def integers(low: int, high: int) -> ColumnFunc:
+    """
+    :param low: lowest value, inclusive
+    :param high: highest value, inclusive
+    :return: generator of uniformly distributed integers
+    """
+    return lambda ctx: ctx.rng.integers(low, high, ctx.size, endpoint=True)
+
+
+def uniform(low: float, high: float, decimals: int = None) -> ColumnFunc:
+    """
+    :param low: lowest value, inclusive
+    :param high: highest value, exclusive
+    :param decimals: number of decimals to round values, `None` to keep all
+    :return: generator of uniformly distributed floats
+    """
+
+    def gen(ctx: ColumnContext) -> np.ndarray:
+        values = ctx.rng.uniform(low, high, ctx.size)
+        return values if decimals is None else values.round(decimals)
+
+    return gen
+
+
+def normal(mean: float, std: float, decimals: int = None) -> ColumnFunc:
+    """
+    :param mean: mean of the distribution
+    :param std: standard deviation of the distribution
+    :param decimals: number of decimals to round values, `None` to keep all
+    :return: generator of normally distributed floats
+    """
+
+    def gen(ctx: ColumnContext) -> np.ndarray:
+        values = ctx.rng.normal(mean, std, ctx.size)
+        return values if decimals is None else values.round(decimals)
+
+    return gen
+
+
+def zipf(a: float, high: int = None) -> ColumnFunc:
+    """
+    :param a: distribution parameter, must be greater than 1
+    :param high: highest value, larger values are drawn again if given
+    :return: generator of zipf distributed positive integers
+    """
+
+    def gen(ctx: ColumnContext) -> np.ndarray:
+        values = ctx.rng.zipf(a, ctx.size)
+        if high is not None:
+            # redraw out of range values, tail of the distribution is small
+            mask = values > high
+            while mask.any():
+                values[mask] = ctx.rng.zipf(a, int(mask.sum()))
+                mask = values > high
+        return values
+
+    return gen
+
+
+def choice(values: Sequence, weights: Sequence[float] = None) -> ColumnFunc:
+    """
+    :param values: values to choose from
+    :param weights: relative weight of each value, uniform if not given
+    :return: generator of randomly chosen values
+    """
+    values = np.asarray(values)
+    p = None
+    if weights is not None:
+        p = np.asarray(weights, dtype=float)
+        p = p / p.sum()
+    return lambda ctx: values[ctx.rng.choice(len(values), ctx.size, p=p)]
+
+
+def dates(start: str, end: str, unit: str = "D") -> ColumnFunc:
+    """
+    :param start: first date of the range, inclusive
+    :param end: last date of the range, inclusive
+    :param unit: resolution of generated values, `D` for dates and `s` for timestamps
+    :return: generator of uniformly distributed dates in range
+    """
+    low = np.datetime64(start, unit).astype(np.int64)
+    high = np.datetime64(end, unit).astype(np.int64)
+
+    def gen(ctx: ColumnContext) -> np.ndarray:
+        values = ctx.rng.integers(low, high, ctx.size, endpoint=True)
+        return values.astype("datetime64[%s]" % unit)
+
+    return gen
+
+
+def date_sequence(start: str, step: int = 1, unit: str = "D") -> ColumnFunc:
+    """
+    :param start: date of the first source row
+    :param step: number of units between consecutive source rows
+    :param unit: resolution of generated values, `D` for dates and `s` for timestamps
+    :return: generator of dates derived from stable row ids
+    """
+    first = np.datetime64(start, unit)
+    return lambda ctx: first + (ctx.index * step).astype("timedelta64[%s]" % unit)
+
+
+def template(fmt: str) -> ColumnFunc:
+    """
+    Formats strings with `str.format` syntax. Available fields are `index`, `id` and
+    source query columns.
+
+    :param fmt: format string, e.g. `EMP-{id:05d}`
+    :return: generator of formatted strings
+    """
+
+    def gen(ctx: ColumnContext) -> list[str]:
+        fields = {"index": ctx.index, "id": ctx.id, **ctx.params}
+        names = list(fields.keys())
+        # formatting runs in a tight loop over plain python values
+        rows = zip(*(np.asarray(fields[n]).tolist() for n in names))
+        return [fmt.format(**dict(zip(names, row))) for row in rows]
+
+    return gen
+
+
+# hex digit ranges of canonical uuid parts that are separated by dashes
+_UUID_PARTS = [(0, 8), (8, 12), (12, 16), (16, 20), (20, 32)]
+
+
+def uuid4() -> ColumnFunc:
+    """
+    :return: generator of random version 4 uuid strings
+    """
+
+    def gen(ctx: ColumnContext) -> np.ndarray:
+        raw = ctx.rng.integers(0, 256, (ctx.size, 16), dtype=np.uint8)
+        # set version and variant bits
+        raw[:, 6] = (raw[:, 6] & 0x0F) | 0x40
+        raw[:, 8] = (raw[:, 8] & 0x3F) | 0x80
+        hexed = np.frombuffer(raw.tobytes().hex().encode(), dtype=np.uint8)
+        hexed = hexed.reshape(ctx.size, 32)
+        out = np.full((ctx.size, 36), ord("-"), dtype=np.uint8)
+        for i, (start, end) in enumerate(_UUID_PARTS):
+            out[:, start + i : end + i] = hexed[:, start:end]
+        return out.view("S36").ravel().astype(str)
+
+    return gen
@@ -5,8 +5,33 @@ import lokii
 TEMP_DIR_PATH = environ.get("LOKII__TEMP_DIR_PATH", ".temp")
 # duckdb database that stores generated data in relational tables
 TEMP_DB_FILE = environ.get("LOKII__TEMP_DB_FILE", "lokii.duckdb")
+# parse cache file that stores parsed node definitions of unchanged node files
+TEMP_PARSE_CACHE_FILE = environ.get("LOKII__TEMP_PARSE_CACHE_FILE", "parse_cache.json")
+# comma separated environment variables that node modules read while they are loaded,
+# parse cache is dropped if any of them or `LOKII__` variables change
+TEMP_PARSE_CACHE_ENV = environ.get("LOKII__TEMP_PARSE_CACHE_ENV", "")
+# directory of exported parent columns that are sampled by node references
+TEMP_REF_DIR = environ.get("LOKII__TEMP_REF_DIR", "refs")
 # name of the temp data file that contains generated runtime files
 TEMP_DATA_DIR = environ.get("LOKII__TEMP_DATA_DIR", "data")
+# file format of generated temp batches: `parquet`, `arrow` or `json`
+TEMP_FORMAT = environ.get("LOKII__TEMP_FORMAT", "parquet")
+# compression codec of generated temp batches, `none` disables compression
+TEMP_COMPRESSION = environ.get("LOKII__TEMP_COMPRESSION", "zstd")
+
+# directory of the content addressed dataset cache that is shared between projects
+CACHE_DIR_PATH = environ.get(
+    "LOKII__CACHE_DIR_PATH", path.join(path.expanduser("~"), ".cache", "lokii")
+)
+# maximum total size of cached datasets in bytes, least recently used ones are evicted
+CACHE_MAX_SIZE = environ.get("LOKII__CACHE_MAX_SIZE", 2 * 1024**3)
+# restore unchanged nodes from dataset cache and store generated nodes in it, disabled by
+# default since every generated node is written again outside the project
+CACHE_ENABLED = environ.get("LOKII__CACHE_ENABLED", "false")
+# directory of pre-generated value pools, `pools` folder of cache directory by default
+POOL_DIR_PATH = environ.get("LOKII__POOL_DIR_PATH", None)
+# default number of pre-generated values in a value pool
+POOL_SIZE = environ.get("LOKII__POOL_SIZE", 10000)
 
 # file extension to look for when finding generation node files
 GEN_NODE_EXT = environ.get("LOKII__GEN_NODE_EXT", ".node.py")
@@ -14,11 +39,24 @@ GEN_NODE_EXT = environ.get("LOKII__GEN_NODE_EXT", ".node.py")
 GEN_GROUP_EXT = environ.get("LOKII__GEN_GROUP_EXT", ".group.py")
 # -
 GEN_CONCURRENCY = environ.get("LOKII__GEN_CONCURRENCY", cpu_count())
+# maximum number of independent nodes that are generated at the same time
+GEN_NODE_CONCURRENCY = environ.get("LOKII__GEN_NODE_CONCURRENCY", cpu_count())
 # -
 GEN_BATCH_SIZE = environ.get("LOKII__GEN_BATCH_SIZE", 100000)
 # -
 GEN_CHUNK_SIZE = environ.get("LOKII__GEN_CHUNK_SIZE", 200)
-
+# maximum number of batches waiting to be generated or persisted in node pipeline
+GEN_QUEUE_DEPTH = environ.get("LOKII__GEN_QUEUE_DEPTH", 2)
+# seed of the run, random generators of each chunk are seeded from it if it is set
+GEN_SEED = environ.get("LOKII__GEN_SEED")
+# merges chunks in source order instead of completion order, enabled if seed is set
+GEN_ORDERED = environ.get("LOKII__GEN_ORDERED", "false")
+
+# ingestion mode of generated batches: `memory` appends batches directly to the database,
+# `file` writes batches to temp files and loads them after node generation completed
+DATA_INGEST = environ.get("LOKII__DATA_INGEST", "memory")
+# minimum free memory ratio, batches are written to temp files when memory drops under it
+DATA_MIN_FREE_MEMORY = environ.get("LOKII__DATA_MIN_FREE_MEMORY", 0.1)
 # -
 DATA_DISABLE_OPTIMIZERS = environ.get("LOKII__DATA_DISABLE_OPTIMIZERS", "true")
 
@@ -41,6 +79,56 @@ class __Config:
         def data_path(self) -> str:
             return path.join(TEMP_DIR_PATH, TEMP_DATA_DIR)
 
+        @property
+        def parse_cache_path(self) -> str:
+            return path.join(TEMP_DIR_PATH, TEMP_PARSE_CACHE_FILE)
+
+        @property
+        def parse_cache_env(self) -> list[str]:
+            return [e.strip() for e in TEMP_PARSE_CACHE_ENV.split(",") if e.strip()]
+
+        @property
+        def ref_path(self) -> str:
+            return path.join(TEMP_DIR_PATH, TEMP_REF_DIR)
+
+        @property
+        def format(self) -> str:
+            return TEMP_FORMAT
+
+        @property
+        def compression(self) -> str or None:
+            return None if TEMP_COMPRESSION == "none" else TEMP_COMPRESSION
+
+    class __CacheConfig:
+        """
+        Global configuration for storing dataset cache information.
+        """
+
+        @property
+        def dir_path(self) -> str:
+            return CACHE_DIR_PATH
+
+        @property
+        def max_size(self) -> int:
+            return int(CACHE_MAX_SIZE)
+
+        @property
+        def enabled(self) -> bool:
+            return CACHE_ENABLED == "true"
+
+    class __PoolConfig:
+        """
+        Global configuration for pre-generated value pools.
+        """
+
+        @property
+        def dir_path(self) -> str:
+            return POOL_DIR_PATH or path.join(CACHE_DIR_PATH, "pools")
+
+        @property
+        def size(self) -> int:
+            return int(POOL_SIZE)
+
     class __GenConfig:
         """
         Global configuration for storing generation information.
@@ -58,6 +146,10 @@ class __Config:
         def concurrency(self) -> int:
             return int(GEN_CONCURRENCY)
 
+        @property
+        def node_concurrency(self) -> int:
+            return int(GEN_NODE_CONCURRENCY)
+
         @property
         def batch_size(self) -> int:
             return int(GEN_BATCH_SIZE)
@@ -66,6 +158,18 @@ class __Config:
         def chunk_size(self) -> int:
             return int(GEN_CHUNK_SIZE)
 
+        @property
+        def queue_depth(self) -> int:
+            return int(GEN_QUEUE_DEPTH)
+
+        @property
+        def seed(self) -> int or None:
+            return None if GEN_SEED is None else int(GEN_SEED)
+
+        @property
+        def ordered(self) -> bool:
+            return GEN_ORDERED == "true" or GEN_SEED is not None
+
     class __DataConfig:
         """
         Global configuration for storing data query information.
@@ -77,6 +181,14 @@ class __Config:
             # https://github.com/duckdb/duckdb/issues/5880#issuecomment-1523613623
             return DATA_DISABLE_OPTIMIZERS == "true"
 
+        @property
+        def ingest(self) -> str:
+            return DATA_INGEST
+
+        @property
+        def min_free_memory(self) -> float:
+            return float(DATA_MIN_FREE_MEMORY)
+
     @property
     def version(self):
         return lokii.__version__
@@ -85,6 +197,14 @@ class __Config:
     def temp(self):
         return self.__TempConfig()
 
+    @property
+    def cache(self):
+        return self.__CacheConfig()
+
+    @property
+    def pool(self):
+        return self.__PoolConfig()
+
     @property
     def gen(self):
         return self.__GenConfig()
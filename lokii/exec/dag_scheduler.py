@@ -0,0 +1,119 @@
+import heapq
+import logging
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from typing import Callable, Any
+
+from lokii.config import CONFIG
+
+logger = logging.getLogger("lokii.dag_scheduler")
+
+
+class DagScheduler:
+    """
+    Runs nodes of a dependency graph concurrently. A node is started as soon as all of its
+    dependencies are completed, so independent branches of the graph progress together and
+    the total run time approaches the critical path instead of the sum of node times.
+
+    :var deps: dependencies of each node in the graph
+    :type deps: dict[str, set[str]]
+    :var concurrency: maximum number of nodes that run at the same time
+    :type concurrency: int
+    :var priority: longest remaining critical path cost of each node
+    :type priority: dict[str, float]
+    """
+
+    def __init__(
+        self,
+        nodes: list[(str, list[str])],
+        concurrency: int = None,
+        costs: dict[str, float] = None,
+    ):
+        """
+        :param nodes: list of node names and their direct dependencies
+        :param concurrency: maximum number of nodes that run at the same time
+        :param costs: estimated cost of each node, nodes without cost are started in
+        definition order
+        """
+        self.deps = {node: set(deps) for node, deps in nodes}
+        self.concurrency = concurrency or CONFIG.gen.node_concurrency
+        self.dependents = {node: [] for node in self.deps}
+        for node, deps in self.deps.items():
+            for dep in deps:
+                self.dependents.setdefault(dep, []).append(node)
+        self.priority = self.critical_paths(costs or {})
+
+    def critical_paths(self, costs: dict[str, float]) -> dict[str, float]:
+        """
+        Computes cost of the longest path from each node to the end of the graph. Ready
+        nodes with longer remaining paths are started first, so slow chains are not
+        delayed by cheap leaves.
+
+        :param costs: estimated cost of each node
+        :return: critical path cost of each node
+        """
+        # process nodes from leaves to roots
+        remaining = {node: len(self.dependents[node]) for node in self.deps}
+        stack = [node for node, count in remaining.items() if count == 0]
+        priority = {}
+        while stack:
+            node = stack.pop()
+            tail = [priority[d] for d in self.dependents[node]]
+            priority[node] = costs.get(node, 0.0) + max(tail, default=0.0)
+            for dep in self.deps[node] & remaining.keys():
+                remaining[dep] -= 1
+                if remaining[dep] == 0:
+                    stack.append(dep)
+        return priority
+
+    def run(self, func: Callable[[str], Any]) -> dict[str, Any]:
+        """
+        Calls given function for every node after all of its dependencies are completed.
+        If a node fails, no new nodes are started and the first error is raised after
+        running nodes are completed.
+
+        :param func: function that receives the node name and processes the node
+        :return: function results for each node
+        """
+        results = {}
+        order = {node: i for i, node in enumerate(self.deps)}
+        waiting = {node: len(deps) for node, deps in self.deps.items()}
+        # ready nodes ordered by longest critical path, then definition order
+        ready = [
+            (-self.priority.get(node, 0.0), order[node], node)
+            for node, count in waiting.items()
+            if count == 0
+        ]
+        heapq.heapify(ready)
+        running = {}
+        error = None
+
+        with ThreadPoolExecutor(self.concurrency, "lokii-node") as executor:
+            while ready or running:
+                while error is None and ready and len(running) < self.concurrency:
+                    _, _, name = heapq.heappop(ready)
+                    running[executor.submit(func, name)] = name
+                    logger.debug("Node `%s` started" % name)
+                if not running:
+                    break
+
+                done, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in done:
+                    name = running.pop(future)
+                    try:
+                        results[name] = future.result()
+                    except Exception as err:
+                        error = error or err
+                        continue
+                    for dependent in self.dependents[name]:
+                        waiting[dependent] -= 1
+                        if waiting[dependent] == 0:
+                            priority = -self.priority.get(dependent, 0.0)
+                            item = (priority, order[dependent], dependent)
+                            heapq.heappush(ready, item)
+
+        if error is not None:
+            raise error
+        pending = [node for node in self.deps if node not in results]
+        if pending:
+            raise AssertionError("Found cyclic dependencies!\n%s" % pending)
+        return results
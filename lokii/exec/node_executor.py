@@ -1,72 +1,545 @@
-import math
+import hashlib
+import logging
+import os
+import threading
+import uuid
 from functools import partial
-from typing import Callable
+from types import ModuleType
+from typing import Any, Callable, Iterator, Union
 
-from pathos.pools import ProcessPool
+import numpy as np
+import pyarrow as pa
 
+from lokii.columns import ColumnContext, ColumnFunc
+from lokii.columns import generate as generate_columns
+from lokii import lookup_index, reference
 from lokii.config import CONFIG
+from lokii.exec.pipeline import prefetch, BackgroundWriter
+from lokii.exec.worker_pool import WorkerPool
 from lokii.model.node_module import GenNodeModule
 from lokii.logger.progress import ProgressLogger
-from lokii.storage.data_storage import DataStorage
+from lokii.storage.data_storage import DataStorage, BatchCheckpoint
+from lokii.storage.data_storage import SOURCE_INDEX, SOURCE_TABLE
 from lokii.storage.temp_storage import TempStorage
+from lokii.util.arrow_table import to_table, as_table, merge_tables
+from lokii.util.byte_size import format_bytes
+from lokii.util.memory_monitor import memory_pressure
+from lokii.util.module_file_loader import ModuleFileLoader
+from lokii.util.perf_timer_context import PerfTimerContext
+from lokii.util.seed import derive_seed, seed_all
 
+ChunkOutput = tuple[int, Union[pa.Table, str, None], float]
+# multi output nodes return generated item count, items and elapsed time of each output
+ChunkResult = tuple[int, int, Union[pa.Table, str, None, dict[str, ChunkOutput]], float]
 
-def _exec_chunk(func: Callable, args: list[dict]):
-    return [func(arg) for arg in args]
+# node modules loaded in the current worker process, keyed by file path and code version
+_worker_modules = {}
+# locks of shared files, sibling nodes running in concurrent threads build them once
+_shared_locks = {}
+_shared_locks_guard = threading.Lock()
+
+
+def _shared_lock(file_path: str) -> threading.Lock:
+    """
+    :param file_path: path of the shared file
+    :return: lock that guards building the shared file
+    """
+    with _shared_locks_guard:
+        return _shared_locks.setdefault(file_path, threading.Lock())
+
+
+def _load_node(path: str, version: str) -> ModuleType:
+    """
+    Loads node module in the current worker process only once and calls its `init`
+    function for expensive one time setup.
+
+    :param path: file path of the node module
+    :param version: code version of the node module
+    :return: loaded node module
+    """
+    key = (path, version)
+    if key not in _worker_modules:
+        loader = ModuleFileLoader(path)
+        loader.load()
+        if hasattr(loader.module, "init"):
+            loader.module.init()
+        _worker_modules[key] = loader.module
+    return _worker_modules[key]
+
+
+def _collect(result: Any, row: int, items: list[dict], rows: list[int]) -> None:
+    """
+    Collects items generated for a source row. Null items are removed and a row may
+    also generate a list of items.
+
+    :param result: generated item, iterable of items or `None`
+    :param row: position of the source row in chunk
+    :param items: collected items
+    :param rows: source row positions of collected items
+    """
+    if result is None:
+        return
+    if isinstance(result, dict):
+        items.append(result)
+        rows.append(row)
+        return
+    if isinstance(result, (str, bytes)) or not hasattr(result, "__iter__"):
+        raise TypeError(
+            "`item` must return a dict, an iterable of dicts or None, got %s"
+            % type(result).__name__
+        )
+    for item in result:
+        if item is not None:
+            items.append(item)
+            rows.append(row)
+
+
+def _tagged(result: dict or None, outputs: list[str]) -> dict:
+    """
+    :param result: generated values keyed by output table
+    :param outputs: declared output tables of the node
+    :return: generated values of each output table
+    """
+    result = result or {}
+    unknown = [o for o in result if o not in outputs]
+    if len(unknown) > 0:
+        raise KeyError("Output `%s` is not declared in `outputs`" % unknown[0])
+    return {o: result.get(o) for o in outputs}
+
+
+def _gen_chunk(
+    func: Callable or None,
+    vectorized: bool,
+    chunk: pa.RecordBatch,
+    columns: dict[str, ColumnFunc] = None,
+    outputs: list[str] = None,
+    rng: np.random.Generator = None,
+) -> pa.Table or dict[str, pa.Table]:
+    index = chunk.column(SOURCE_INDEX)
+    names = [n for n in chunk.schema.names if n != SOURCE_INDEX]
+    np_index = index.to_numpy(zero_copy_only=False)
+    np_params = {}
+    if vectorized or columns:
+        np_params = {n: chunk.column(n).to_numpy(zero_copy_only=False) for n in names}
+
+    # generated items and source rows they belong to if some rows are dropped
+    items, rows = None, None
+    if func is not None and vectorized:
+        batch = {
+            "size": chunk.num_rows,
+            "index": np_index,
+            "id": np_index + 1,
+            "params": np_params,
+        }
+        if outputs:
+            tagged = _tagged(func(batch), outputs)
+            return {
+                o: pa.table({}) if data is None else as_table(data)
+                for o, data in tagged.items()
+            }
+        items = as_table(func(batch))
+    elif func is not None:
+        params = pa.table({n: chunk.column(n) for n in names}).to_pylist()
+        params = params if len(names) > 0 else [{}] * chunk.num_rows
+        args = [
+            {"index": i, "id": i + 1, "params": p}
+            for i, p in zip(index.to_pylist(), params)
+        ]
+        if outputs:
+            # items of each output table are collected separately
+            collected = {o: ([], []) for o in outputs}
+            for i, arg in enumerate(args):
+                for o, result in _tagged(func(arg), outputs).items():
+                    _collect(result, i, *collected[o])
+            return {o: to_table(items) for o, (items, _) in collected.items()}
+        results, rows = [], []
+        for i, arg in enumerate(args):
+            _collect(func(arg), i, results, rows)
+        items = to_table(results)
+
+    if not columns:
+        return items if items is not None else pa.table({})
+
+    ctx = ColumnContext(chunk.num_rows, np_index, np_params, rng)
+    data = generate_columns(columns, ctx)
+    if items is None:
+        return pa.table({name: pa.array(values) for name, values in data.items()})
+    if rows is None and items.num_rows != chunk.num_rows:
+        raise ValueError(
+            "`columns` require `items` to return one row for each source row"
+        )
+    for name, values in data.items():
+        if name in items.column_names:
+            # python generated fields override declared columns
+            continue
+        values = pa.array(values)
+        values = values if rows is None else values.take(pa.array(rows, pa.int64()))
+        items = items.append_column(name, values)
+    return items
+
+
+def _exec_chunk(
+    node: Callable or GenNodeModule or tuple,
+    vectorized: bool,
+    output: str or None,
+    chunk: pa.RecordBatch,
+    refs: dict[tuple[str, ...], list[str]] = None,
+    lookups: dict[tuple[str, str], str] = None,
+    seed: int = None,
+) -> ChunkResult:
+    """
+    Generates items for given chunk of materialized source rows in a worker process.
+
+    :param node: node file path and version to load the module in worker, node module
+    or the generation function itself if node is not loaded from a file
+    :param vectorized: whether `items` function is used instead of `item`
+    :param output: node name if worker writes the chunk to temp storage, `None` if
+    generated items must be returned
+    :param chunk: source rows with stable row ids
+    :param refs: exported parent column files that node references sample from
+    :param lookups: built index files that node lookups read
+    :param seed: seed of the node, random generators are seeded for the chunk from it
+    :return: source row count, generated item count, generated items or temp file path,
+    time spent to write the temp file
+    """
+    if refs:
+        reference.bind(refs)
+    if lookups:
+        lookup_index.bind(lookups)
+    func, columns, outputs = node, None, None
+    if isinstance(node, (tuple, GenNodeModule)):
+        mod = _load_node(*node) if isinstance(node, tuple) else node
+        func = getattr(mod, "items" if vectorized else "item", None)
+        columns = getattr(mod, "columns", None)
+        outputs = getattr(mod, "outputs", None)
+
+    rng = None
+    if seed is not None:
+        # chunks are seeded by their first stable row id, so generated values do not
+        # depend on which worker generates the chunk or the worker count
+        rng = seed_all(derive_seed(seed, chunk.column(SOURCE_INDEX)[0].as_py()))
+    items = _gen_chunk(func, vectorized, chunk, columns, outputs, rng)
+    if outputs:
+        # each output table is returned or written to its own temp file
+        data = {
+            o: _chunk_output(t, None if output is None else o, chunk)
+            for o, t in items.items()
+        }
+        count = sum(d[0] for d in data.values())
+        return chunk.num_rows, count, data, sum(d[2] for d in data.values())
+    return (chunk.num_rows, *_chunk_output(items, output, chunk))
+
+
+def _chunk_output(
+    items: pa.Table, output: str or None, chunk: pa.RecordBatch
+) -> ChunkOutput:
+    """
+    :param items: generated items
+    :param output: table name if items are written to temp storage
+    :param chunk: source rows of the items
+    :return: generated item count, generated items or temp file path, time spent to
+    write the temp file
+    """
+    if output is None:
+        return items.num_rows, items, 0.0
+
+    # stable row id of the first row makes chunk file name unique in node
+    key = "%s_%d" % (output, chunk.column(SOURCE_INDEX)[0].as_py())
+    temp_storage = TempStorage(output)
+    temp_storage.dump(items, key)
+    file_path = temp_storage.batches[0] if temp_storage.batches else None
+    return items.num_rows, file_path, temp_storage.elapsed
 
 
 class NodeExecutor:
-    def __init__(self, node: GenNodeModule, data_storage: DataStorage):
+    def __init__(
+        self,
+        node: GenNodeModule,
+        data_storage: DataStorage,
+        pool: WorkerPool,
+        seed: int = None,
+        ordered: bool = False,
+        dep_key: str = None,
+    ):
         """
         Reads and validates dataset configuration from filesystem structure.
 
         :param node: root path of the dataset generation
         :param data_storage: root path of the dataset generation
+        :param pool: started worker pool that is shared between nodes
+        :param seed: seed of the run, chunks are generated with unseeded random
+        generators if not given
+        :param ordered: merge chunks in source order instead of completion order
+        :param dep_key: fingerprint key of node dependencies, interrupted generations of
+        other dependency data are not resumed
         """
         self.run = node
         self.data_storage = data_storage
-        self.__temp_storage = TempStorage(self.run.name)
+        self.pool = pool
+        # each node draws different values for the same run seed
+        self.seed = None if seed is None else derive_seed(seed, node.name)
+        self.ordered = ordered
+        self.dep_key = dep_key or ""
+        self.temp_storage = TempStorage(self.run.name)
 
         # total times the gen function will be called
         self.t_count = 0
         # total generated item count
         self.g_count = 0
+        # source row count and batch count completed in an interrupted generation
+        self.r_count = 0
+        self.r_batch = 0
+        # exported parent column files keyed by table and column
+        self.refs = {}
+        # built lookup index files keyed by table and key column
+        self.lookups = {}
+
+    def prepare_node(self, resume: bool = False) -> int:
+        """
+        Materializes node source query. If resume is requested and the same node version
+        has batch checkpoints from an interrupted generation, completed batches are kept
+        and generation continues from the first incomplete batch.
+
+        :param resume: continue an interrupted generation if possible
+        :return: total target count
+        """
+        if resume and self._restore_checkpoints():
+            return self.t_count
+
+        # drop batches and checkpoints staged by a previous generation
+        for table in self.run.tables:
+            self.data_storage.discard(table)
+        # source query is executed once, count and batches are read from its result
+        self.t_count = self.data_storage.materialize(self.run.name, self.run.source)
+        return self.t_count
+
+    def exec_sql(self) -> int:
+        """
+        Generates sql only node by creating its stage table from source query in database.
 
-    def prepare_node(self) -> int:
-        self.t_count = self.data_storage.count(self.run.source)
+        :return: generated item count
+        """
+        self.t_count = self.data_storage.stage(self.run.name, self.run.source)
+        self.g_count = self.t_count
         return self.t_count
 
+    def _restore_checkpoints(self) -> bool:
+        version = self.run.version or ""
+        # outputs record their checkpoints together, so they complete the same batches
+        checkpoints = {
+            t: self.data_storage.checkpoints(t, version) for t in self.run.tables
+        }
+        first = checkpoints[self.run.tables[0]]
+        files = {
+            t: [f for c in cs for f in c["files"]] for t, cs in checkpoints.items()
+        }
+        source = SOURCE_TABLE % self.run.name
+        if len(first) == 0 or not self.data_storage.exists(source):
+            return False
+        if any(len(cs) != len(first) for cs in checkpoints.values()):
+            return False
+        # materialized source and completed batches are stale if a dependency changed
+        if any(c["dep_key"] != self.dep_key for cs in checkpoints.values() for c in cs):
+            return False
+        if not all(os.path.exists(f) for fs in files.values() for f in fs):
+            return False
+
+        self.t_count = self.data_storage.count("SELECT * FROM %s" % source)
+        self.r_count = sum(c["source_count"] for c in first)
+        self.r_batch = len(first)
+        self.g_count = sum(c["item_count"] for cs in checkpoints.values() for c in cs)
+        for table, cs in checkpoints.items():
+            for c in cs:
+                # item count of a batch is tracked with its first file
+                for i, f in enumerate(c["files"]):
+                    self.temp_storage.add(
+                        f, c["item_count"] if i == 0 else 0, 0.0, table
+                    )
+        logging.getLogger(self.run.name).info(
+            "Resuming from batch {:,} with {:,} items".format(
+                self.r_batch, self.g_count
+            )
+        )
+        return True
+
+    def export_refs(self) -> dict[tuple[str, ...], list[str]]:
+        """
+        Exports parent columns referenced by the node to numpy files that workers
+        memory-map. Values and weights of a reference are exported together, so their
+        rows stay aligned. Files are named by parent content fingerprint, so unchanged
+        parent columns are exported only once.
+
+        :return: exported file paths of each column keyed by table and columns
+        """
+        for key in self.run.refs:
+            table, columns = key[0], list(key[1:])
+            file_path = self._shared_path("ref", table, ",".join(columns))
+            paths = ["%s.%d.npy" % (file_path, i) for i in range(len(columns))]
+            with _shared_lock(file_path):
+                if not all(os.path.exists(p) for p in paths):
+                    values = self.data_storage.columns(table, columns)
+                    for v, p in zip(values, paths):
+                        reference.store(v, p)
+                    logging.getLogger(self.run.name).debug(
+                        "Exported {:,} values of {}.{}".format(
+                            len(values[0]), table, ",".join(columns)
+                        )
+                    )
+            self.refs[key] = paths
+        # references are also sampled in this process if node is not loaded from a file
+        reference.bind(self.refs)
+        return self.refs
+
+    def build_lookups(self) -> dict[tuple[str, str], str]:
+        """
+        Builds hash indexes of generated nodes that are used by node lookups. Indexes are
+        named by indexed node content fingerprint, so they are built once in a run.
+
+        :return: index file paths without suffix keyed by table and key column
+        """
+        logger = logging.getLogger(self.run.name)
+        for table, key in self.run.lookups:
+            file_path = self._shared_path("lookup", table, key)
+            with _shared_lock(file_path):
+                if not lookup_index.exists(file_path):
+                    with PerfTimerContext() as t:
+                        batches = self.data_storage.stream(
+                            "SELECT * FROM %s" % table, CONFIG.gen.batch_size
+                        )
+                        schema = self.data_storage.schema(table)
+                        count, size = lookup_index.build(
+                            batches, key, file_path, schema
+                        )
+                    logger.info(
+                        "Lookup index {}.{} built for {:,} keys in {} ({} mapped)".format(
+                            table, key, count, t, format_bytes(size)
+                        )
+                    )
+            self.lookups[(table, key)] = file_path
+        lookup_index.bind(self.lookups)
+        return self.lookups
+
+    def _shared_path(self, kind: str, table: str, column: str) -> str:
+        """
+        :param kind: kind of the shared file
+        :param table: name of the generated node
+        :param column: name of the node column
+        :return: path of a shared file that is unique for current node content
+        """
+        meta = self.data_storage.meta([table])
+        fingerprint = meta[0]["fingerprint"] if len(meta) > 0 else None
+        key = "%s:%s:%s:%s" % (kind, table, column, fingerprint or uuid.uuid4())
+        name = hashlib.blake2b(key.encode(), digest_size=16).hexdigest()
+        return os.path.join(CONFIG.temp.ref_path, name)
+
     def exec_node(self) -> list[str]:
+        self.export_refs()
+        self.build_lookups()
+        # target count is the source row count, it is refined with generated item count
         logger = ProgressLogger(self.t_count)
+        logger.update(self.g_count)
+        logger.estimate(self.r_count, self.g_count)
         batch_size = CONFIG.gen.batch_size
-        batch_count = math.ceil(self.t_count / batch_size)
+        depth = CONFIG.gen.queue_depth
+        done = self.r_count
+        # files of ordered batches are appended to the stage in batch order instead of
+        # being inserted after all staged batches, so row order does not depend on memory
+        staged = self.ordered and CONFIG.data.ingest == "memory"
 
-        for batch_index in range(batch_count):
-            # calculate indexes from `f` to `t`
-            f = batch_index * batch_size
-            t = self.t_count if f + batch_size > self.t_count else f + batch_size
+        # next batch is fetched and previous batch is persisted while generating
+        source = self.data_storage.source(self.run.name, batch_size, self.r_count)
+        with BackgroundWriter(self._persist_batch, depth) as writer:
+            for batch_index, params in enumerate(prefetch(source, depth), self.r_batch):
+                # workers write chunks to temp files if batch can not be kept in memory
+                in_memory = CONFIG.data.ingest == "memory"
+                to_file = not in_memory or memory_pressure(CONFIG.data.min_free_memory)
 
-            params = self.data_storage.exec(self.run.source, batch_index, batch_size)
-            args = [{"index": i, "id": i + 1, "params": params[i]} for i in range(f, t)]
+                tables = self.run.tables
+                chunks, files = {t: [] for t in tables}, {t: [] for t in tables}
+                counts = dict.fromkeys(tables, 0)
+                # item counts of chunks kept in memory that are not spilled yet
+                in_memory_counts = dict.fromkeys(tables, 0)
+                item_count = 0
+                for count, chunk_count, data, t in self._exec_batch(params, to_file):
+                    done += count
+                    item_count += chunk_count
+                    logger.update(chunk_count)
+                    logger.estimate(done, self.g_count + item_count)
+                    if self.run.outputs is None:
+                        data = {self.run.name: (chunk_count, data, t)}
+                    for table, (table_count, table_data, table_t) in data.items():
+                        counts[table] += table_count
+                        if to_file and table_data is not None:
+                            if not staged:
+                                self.temp_storage.add(
+                                    table_data, table_count, table_t, table
+                                )
+                            files[table].append(table_data)
+                        elif not to_file:
+                            chunks[table].append(table_data)
+                            in_memory_counts[table] += table_count
+                        # items of rows that generate many items may not fit in memory
+                        if in_memory_counts[table] > batch_size:
+                            key = "%s_%d_%d" % (table, batch_index, len(files[table]))
+                            merged = merge_tables(chunks[table])
+                            spill = TempStorage(table) if staged else self.temp_storage
+                            spill.dump(merged, key, table)
+                            files[table].append(spill.batches[-1])
+                            chunks[table], in_memory_counts[table] = [], 0
+                self.g_count += item_count
 
-            batch_result = []
-            for chunk_result in self._exec_batch(args):
-                batch_result.extend(chunk_result)
-                logger.update(len(chunk_result))
-
-            # save result to temp storage
-            self.__temp_storage.dump(batch_result)
-            self.g_count += len(batch_result)
+                batches = {}
+                for table in tables:
+                    checkpoint = {
+                        # nodes that are not loaded from a file have no code version
+                        "version": self.run.version or "",
+                        "batch": batch_index,
+                        "source_count": params.num_rows,
+                        "item_count": counts[table],
+                        "files": files[table],
+                        "dep_key": self.dep_key,
+                    }
+                    # append batch directly to the database without temp files
+                    batch = None if to_file else merge_tables(chunks[table])
+                    batches[table] = (batch, checkpoint)
+                writer.put(batches)
 
+        logger.close()
+        self.data_storage.release(self.run.name)
         # return generated file paths
-        return self.__temp_storage.batches
+        return self.temp_storage.batches
+
+    def _persist_batch(
+        self, batches: dict[str, tuple[pa.Table or None, BatchCheckpoint]]
+    ) -> None:
+        staged = self.ordered and CONFIG.data.ingest == "memory"
+        self.data_storage.append_outputs(batches, stage_files=staged)
 
-    def _exec_batch(self, args: list[dict]) -> list[dict]:
+    def _exec_batch(
+        self, params: pa.RecordBatch, to_file: bool
+    ) -> Iterator[ChunkResult]:
         chunk_size = CONFIG.gen.chunk_size
-        chunk_args = [args[i : i + chunk_size] for i in range(0, len(args), chunk_size)]
+        chunks = [
+            params.slice(i, chunk_size) for i in range(0, params.num_rows, chunk_size)
+        ]
 
-        gen_func = partial(_exec_chunk, self.run.item)
-        with ProcessPool(nodes=CONFIG.gen.concurrency) as pool:
-            for chunk in pool.uimap(gen_func, chunk_args):
-                # remove null items from generated chunk
-                yield [i for i in chunk if i is not None]
+        vectorized = self.run.vectorized
+        # workers import the node module themselves, chunks only carry source rows
+        node = (self.run.path, self.run.version)
+        if self.run.path is None:
+            node = self.run
+        output = self.run.name if to_file else None
+        gen_func = partial(
+            _exec_chunk,
+            node,
+            vectorized,
+            output,
+            refs=self.refs,
+            lookups=self.lookups,
+            seed=self.seed,
+        )
+        # ordered results keep the row order independent of worker count, workers
+        # still generate following chunks while the first pending chunk is completed
+        if self.ordered:
+            return self.pool.imap(gen_func, chunks)
+        return self.pool.uimap(gen_func, chunks)
@@ -0,0 +1,139 @@
+import queue
+import threading
+from typing import Callable, Iterable, Iterator, Any
+
+# marks the end of a stage queue
+_DONE = object()
+# seconds to wait before a blocked stage checks if the pipeline is stopped
+_POLL_INTERVAL = 0.1
+
+
+class _Failure:
+    def __init__(self, error: BaseException):
+        self.error = error
+
+
+def _put(q: queue.Queue, item: Any, stop: threading.Event) -> bool:
+    """
+    Puts item in a bounded queue, blocking while the queue is full unless stopped.
+
+    :return: `False` if the pipeline is stopped before item could be put
+    """
+    while not stop.is_set():
+        try:
+            q.put(item, timeout=_POLL_INTERVAL)
+            return True
+        except queue.Full:
+            continue
+    return False
+
+
+def prefetch(iterable: Iterable, depth: int) -> Iterator:
+    """
+    Iterates given iterable in a background thread and keeps at most `depth` items ready
+    for the consumer. The producer blocks when the queue is full, so memory stays bounded
+    when the consumer is slower than the producer.
+
+    :param iterable: iterable that will be consumed in background
+    :param depth: maximum number of prefetched items
+    :return: iterator of prefetched items
+    """
+    q = queue.Queue(maxsize=depth)
+    stop = threading.Event()
+
+    def produce():
+        try:
+            for item in iterable:
+                if not _put(q, item, stop):
+                    break
+            else:
+                _put(q, _DONE, stop)
+        except Exception as err:
+            _put(q, _Failure(err), stop)
+        finally:
+            if hasattr(iterable, "close"):
+                iterable.close()
+
+    thread = threading.Thread(target=produce, name="lokii-prefetch", daemon=True)
+    thread.start()
+    try:
+        while True:
+            item = q.get()
+            if item is _DONE:
+                return
+            if isinstance(item, _Failure):
+                raise item.error
+            yield item
+    finally:
+        # release producer if consumer stops early
+        stop.set()
+        thread.join()
+
+
+class BackgroundWriter:
+    """
+    Consumes items in a background thread with given function. At most `depth` items wait
+    in the queue, `put` blocks when the queue is full to apply backpressure to producer.
+
+    :var error: first error raised by the consumer function
+    :type error: Exception or None
+    """
+
+    def __init__(self, func: Callable[[Any], None], depth: int):
+        """
+        :param func: function that will be called for each item
+        :param depth: maximum number of items waiting to be consumed
+        """
+        self.func = func
+        self.error = None
+        self.__queue = queue.Queue(maxsize=depth)
+        self.__thread = threading.Thread(
+            target=self.__consume, name="lokii-writer", daemon=True
+        )
+
+    def __consume(self):
+        while True:
+            item = self.__queue.get()
+            if item is _DONE:
+                return
+            if self.error is not None:
+                # keep draining the queue so producer never blocks
+                continue
+            try:
+                self.func(item)
+            except Exception as err:
+                self.error = err
+
+    def put(self, item: Any) -> None:
+        """
+        Queues item to be consumed, blocks while the queue is full.
+
+        :param item: item to be consumed
+        """
+        if self.error is not None:
+            raise self.error
+        self.__queue.put(item)
+
+    def close(self) -> None:
+        """
+        Waits until all queued items are consumed and raises consumer error if any.
+        """
+        self.__queue.put(_DONE)
+        self.__thread.join()
+        if self.error is not None:
+            raise self.error
+
+    def __enter__(self):
+        self.__thread.start()
+        return self
+
+    def __exit__(self, exc_type, _, __):
+        if exc_type is None:
+            self.close()
+            return
+        # producer failed, queued items are still consumed to keep completed work
+        try:
+            self.close()
+        except Exception:
+            # original producer error is more relevant than consumer error
+            pass
@@ -0,0 +1,114 @@
+import logging
+import os
+from typing import Callable, Iterable, Iterator
+
+from pathos.pools import ProcessPool
+
+from lokii.config import CONFIG
+from lokii.util.perf_timer_context import PerfTimerContext
+
+logger = logging.getLogger("lokii.worker_pool")
+
+
+def _ping(_) -> int:
+    return os.getpid()
+
+
+class WorkerPool:
+    """
+    Process pool that lives for the whole generation run. Workers are spawned once and
+    shared by every batch of every node instead of forking a fresh pool for each batch.
+
+    :var concurrency: number of worker processes
+    :type concurrency: int
+    :var startup: measured time spent to spawn and warm up all workers
+    :type startup: PerfTimerContext or None
+    """
+
+    def __init__(self, concurrency: int = None):
+        """
+        Initializes pool configuration. Worker processes are not spawned until the pool
+        is started explicitly or used as a context manager.
+
+        :param concurrency: number of worker processes, defaults to configured concurrency
+        """
+        self.concurrency = concurrency or CONFIG.gen.concurrency
+        self.startup = None
+        self.__pool = None
+
+    @property
+    def started(self) -> bool:
+        return self.__pool is not None
+
+    def start(self) -> None:
+        """
+        Spawns worker processes and blocks until every worker is responsive so that the
+        measured startup cost covers the whole process creation.
+        """
+        if self.started:
+            return
+
+        with PerfTimerContext() as t:
+            # unique id prevents pathos from sharing its cached pool with other owners
+            pool = ProcessPool(nodes=self.concurrency, id="lokii-%d" % id(self))
+            pool.map(_ping, range(self.concurrency))
+
+        self.__pool = pool
+        self.startup = t
+        logger.debug("%d workers started in %s" % (self.concurrency, t))
+
+    def uimap(self, func: Callable, args: Iterable) -> Iterator:
+        """
+        Maps given function over arguments in worker processes. Results are yielded in
+        completion order.
+
+        :param func: function that will be called for each argument
+        :param args: iterable of function arguments
+        :return: iterator of function results
+        """
+        assert self.started, "Worker pool must be started before use"
+        return self.__pool.uimap(func, args)
+
+    def imap(self, func: Callable, args: Iterable) -> Iterator:
+        """
+        Maps given function over arguments in worker processes. Results are yielded in
+        argument order, workers still run ahead while an earlier result is pending.
+
+        :param func: function that will be called for each argument
+        :param args: iterable of function arguments
+        :return: iterator of function results
+        """
+        assert self.started, "Worker pool must be started before use"
+        return self.__pool.imap(func, args)
+
+    def close(self) -> None:
+        """
+        Gracefully stops the pool after all submitted tasks are completed.
+        """
+        if not self.started:
+            return
+        self.__pool.close()
+        self.__pool.join()
+        self.__pool.clear()
+        self.__pool = None
+
+    def terminate(self) -> None:
+        """
+        Stops worker processes immediately without waiting for submitted tasks.
+        """
+        if not self.started:
+            return
+        self.__pool.terminate()
+        self.__pool.join()
+        self.__pool.clear()
+        self.__pool = None
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, exc_type, _, __):
+        if exc_type is None:
+            self.close()
+        else:
+            self.terminate()
@@ -18,5 +18,19 @@ class ProgressLogger(StringIO):
 
     def update(self, count: float):
         self.pbar.update(count)
-        if count / self.total == 1:
-            self.pbar.close()
+
+    def estimate(self, done: float, item_count: float) -> None:
+        """
+        Refines expected total item count from item count of completed source rows, so
+        progress is estimated for nodes that generate zero or many items for each row.
+
+        :param done: number of completed source rows
+        :param item_count: number of items generated for completed source rows
+        """
+        if done <= 0 or self.total <= 0:
+            return
+        self.pbar.total = max(round(item_count * self.total / done), self.pbar.n)
+        self.pbar.refresh()
+
+    def close(self) -> None:
+        self.pbar.close()
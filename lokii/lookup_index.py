@@ -0,0 +1,267 @@
+import os
+import threading
+import zlib
+from numbers import Integral
+from typing import Any, Iterator
+
+import numpy as np
+import pyarrow as pa
+import pyarrow.ipc as ipc
+
+from lokii.reference import store
+
+# multiplier of fibonacci hashing that spreads keys over index slots
+_GOLDEN = 0x9E3779B97F4A7C15
+_MASK = 2**64 - 1
+# file suffixes of row store, index slots and keys of an index
+ROWS_EXT, SLOTS_EXT, KEYS_EXT = ".rows.arrow", ".slots.npy", ".keys.npy"
+
+# built index files of the current node generation keyed by table and key column
+_paths = {}
+# indexes memory-mapped in the current process, keyed by index file path
+_loaded = {}
+# lookups created in the current process, keyed by table and key column
+_lookups = {}
+
+
+def _hash(keys: np.ndarray) -> np.ndarray:
+    """
+    :param keys: integer or string keys
+    :return: 64 bit hashes of keys that are stable between processes
+    """
+    if keys.dtype.kind in "iub":
+        h = keys.astype(np.uint64)
+    elif keys.dtype.kind in "UO":
+        crc = [zlib.crc32(str(k).encode()) for k in keys.tolist()]
+        h = np.array(crc, dtype=np.uint64)
+    else:
+        raise ValueError("Lookup keys must be integer or string")
+    return h * np.uint64(_GOLDEN)
+
+
+def _hash_one(key: Any) -> int or None:
+    """
+    :param key: integer or string key
+    :return: same hash with `_hash` for a single key, `None` if key is not supported
+    """
+    if isinstance(key, Integral):
+        return ((int(key) & _MASK) * _GOLDEN) & _MASK
+    if isinstance(key, str):
+        return (zlib.crc32(key.encode()) * _GOLDEN) & _MASK
+    return None
+
+
+def build(
+    batches: Iterator[pa.RecordBatch],
+    key: str,
+    file_path: str,
+    schema: pa.Schema = None,
+) -> (int, int):
+    """
+    Builds a hash index of given rows. Rows are stored in an arrow file and index slots
+    hold positions of rows, so both can be memory-mapped read-only by every worker.
+    Index uses open addressing with linear probing and at most half of the slots are
+    used. Only the first row of duplicate keys is indexed.
+
+    :param batches: rows of the indexed node
+    :param key: name of the key column
+    :param file_path: path of the index files without suffix
+    :param schema: schema of the indexed node, required to build an empty index if
+    there are no rows
+    :return: indexed key count and total size of index files in bytes
+    """
+    os.makedirs(os.path.dirname(file_path), exist_ok=True)
+    rows_path = file_path + ROWS_EXT
+    # temp file is unique to the building thread, so concurrent builds do not collide
+    temp_path = "%s.%d.%d.tmp" % (rows_path, os.getpid(), threading.get_ident())
+    with open(temp_path, "wb") as _f:
+        writer = None
+        for batch in batches:
+            writer = writer or ipc.new_file(_f, batch.schema)
+            writer.write_batch(batch)
+        if writer is None and schema is None:
+            raise ValueError("Lookup index of an empty node requires node schema")
+        # empty node is indexed without rows, so none of the keys are found
+        writer = writer or ipc.new_file(_f, schema)
+        writer.close()
+    os.replace(temp_path, rows_path)
+
+    rows = ipc.open_file(pa.memory_map(rows_path)).read_all()
+    keys = rows.column(key).combine_chunks()
+    valid = np.flatnonzero(~keys.is_null().to_numpy(zero_copy_only=False))
+    # null keys are not indexed, they are filled to keep integer keys as integers
+    empty = "" if pa.types.is_string(keys.type) else 0
+    keys = keys.fill_null(empty).to_numpy(zero_copy_only=False)
+    keys = keys.astype(str) if keys.dtype == object else keys
+    # first occurrence of each key in row order
+    _, first = np.unique(keys[valid], return_index=True)
+    pending = valid[np.sort(first)]
+    count = len(pending)
+
+    bits = max(1, int(np.ceil(np.log2(max(2 * count, 2)))))
+    slots = np.full(2**bits, -1, dtype=np.int64)
+    pos = (_hash(keys) >> np.uint64(64 - bits)).astype(np.int64)
+    while len(pending) > 0:
+        s = pos[pending]
+        free = slots[s] == -1
+        cand, cand_slots = pending[free], s[free]
+        # first pending row wins a free slot, others probe the next slot
+        _, first = np.unique(cand_slots, return_index=True)
+        slots[cand_slots[first]] = cand[first]
+        pending = np.setdiff1d(pending, cand[first], assume_unique=True)
+        pos[pending] = (pos[pending] + 1) & (len(slots) - 1)
+
+    store(keys, file_path + KEYS_EXT)
+    # slots are written last, index is complete only if they exist
+    store(slots, file_path + SLOTS_EXT)
+    ext = [ROWS_EXT, KEYS_EXT, SLOTS_EXT]
+    return count, sum(os.path.getsize(file_path + e) for e in ext)
+
+
+def exists(file_path: str) -> bool:
+    """
+    :param file_path: path of the index files without suffix
+    :return: `True` if index is completely built
+    """
+    return os.path.exists(file_path + SLOTS_EXT)
+
+
+class LookupIndex:
+    """
+    Finds rows of a generated node by key without querying the database. Index is built
+    once before the node that uses it is generated and memory-mapped read-only by every
+    worker, so each lookup costs a few array reads.
+
+    :var table: name of the indexed node
+    :type table: str
+    :var key: name of the key column
+    :type key: str
+    """
+
+    def __init__(self, table: str, key: str):
+        """
+        :param table: name of the indexed node
+        :param key: name of the key column, integer or string
+        """
+        self.table = table
+        self.key = key
+
+    @property
+    def sources(self) -> list[tuple[str, str]]:
+        """
+        :return: indexed table and key column pairs
+        """
+        return [(self.table, self.key)]
+
+    @property
+    def index(self) -> (np.ndarray, np.ndarray, pa.Table):
+        """
+        :return: memory-mapped index slots, keys and rows
+        """
+        if (self.table, self.key) not in _paths:
+            raise KeyError(
+                "Lookup `%s.%s` is not built, use string literals in "
+                "`lokii.lookup` calls so it can be found when node is parsed"
+                % (self.table, self.key)
+            )
+        file_path = _paths[(self.table, self.key)]
+        if file_path not in _loaded:
+            slots = np.load(file_path + SLOTS_EXT, mmap_mode="r")
+            keys = np.load(file_path + KEYS_EXT, mmap_mode="r")
+            rows = ipc.open_file(pa.memory_map(file_path + ROWS_EXT)).read_all()
+            _loaded[file_path] = (slots, keys, rows)
+        return _loaded[file_path]
+
+    def position(self, key: Any) -> int:
+        """
+        :param key: key value
+        :return: position of the row in indexed node, `-1` if not found
+        """
+        slots, keys, _ = self.index
+        h = _hash_one(key)
+        if h is None:
+            return -1
+        mask = len(slots) - 1
+        s = h >> (64 - mask.bit_length())
+        while True:
+            row = slots[s]
+            if row < 0:
+                return -1
+            if keys[row] == key:
+                return int(row)
+            s = (s + 1) & mask
+
+    def positions(self, keys: Any) -> np.ndarray:
+        """
+        :param keys: key values
+        :return: positions of the rows in indexed node, `-1` for keys that are not found
+        """
+        slots, index_keys, _ = self.index
+        keys = np.asarray(keys)
+        if index_keys.dtype.kind == "U":
+            keys = keys.astype(str)
+        mask = len(slots) - 1
+        s = (_hash(keys) >> np.uint64(64 - mask.bit_length())).astype(np.int64)
+        result = np.full(len(keys), -1, dtype=np.int64)
+        # index of an empty node has no keys to compare
+        active = np.arange(len(keys) if len(index_keys) > 0 else 0)
+        while len(active) > 0:
+            rows = slots[s[active]]
+            empty = rows < 0
+            hit = ~empty & (index_keys[np.maximum(rows, 0)] == keys[active])
+            result[active[hit]] = rows[hit]
+            active = active[~empty & ~hit]
+            s[active] = (s[active] + 1) & mask
+        return result
+
+    def get(self, key: Any, default: Any = None) -> dict or Any:
+        """
+        :param key: key value
+        :param default: value returned if key is not found
+        :return: row of the key as dict
+        """
+        row = self.position(key)
+        if row < 0:
+            return default
+        return self.index[2].slice(row, 1).to_pylist()[0]
+
+    def take(self, keys: Any) -> pa.Table:
+        """
+        :param keys: key values
+        :return: rows of the keys in same order, rows of missing keys are null
+        """
+        rows = self.positions(keys)
+        return self.index[2].take(pa.array(rows, mask=rows < 0))
+
+    def __getitem__(self, key: Any) -> dict:
+        row = self.get(key)
+        if row is None:
+            raise KeyError(key)
+        return row
+
+    def __contains__(self, key: Any) -> bool:
+        return self.position(key) >= 0
+
+
+def lookup(table: str, key: str) -> LookupIndex:
+    """
+    Creates a lookup of a generated node by key, e.g. `lokii.lookup("customers", "id")`.
+    Indexed node becomes a dependency of the node, so it is generated before. Table and
+    key names must be string literals to be found when the node is parsed.
+
+    :param table: name of the indexed node
+    :param key: name of the key column, integer or string
+    :return: node lookup
+    """
+    if (table, key) not in _lookups:
+        _lookups[(table, key)] = LookupIndex(table, key)
+    return _lookups[(table, key)]
+
+
+def bind(paths: dict[tuple[str, str], str]) -> None:
+    """
+    Sets built index files that lookups of the current node generation read.
+
+    :param paths: index file paths without suffix keyed by table and key column
+    """
+    _paths.update(paths)
@@ -1,91 +1,269 @@
+import hashlib
 import logging
 import os
 import shutil
 import uuid
+from functools import partial
+
 
 from lokii.config import CONFIG
-from lokii.storage.data_storage import DataStorage
+from lokii.storage.data_storage import DataStorage, NodeMetadata
 from lokii.storage.batch_iterator import BatchIterator
+from lokii.storage.dataset_cache import DatasetCache
+from lokii.storage.temp_storage import TempStorage
 from lokii.model.node_module import GenNodeModule
 from lokii.parse.node_parser import NodeParser
 from lokii.parse.group_parser import GroupParser
+from lokii.parse.module_finder import ModuleFinder
+from lokii.util.byte_size import format_bytes
 from lokii.util.perf_timer_context import PerfTimerContext
 from lokii.util.graph_analyzer import GraphAnalyzer
+from lokii.exec.dag_scheduler import DagScheduler
 from lokii.exec.node_executor import NodeExecutor
+from lokii.exec.worker_pool import WorkerPool
 
 logger = logging.getLogger("lokii")
 
 
 class Lokii:
-    def __init__(self, source_folder: str):
+    def __init__(
+        self,
+        source_folder: str,
+        resume: bool = False,
+        seed: int = None,
+        ordered: bool = False,
+    ):
         """
         Generates massive amount of relational mock data.
 
         :param source_folder: path of root folder that contains schema and table definitions
+        :param resume: continue interrupted node generations from their last completed batch
+        :param seed: seed of the run that makes generated data reproducible, configured
+        seed by default
+        :param ordered: merge generated chunks in source order, enabled if seed is set
         """
         self.__source_folder = source_folder
         self.__gen_id = str(uuid.uuid4())
+        self.__resume = resume
+        self.__seed = CONFIG.gen.seed if seed is None else seed
+        self.__ordered = ordered or CONFIG.gen.ordered or self.__seed is not None
 
-        Lokii.setup_env()
+        Lokii.setup_env(resume)
         self.__data_storage = DataStorage()
-        self.__node_parser = NodeParser(self.__source_folder)
-        self.__group_parser = GroupParser(self.__source_folder)
+        # node and group files are found in a single directory walk
+        finder = ModuleFinder(self.__source_folder)
+        self.__node_parser = NodeParser(self.__source_folder, finder)
+        self.__group_parser = GroupParser(self.__source_folder, finder)
+        self.__pool = WorkerPool()
+        self.__cache = DatasetCache()
 
     def generate(self, export: bool = False, purge: bool = False):
-        with PerfTimerContext() as t:
+        # worker pool is shared by all nodes and terminated if generation fails
+        with self.__pool, PerfTimerContext() as t:
             nodes = self.__node_parser.parse()
+            if self.__seed is not None:
+                self.seed_versions(nodes)
 
             # create dependency map from node source queries
             dep_map = list(self.order_nodes(nodes))
             analyzer = GraphAnalyzer(dep_map)
-            exec_order = analyzer.execution_order()
+            analyzer.check_cyclic()
+            levels = analyzer.levels()
+            logger.debug(
+                "%d nodes in %d levels, widest level has %d nodes"
+                % (len(dep_map), len(levels), max(map(len, levels), default=0))
+            )
 
-            total_target_count, total_item_count = 0, 0
-            for name in exec_order:
-                run = nodes[name]
-                dep_keys = analyzer.dependencies(name)
-                if self.is_node_valid(run, dep_keys):
-                    logger.info("%s not changed. Using existing dataset." % name)
-                    continue
-
-                # generate dataset
-                target_count, item_count, file_paths = self.generate_node(run)
-                total_target_count += target_count
-                total_item_count += item_count
-
-                # save generation metadata in database
-                self.__data_storage.save(self.__gen_id, run.name, run.version)
-                # insert generated data in database
-                self.__data_storage.insert(run.name, file_paths)
+            # independent nodes are generated concurrently on the shared worker pool
+            # and nodes with longer remaining critical path are started first
+            scheduler = DagScheduler(dep_map, costs=self.estimate_costs(nodes))
+            results = scheduler.run(partial(self.run_node, nodes, analyzer))
+            total_target_count = sum(r[0] for r in results.values())
+            total_item_count = sum(r[1] for r in results.values())
+            total_temp_size = sum(r[2] for r in results.values())
 
         logger.info("Generation completed!")
         logger.info("Total target item count: {:,}".format(total_target_count))
         logger.info("Generated {:,} items in {}".format(total_item_count, t))
+        if total_temp_size > 0:
+            logger.info(
+                "Temp storage: {} written in {} format".format(
+                    format_bytes(total_temp_size), CONFIG.temp.format
+                )
+            )
+        logger.info(
+            "Worker pool startup: {} workers in {}".format(
+                self.__pool.concurrency, self.__pool.startup
+            )
+        )
 
         if export:
             self.export(nodes)
+        self.__data_storage.close()
         Lokii.clean_env(purge)
 
-    def generate_node(self, node: GenNodeModule) -> (int, int, list[str]):
+    def run_node(self, nodes, analyzer: GraphAnalyzer, name: str) -> (int, int, int):
+        run = nodes[name]
+        # only direct dependencies are compared, their keys already cover the rest
+        deps = analyzer.graph[name]
+        metadata = self.__data_storage.meta([name] + deps)
+        dep_key = Lokii.dep_key([m for m in metadata if m["name"] in deps])
+        if self.is_node_valid(run, metadata, dep_key):
+            logger.info("%s not changed. Using existing dataset." % name)
+            return 0, 0, 0
+
+        # identical nodes generated in any project or branch are restored from cache
+        cache_keys = {}
+        if CONFIG.cache.enabled and run.version is not None:
+            cache_keys = {t: Lokii.cache_key(run, t, dep_key) for t in run.tables}
+            entries = [self.__cache.get(k) for k in cache_keys.values()]
+            if all(e is not None for e in entries):
+                with PerfTimerContext() as t:
+                    for table, entry in zip(run.tables, entries):
+                        self.__data_storage.restore(table, entry["path"])
+                logging.getLogger(run.name).info(
+                    "{} restored from cache in {}".format(
+                        format_bytes(sum(e["size"] for e in entries)), t
+                    )
+                )
+                self.save_node(run, metadata, dep_key)
+                return 0, 0, 0
+
+        with PerfTimerContext() as node_t:
+            # generate dataset
+            target_count, item_count, temp_storage = self.generate_node(run, dep_key)
+
+            # insert generated data of each output table in database
+            with PerfTimerContext() as t:
+                for table in run.tables:
+                    self.__data_storage.insert(table, temp_storage.files(table))
+        if temp_storage.size > 0:
+            logging.getLogger(run.name).info(
+                "{} loaded in {} ({}/s)".format(
+                    format_bytes(temp_storage.size),
+                    t,
+                    # timer may read zero for small files on coarse clocks
+                    format_bytes(temp_storage.size / (t.time or 1e-9)),
+                )
+            )
+
+        self.save_node(run, metadata, dep_key)
+        self.__data_storage.save_stats(run.name, node_t.time, item_count)
+        for table, cache_key in cache_keys.items():
+            with PerfTimerContext() as t:
+                dump = partial(self.__data_storage.dump, table)
+                entry = self.__cache.put(cache_key, table, run.version, dump)
+            if entry is None:
+                logging.getLogger(run.name).debug(
+                    "{} is larger than cache size limit, not cached".format(table)
+                )
+                continue
+            logging.getLogger(run.name).debug(
+                "{} of {} stored in cache in {}".format(
+                    format_bytes(entry["size"]), table, t
+                )
+            )
+        return target_count, item_count, temp_storage.size
+
+    def seed_versions(self, nodes) -> None:
+        """
+        Adds run seed to code versions of generated nodes, so data generated with another
+        seed is not reused from database, checkpoints or cache.
+
+        :param nodes: parsed nodes keyed by name
+        """
+        for n in nodes.values():
+            if n.version is None or n.sql_only:
+                continue
+            key = "%s:%d" % (n.version, self.__seed)
+            n.version = hashlib.blake2b(key.encode(), digest_size=16).hexdigest()
+
+    @staticmethod
+    def cache_key(run: GenNodeModule, table: str, dep_key: str) -> str:
+        """
+        :param run: generated node
+        :param table: output table of the node
+        :param dep_key: fingerprint key of node dependencies
+        :return: dataset cache key of the output table
+        """
+        if table != run.name:
+            # output tables of multi output nodes are cached separately
+            dep_key = "%s:%s" % (dep_key, table)
+        return DatasetCache.key(run.version, run.source, dep_key)
+
+    def save_node(
+        self, run: GenNodeModule, metadata: list[NodeMetadata], dep_key: str
+    ) -> None:
+        # save generation metadata with content fingerprint in database
         with PerfTimerContext() as t:
-            logger = logging.getLogger(node.name)
+            fingerprints = [self.__data_storage.fingerprint(n) for n in run.tables]
+            fingerprint = fingerprints[0]
+            if run.outputs is not None:
+                key = ",".join(fingerprints)
+                fingerprint = hashlib.blake2b(key.encode(), digest_size=16).hexdigest()
+        logging.getLogger(run.name).debug("Fingerprint computed in {}".format(t))
+        prev = [m for m in metadata if m["name"] == run.name]
+        if len(prev) > 0 and prev[0]["fingerprint"] == fingerprint:
+            logging.getLogger(run.name).info(
+                "Generated data not changed. Dependent nodes will not be invalidated."
+            )
+        self.__data_storage.save(
+            self.__gen_id, run.name, run.version, fingerprint, dep_key
+        )
+        # output tables are fingerprinted separately, so data shared from them for refs
+        # and lookups is exported again only if the table itself changes
+        for table, table_fingerprint in zip(run.tables, fingerprints):
+            if table != run.name:
+                self.__data_storage.save(
+                    self.__gen_id, table, run.version, table_fingerprint, dep_key
+                )
 
-            executor = NodeExecutor(node, self.__data_storage)
-            target_count = executor.prepare_node()
+    def generate_node(
+        self, node: GenNodeModule, dep_key: str = None
+    ) -> (int, int, TempStorage):
+        with PerfTimerContext() as t:
+            logger = logging.getLogger(node.name)
 
-            logger.info("Generation started for target {:,} items".format(target_count))
-            generated_file_paths = executor.exec_node()
+            executor = NodeExecutor(
+                node,
+                self.__data_storage,
+                self.__pool,
+                self.__seed,
+                self.__ordered,
+                dep_key,
+            )
+            if node.sql_only:
+                # source query result is the node data, no rows are sent to workers
+                logger.info("Generation started in database")
+                target_count = executor.exec_sql()
+            else:
+                target_count = executor.prepare_node(self.__resume)
+                logger.info(
+                    "Generation started for target {:,} items".format(target_count)
+                )
+                executor.exec_node()
             item_count = executor.g_count
 
+        temp = executor.temp_storage
         logger.info("{:,} items generated in {}".format(item_count, t))
-        return target_count, item_count, generated_file_paths
+        if temp.elapsed > 0:
+            logger.info(
+                "{} {} temp files written in {:.4f}s ({}/s)".format(
+                    format_bytes(temp.size),
+                    temp.format.name,
+                    temp.elapsed,
+                    format_bytes(temp.size / temp.elapsed),
+                )
+            )
+        return target_count, item_count, temp
 
     def export(self, nodes):
-        exported = {n: False for n in nodes.keys()}
+        # output tables of multi output nodes are exported separately
+        exported = {t: False for n in nodes.values() for t in n.tables}
         with PerfTimerContext() as t:
             groups = self.__group_parser.parse()
             group_nodes = {
-                g: [n.name for n in nodes.values() if g in n.groups]
+                g: [t for n in nodes.values() if g in n.groups for t in n.tables]
                 for g in groups.keys()
             }
             # create dependency map from node source queries
@@ -111,7 +289,7 @@ class Lokii:
                 if groups[name].export:
                     exports = [
                         k
-                        for k in nodes.keys()
+                        for k in exported.keys()
                         if not exported[k] and k in group_nodes[name]
                     ]
                     for n in exports:
@@ -137,8 +315,33 @@ class Lokii:
         export_count = len([k for k in exported.keys() if exported[k]])
         logger.info("{:,} nodes exported in {}".format(export_count, t))
 
-    def is_node_valid(self, node: GenNodeModule, dep_keys: list[str]):
-        metadata = self.__data_storage.meta(dep_keys)
+    def estimate_costs(self, nodes) -> dict[str, float]:
+        """
+        Estimates generation time of nodes from timings of previous runs. Source queries
+        are not executed for estimation, cost of a node without history is estimated from
+        catalog row counts of its source tables that already exist in database.
+
+        :return: estimated cost of each node
+        """
+        stats = self.__data_storage.stats(list(nodes.keys()))
+        costs = {name: s["elapsed"] for name, s in stats.items()}
+        deps = {
+            n.name: self.__data_storage.deps(n.source)
+            for n in nodes.values()
+            if n.name not in costs
+        }
+        sizes = self.__data_storage.sizes(sorted({t for d in deps.values() for t in d}))
+        # row counts are converted to seconds with the average rate of previous runs
+        rates = [s["rate"] for s in stats.values() if s["rate"] > 0]
+        rate = sum(rates) / len(rates) if len(rates) > 0 else 1.0
+        for name, tables in deps.items():
+            costs[name] = sum(sizes.get(t, 0) for t in tables) / rate
+        logger.debug("Estimated node costs: %s" % costs)
+        return costs
+
+    def is_node_valid(
+        self, node: GenNodeModule, metadata: list[NodeMetadata], dep_key: str
+    ) -> bool:
         curr = [m for m in metadata if m["name"] == node.name]
         if len(curr) == 0:
             # no dataset generated before with this run key
@@ -146,36 +349,75 @@ class Lokii:
         if curr[0]["version"] != node.version:
             # code version is different from previous run
             return False  # must regenerate
-        for dep_meta in metadata:
-            if dep_meta["gen_id"] == self.__gen_id:
-                # dependent dataset changed in current generation
-                return False  # must regenerate
-        # no code changes, no dependencies changed
+        if curr[0]["dep_key"] != dep_key:
+            # content of a dependent dataset changed since previous run
+            return False  # must regenerate
+        # no code changes, no dependency data changed
         return True  # dataset is valid, do not regenerate
 
+    @staticmethod
+    def dep_key(metadata: list[NodeMetadata]) -> str:
+        """
+        Combines content fingerprints of node dependencies, so a node is regenerated only
+        when data of its dependencies changes, not whenever they are regenerated.
+
+        :param metadata: metadata of node dependencies
+        :return: fingerprint key of dependencies
+        """
+        key = ",".join(
+            "%s:%s" % (m["name"], m["fingerprint"])
+            for m in sorted(metadata, key=lambda m: m["name"])
+        )
+        return hashlib.blake2b(key.encode(), digest_size=16).hexdigest()
+
     def order_nodes(self, nodes):
+        # tables are generated by the node itself or by a multi output node
+        owners = {}
+        for n in nodes.values():
+            for table in n.tables:
+                if owners.get(table, n.name) != n.name:
+                    raise AssertionError(
+                        "Table `%s` is generated by more than one node!\n"
+                        "Nodes: %s, %s" % (table, owners[table], n.name)
+                    )
+                owners[table] = n.name
+
         for n in nodes.values():
             # get dependencies in node source query
-            deps = self.__data_storage.deps(n.source)
+            tables = self.__data_storage.deps(n.source)
             # check if dependency exists in parsed nodes
-            for dep in deps:
-                if dep not in nodes:
+            for table in tables:
+                if table not in owners:
                     raise AssertionError(
                         "Dependency `%s` in node source query is not found!\n"
-                        "Node: %s" % (dep, n.name)
+                        "Node: %s" % (table, n.name)
+                    )
+            # parent nodes of referenced columns and lookups must be generated before
+            for table, *_ in n.refs + n.lookups:
+                if table not in owners:
+                    raise AssertionError(
+                        "Dependency `%s` in node reference is not found!\n"
+                        "Node: %s" % (table, n.name)
                     )
+                if table not in tables:
+                    tables.append(table)
+            deps = list(dict.fromkeys(owners[t] for t in tables))
             logger.debug("Dependencies found for `%s`: %s" % (n.name, deps))
             yield n.name, deps
 
     @staticmethod
-    def setup_env():
-        Lokii.clean_env(False)
-        if not os.path.exists(CONFIG.temp.data_path):
-            os.makedirs(CONFIG.temp.data_path)
+    def setup_env(resume: bool = False):
+        # temp files of completed batches are kept to resume interrupted generations
+        if not resume:
+            Lokii.clean_env(False)
+        if not os.path.exists(CONFIG.temp.dir_path):
+            os.makedirs(CONFIG.temp.dir_path)
 
     @staticmethod
     def clean_env(force: bool = False):
         if force and os.path.exists(CONFIG.temp.dir_path):
             shutil.rmtree(CONFIG.temp.dir_path)
-        elif os.path.exists(CONFIG.temp.data_path):
-            shutil.rmtree(CONFIG.temp.data_path)
+            return
+        for dir_path in [CONFIG.temp.data_path, CONFIG.temp.ref_path]:
+            if os.path.exists(dir_path):
+                shutil.rmtree(dir_path)
@@ -1,6 +1,7 @@
-from typing import Callable
+from typing import Callable, Any
 
 GenItemFunc = Callable[[dict], dict]
+GenItemsFunc = Callable[[dict], Any]
 
 
 class GenNodeModule:
@@ -10,29 +11,95 @@ class GenNodeModule:
     :var source: source query to create items
     :type source: str
     :var item: item generation function
-    :type item: GenFunc
+    :type item: GenItemFunc or None
+    :var items: vectorized item generation function
+    :type items: GenItemsFunc or None
     :var name: Name of the node
     :type name: str
     :var version: Code version of the node
     :type version: str
     :var groups: Groups that the node belongs
     :type groups: list[str]
+    :var path: File path of the node module
+    :type path: str or None
+    :var vectorized: whether items are generated with `items` function
+    :type vectorized: bool
+    :var sql_only: whether node table is created from source query in database
+    :type sql_only: bool
+    :var columns: vectorized column generators
+    :type columns: dict[str, ColumnFunc] or None
+    :var refs: parent node columns sampled with `lokii.ref`
+    :type refs: list[tuple[str, ...]]
+    :var lookups: generated node and key column pairs indexed for `lokii.lookup`
+    :type lookups: list[tuple[str, str]]
+    :var outputs: names of the tables that are generated together by the node
+    :type outputs: list[str] or None
     """
 
-    def __init__(self, source, item, name=None, version=None, groups=None):
+    def __init__(
+        self,
+        source,
+        item,
+        name=None,
+        version=None,
+        groups=None,
+        items=None,
+        path=None,
+        vectorized=None,
+        sql_only=False,
+        columns=None,
+        refs=None,
+        lookups=None,
+        outputs=None,
+    ):
         """
         Initialize generation node module.
         :param source: source query to create items
         :type source: str
         :param item: item generation function
-        :type item: GenFunc
+        :type item: GenItemFunc or None
         :param name: name of the node
         :type name: str
         :param groups: export groups of the node
         :type groups: list[str]
+        :param items: vectorized item generation function
+        :type items: GenItemsFunc or None
+        :param path: file path of the node module
+        :type path: str
+        :param vectorized: whether node uses `items` function, required if functions are
+        not loaded and will be loaded from `path` by workers
+        :type vectorized: bool
+        :param sql_only: whether node table is created from source query without
+        generation functions
+        :type sql_only: bool
+        :param columns: vectorized column generators that are merged with generated items
+        :type columns: dict[str, ColumnFunc] or None
+        :param refs: parent node table and columns sampled with `lokii.ref`, weights
+        column is the last one if given
+        :type refs: list[tuple[str, ...]]
+        :param lookups: generated node and key column pairs indexed for `lokii.lookup`
+        :type lookups: list[tuple[str, str]]
+        :param outputs: names of the tables that are generated together, node generates
+        a single table with its own name if not given
+        :type outputs: list[str] or None
         """
         self.source = source
         self.item = item
         self.name = name
         self.version = version
         self.groups = groups or []
+        self.items = items
+        self.path = path
+        self.vectorized = items is not None if vectorized is None else vectorized
+        self.sql_only = sql_only
+        self.columns = columns
+        self.refs = refs or []
+        self.lookups = lookups or []
+        self.outputs = outputs
+
+    @property
+    def tables(self) -> list[str]:
+        """
+        :return: names of the tables generated by the node
+        """
+        return self.outputs or [self.name]
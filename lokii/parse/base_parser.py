@@ -6,6 +6,9 @@ class BaseParser:
     def attr(self, obj: object, name: str, msg: str = None):
         return self.__test(hasattr(obj, name), msg)
 
+    def any_attr(self, obj: object, names: list[str], msg: str = None):
+        return self.__test(any(hasattr(obj, n) for n in names), msg)
+
     def inst(self, obj: object, info: Any, msg: str = None):
         return self.__test(isinstance(obj, info), msg)
 
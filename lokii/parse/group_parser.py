@@ -1,15 +1,15 @@
 import logging
+from concurrent.futures import ThreadPoolExecutor
 from os import path
-from glob import glob
 
 from lokii.config import CONFIG
 from lokii.model.group_module import GroupModule
 from lokii.util.module_file_loader import ModuleFileLoader
 from lokii.util.perf_timer_context import PerfTimerContext
 from lokii.parse.base_parser import BaseParser
+from lokii.parse.module_finder import ModuleFinder
 
 logger = logging.getLogger("lokii.group_parser")
-GROUP_RESOLVER = "**/*%s" % CONFIG.gen.group_ext
 
 
 class GroupParser(BaseParser):
@@ -20,13 +20,16 @@ class GroupParser(BaseParser):
     :type groups: dict[str, GroupModule]
     """
 
-    def __init__(self, source_folder):
+    def __init__(self, source_folder, finder=None):
         """
         Initializes parser.
         :param source_folder: root path of the project
         :type source_folder: str
+        :param finder: module finder that is shared with other parsers
+        :type finder: ModuleFinder
         """
         self.root = source_folder
+        self.finder = finder or ModuleFinder(source_folder)
         self.groups = {}
 
     def parse(self):
@@ -53,32 +56,45 @@ class GroupParser(BaseParser):
         :return: parsed and validated group modules
         :rtype: list[GroupModule]
         """
-        glob_path = path.join(self.root, GROUP_RESOLVER)
-        file_paths = [f for f in glob(glob_path, recursive=True)]
+        file_paths = self.finder.files(CONFIG.gen.group_ext)
+        # file reads and hashing overlap between threads, module execution itself
+        # holds the GIL and cached definitions skip it completely
+        with ThreadPoolExecutor(thread_name_prefix="lokii-parse") as executor:
+            return list(executor.map(self.__parse_group, file_paths))
 
-        for fp in file_paths:
+    def __parse_group(self, fp):
+        """
+        Loads group module and ensures group module configuration is valid.
+
+        :param fp: file path of the group module
+        :type fp: str
+        :return: parsed and validated group module
+        :rtype: GroupModule
+        """
+        with PerfTimerContext() as t:
             loader = ModuleFileLoader(fp)
             loader.load()
             mod = loader.module
+        logger.debug("Group module imported in %s" % t, extra={"at": fp})
 
-            # extract group name from dir name
-            m_name = path.dirname(fp).split(path.sep)[-1]
-            # extract groups from file path
-            m_groups = path.relpath(path.dirname(fp), self.root).split(path.sep)[:-1]
-            parsed = GroupModule(m_name, m_groups)
-            logger.debug("Found valid group `%s`", m_name, extra={"at": fp})
+        # extract group name from dir name
+        m_name = path.dirname(fp).split(path.sep)[-1]
+        # extract groups from file path
+        m_groups = path.relpath(path.dirname(fp), self.root).split(path.sep)[:-1]
+        parsed = GroupModule(m_name, m_groups)
+        logger.debug("Found valid group `%s`", m_name, extra={"at": fp})
 
-            # ensure group configuration is valid
-            if self.attr(mod, "before"):
-                self.func(mod.before, "`before` must be function at %s" % fp)
-                self.sig(mod.before, 1, "`before` accepts only one param at %s" % fp)
-                parsed.before = mod.before
-            if self.attr(mod, "export"):
-                self.func(mod.export, "`export` must be function at %s" % fp)
-                self.sig(mod.export, 1, "`export` accepts only one param at %s" % fp)
-                parsed.export = mod.export
-            if self.attr(mod, "after"):
-                self.func(mod.after, "`after` must be function at %s" % fp)
-                self.sig(mod.after, 1, "`after` accepts only one param at %s" % fp)
-                parsed.after = mod.after
-            yield parsed
+        # ensure group configuration is valid
+        if self.attr(mod, "before"):
+            self.func(mod.before, "`before` must be function at %s" % fp)
+            self.sig(mod.before, 1, "`before` accepts only one param at %s" % fp)
+            parsed.before = mod.before
+        if self.attr(mod, "export"):
+            self.func(mod.export, "`export` must be function at %s" % fp)
+            self.sig(mod.export, 1, "`export` accepts only one param at %s" % fp)
+            parsed.export = mod.export
+        if self.attr(mod, "after"):
+            self.func(mod.after, "`after` must be function at %s" % fp)
+            self.sig(mod.after, 1, "`after` accepts only one param at %s" % fp)
+            parsed.after = mod.after
+        return parsed
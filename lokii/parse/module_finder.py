@@ -0,0 +1,44 @@
+import os
+
+from lokii.config import CONFIG
+
+
+class ModuleFinder:
+    """
+    Finds node and group module files of the project with a single directory walk that is
+    shared by node and group parsers.
+    """
+
+    def __init__(self, source_folder: str):
+        """
+        :param source_folder: root path of the project
+        """
+        self.root = source_folder
+        self.__files = None
+
+    def walk(self) -> list[str]:
+        """
+        Walks project directory and collects node and group module files. Hidden
+        directories are skipped like recursive glob patterns do.
+
+        :return: sorted list of module file paths
+        """
+        exts = (CONFIG.gen.node_ext, CONFIG.gen.group_ext)
+        files = []
+        for dir_path, dir_names, file_names in os.walk(self.root):
+            dir_names[:] = [d for d in dir_names if not d.startswith(".")]
+            files.extend(
+                os.path.join(dir_path, f)
+                for f in file_names
+                if f.endswith(exts) and not f.startswith(".")
+            )
+        return sorted(files)
+
+    def files(self, ext: str) -> list[str]:
+        """
+        :param ext: file extension of the modules
+        :return: list of module file paths with given extension
+        """
+        if self.__files is None:
+            self.__files = self.walk()
+        return [f for f in self.__files if f.endswith(ext)]
@@ -1,15 +1,19 @@
 import logging
+import tokenize
+from concurrent.futures import ThreadPoolExecutor
 from os import path
-from glob import glob
 
 from lokii.config import CONFIG
 from lokii.model.node_module import GenNodeModule
 from lokii.util.module_file_loader import ModuleFileLoader
 from lokii.util.perf_timer_context import PerfTimerContext
 from lokii.parse.base_parser import BaseParser
+from lokii.parse.module_finder import ModuleFinder
+from lokii.parse.parse_cache import ParseCache
+from lokii.lookup_index import LookupIndex
+from lokii.reference import find_refs, module_refs
 
 logger = logging.getLogger("lokii.node_parser")
-NODE_RESOLVER = "**/*%s" % CONFIG.gen.node_ext
 
 
 class NodeParser(BaseParser):
@@ -20,14 +24,18 @@ class NodeParser(BaseParser):
     :type nodes: dict[str, GenNodeModule]
     """
 
-    def __init__(self, source_folder):
+    def __init__(self, source_folder, finder=None):
         """
         Initializes parser.
         :param source_folder: root path of the project
         :type source_folder: str
+        :param finder: module finder that is shared with other parsers
+        :type finder: ModuleFinder
         """
         self.root = source_folder
+        self.finder = finder or ModuleFinder(source_folder)
         self.nodes = {}
+        self.cache = ParseCache()
 
     def parse(self):
         """
@@ -37,6 +45,7 @@ class NodeParser(BaseParser):
         with PerfTimerContext() as t:
             nodes = list(self.__parse_nodes())
             self.nodes = {n.name: n for n in nodes}
+            self.cache.save()
 
         node_count = len(nodes)
         if node_count == 0:
@@ -53,30 +62,155 @@ class NodeParser(BaseParser):
         :return: parsed and validated node modules
         :rtype: list[GenNodeModule]
         """
-        glob_path = path.join(self.root, NODE_RESOLVER)
-        file_paths = [f for f in glob(glob_path, recursive=True)]
+        file_paths = self.finder.files(CONFIG.gen.node_ext)
+        # file reads and hashing overlap between threads, module execution itself
+        # holds the GIL and cached definitions skip it completely
+        with ThreadPoolExecutor(thread_name_prefix="lokii-parse") as executor:
+            return list(executor.map(self.__parse_file, file_paths))
 
-        for fp in file_paths:
+    def __parse_file(self, fp):
+        """
+        :param fp: file path of the node module
+        :type fp: str
+        :return: parsed and validated node module
+        :rtype: GenNodeModule
+        """
+        # extract groups from file path
+        m_groups = path.relpath(fp, self.root).split(path.sep)[:-1]
+
+        # unchanged node modules are not executed until they are generated
+        cached = self.cache.get(fp)
+        if cached is not None:
+            logger.debug("Found cached node `%s`", cached["name"], extra={"at": fp})
+            return GenNodeModule(
+                cached["source"],
+                None,
+                cached["name"],
+                cached["version"],
+                m_groups,
+                path=fp,
+                vectorized=cached["vectorized"],
+                sql_only=cached.get("sql_only", False),
+                refs=[tuple(r) for r in cached.get("refs", [])],
+                lookups=[tuple(r) for r in cached.get("lookups", [])],
+                outputs=cached.get("outputs"),
+            )
+
+        parsed = self.__parse_node(fp, m_groups)
+        definition = {
+            "name": parsed.name,
+            "source": parsed.source,
+            "vectorized": parsed.vectorized,
+            "sql_only": parsed.sql_only,
+            "refs": parsed.refs,
+            "lookups": parsed.lookups,
+            "outputs": parsed.outputs,
+        }
+        self.cache.put(fp, parsed.version, definition)
+        return parsed
+
+    def __parse_node(self, fp, m_groups):
+        """
+        Loads node module and ensures node module configuration is valid.
+
+        :param fp: file path of the node module
+        :type fp: str
+        :param m_groups: groups of the node
+        :type m_groups: list[str]
+        :return: parsed and validated node module
+        :rtype: GenNodeModule
+        """
+        with PerfTimerContext() as t:
             loader = ModuleFileLoader(fp)
             loader.load()
             mod = loader.module
+        logger.debug("Node module imported in %s" % t, extra={"at": fp})
 
-            # extract node name from filename
-            m_name = path.basename(fp).replace(CONFIG.gen.node_ext, "")
-            # extract groups from file path
-            m_groups = path.relpath(fp, self.root).split(path.sep)[:-1]
-            m_version = loader.version
+        # extract node name from filename
+        m_name = path.basename(fp).replace(CONFIG.gen.node_ext, "")
+        m_version = loader.version
 
-            # ensure provided module is valid
-            self.attr(mod, "source", "`source` not found at %s" % fp)
-            self.inst(mod.source, str, "`source` must be str at %s" % fp)
-            self.attr(mod, "item", "`item` not found at %s" % fp)
+        # ensure provided module is valid
+        self.attr(mod, "source", "`source` not found at %s" % fp)
+        self.inst(mod.source, str, "`source` must be str at %s" % fp)
+        m_item, m_items, m_sql_only = None, None, False
+        if self.attr(mod, "sql_only"):
+            self.inst(mod.sql_only, bool, "`sql_only` must be bool at %s" % fp)
+            m_sql_only = mod.sql_only
+        m_columns = None
+        if self.attr(mod, "columns"):
+            self.inst(mod.columns, dict, "`columns` must be dict at %s" % fp)
+            for col, gen in mod.columns.items():
+                self.inst(col, str, "`columns` keys must be str at %s" % fp)
+                assert callable(gen), "`columns.%s` must be callable at %s" % (col, fp)
+            m_columns = mod.columns
+        # nodes without generation functions are created from source query in database
+        if not self.any_attr(mod, ["item", "items", "columns"]):
+            m_sql_only = True
+        if self.attr(mod, "item"):
             self.func(mod.item, "`item` must be function at %s" % fp)
             self.sig(mod.item, 1, "`item` accepts only one param at %s" % fp)
-            if self.attr(mod, "name"):
-                self.inst(mod.name, str, "`name` must be str at %s" % fp)
-                m_name = mod.name
+            m_item = mod.item
+        if self.attr(mod, "items"):
+            self.func(mod.items, "`items` must be function at %s" % fp)
+            self.sig(mod.items, 1, "`items` accepts only one param at %s" % fp)
+            assert m_item is None, (
+                "`item` and `items` can not be used together at %s" % fp
+            )
+            m_items = mod.items
+        if self.attr(mod, "init"):
+            self.func(mod.init, "`init` must be function at %s" % fp)
+            self.sig(mod.init, 0, "`init` accepts no params at %s" % fp)
+        if self.attr(mod, "name"):
+            self.inst(mod.name, str, "`name` must be str at %s" % fp)
+            m_name = mod.name
+        m_outputs = None
+        if self.attr(mod, "outputs"):
+            self.inst(mod.outputs, list, "`outputs` must be list at %s" % fp)
+            assert len(mod.outputs) > 0, "`outputs` can not be empty at %s" % fp
+            for out in mod.outputs:
+                self.inst(out, str, "`outputs` items must be str at %s" % fp)
+            assert len(set(mod.outputs)) == len(mod.outputs), (
+                "`outputs` must be unique at %s" % fp
+            )
+            assert m_item is not None or m_items is not None, (
+                "`outputs` require `item` or `items` at %s" % fp
+            )
+            assert m_columns is None, (
+                "`outputs` and `columns` can not be used together at %s" % fp
+            )
+            assert not m_sql_only, (
+                "`outputs` and `sql_only` can not be used together at %s" % fp
+            )
+            m_outputs = mod.outputs
+
+        # parent columns referenced in generation functions are found in module source
+        m_refs = module_refs(mod)
+        m_lookups = module_refs(mod, LookupIndex)
+        if path.isfile(fp):
+            with tokenize.open(fp) as _f:
+                src = _f.read()
+            m_refs += [r for r in find_refs(src) if r not in m_refs]
+            found = find_refs(src, "lookup", ("table", "key"))
+            m_lookups += [r for r in found if r not in m_lookups]
 
-            parsed = GenNodeModule(mod.source, mod.item, m_name, m_version, m_groups)
-            logger.debug("Found valid node `%s`", m_name, extra={"at": fp})
-            yield parsed
+        if m_sql_only:
+            # generation functions are not used for sql only nodes
+            m_item, m_items, m_columns = None, None, None
+            m_refs, m_lookups = [], []
+        parsed = GenNodeModule(
+            mod.source,
+            m_item,
+            m_name,
+            m_version,
+            m_groups,
+            m_items,
+            fp,
+            sql_only=m_sql_only,
+            columns=m_columns,
+            refs=m_refs,
+            lookups=m_lookups,
+            outputs=m_outputs,
+        )
+        logger.debug("Found valid node `%s`", m_name, extra={"at": fp})
+        return parsed
@@ -0,0 +1,112 @@
+import hashlib
+import json
+import logging
+import os
+import threading
+
+from lokii.config import CONFIG
+from lokii.util.module_file_loader import ModuleFileLoader
+
+logger = logging.getLogger("lokii.parse_cache")
+
+
+class ParseCache:
+    """
+    Persistent cache of parsed module definitions keyed by file path. An entry is valid
+    while file modification time and size are the same, or file content hash still matches
+    the cached version, so unchanged modules are not executed to read their definitions.
+    All entries are dropped if lokii version, `LOKII__` variables or environment variables
+    listed in `LOKII__TEMP_PARSE_CACHE_ENV` change, since module level values like `source`
+    are often built from them. Unrelated variables like `OLDPWD` are ignored. Values
+    imported from other project modules are not tracked, a node file must be changed or the
+    cache file deleted if they change.
+
+    :var entries: cached definitions keyed by absolute file path
+    :type entries: dict[str, dict]
+    """
+
+    def __init__(self, file_path: str = None):
+        """
+        :param file_path: path of the cache file, configured parse cache path by default
+        """
+        self.file_path = file_path or CONFIG.temp.parse_cache_path
+        self.entries = {}
+        self.__dirty = False
+        self.__lock = threading.Lock()
+
+        if os.path.exists(self.file_path):
+            try:
+                with open(self.file_path) as _f:
+                    data = json.loads(_f.read())
+                # parsed definitions may change between lokii versions and environments
+                if [data.get("lokii"), data.get("env")] == [CONFIG.version, env_key()]:
+                    self.entries = data["entries"]
+            except (OSError, ValueError, KeyError):
+                logger.debug(
+                    "Invalid parse cache ignored", extra={"at": self.file_path}
+                )
+
+    def get(self, file_path: str) -> dict or None:
+        """
+        :param file_path: path of the module file
+        :return: cached definition, `None` if file is changed or not cached
+        """
+        key = os.path.abspath(file_path)
+        entry = self.entries.get(key)
+        if entry is None or not os.path.isfile(key):
+            return None
+
+        stat = os.stat(key)
+        if [entry["mtime"], entry["size"]] == [stat.st_mtime_ns, stat.st_size]:
+            return entry
+        # file is touched, it is still valid if content is not changed
+        if ModuleFileLoader.file_version(key) != entry["version"]:
+            return None
+        with self.__lock:
+            entry["mtime"], entry["size"] = stat.st_mtime_ns, stat.st_size
+            self.__dirty = True
+        return entry
+
+    def put(self, file_path: str, version: str, definition: dict) -> None:
+        """
+        :param file_path: path of the module file
+        :param version: content hash of the module file
+        :param definition: parsed definition that can be serialized to json
+        """
+        key = os.path.abspath(file_path)
+        if not os.path.isfile(key):
+            return
+        stat = os.stat(key)
+        entry = {"mtime": stat.st_mtime_ns, "size": stat.st_size, "version": version}
+        with self.__lock:
+            self.entries[key] = {**definition, **entry}
+            self.__dirty = True
+
+    def save(self) -> None:
+        """
+        Writes cache file if any entry is changed.
+        """
+        with self.__lock:
+            if not self.__dirty:
+                return
+            dir_path = os.path.dirname(self.file_path)
+            if dir_path and not os.path.exists(dir_path):
+                os.makedirs(dir_path, exist_ok=True)
+            data = {"lokii": CONFIG.version, "env": env_key(), "entries": self.entries}
+            with open(self.file_path + ".tmp", "w") as _f:
+                _f.write(json.dumps(data))
+            os.replace(self.file_path + ".tmp", self.file_path)
+            self.__dirty = False
+
+
+def env_key() -> str:
+    """
+    :return: hash of `LOKII__` and configured environment variables that modules may read
+    when they are loaded
+    """
+    allowed = set(CONFIG.temp.parse_cache_env)
+    env = [
+        (k, v) for k, v in os.environ.items() if k.startswith("LOKII__") or k in allowed
+    ]
+    env = json.dumps(sorted(env))
+    return hashlib.blake2b(env.encode(), digest_size=16).hexdigest()
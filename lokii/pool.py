@@ -0,0 +1,133 @@
+import hashlib
+import json
+import os
+import random
+import threading
+from typing import Callable, Any
+
+import numpy as np
+import pyarrow as pa
+import pyarrow.ipc as ipc
+
+from lokii.config import CONFIG
+
+# pools loaded in the current process, keyed by pool key
+_loaded = {}
+_lock = threading.Lock()
+
+
+class ValuePool:
+    """
+    Fixed number of pre-generated values that are drawn by random indexes instead of
+    generating a new value for each row. Values are generated once, stored on disk as an
+    arrow file and memory-mapped read-only by every worker, so all workers share the same
+    pages. Pools can be used in `item` with `sample()`, in `items` with `sample(size)` or
+    directly as a column generator in `columns`.
+
+    :var key: content address of the pool values
+    :type key: str
+    :var size: number of values in the pool
+    :type size: int
+    """
+
+    def __init__(self, key: str, generate: Callable[[int], list], size: int = None):
+        """
+        :param key: unique identifier of the generated values
+        :param generate: function that generates given number of values
+        :param size: number of values in the pool, configured pool size by default
+        """
+        self.size = size or CONFIG.pool.size
+        self.key = hashlib.blake2b(
+            json.dumps([key, self.size]).encode(), digest_size=16
+        ).hexdigest()
+        self.generate = generate
+        self.__list = None
+
+    @property
+    def path(self) -> str:
+        return os.path.join(CONFIG.pool.dir_path, self.key + ".arrow")
+
+    @property
+    def values(self) -> pa.Array:
+        """
+        :return: memory-mapped pool values, generated and stored on first access
+        """
+        if self.key not in _loaded:
+            with _lock:
+                if self.key not in _loaded:
+                    if not os.path.exists(self.path):
+                        self.__store()
+                    reader = ipc.open_file(pa.memory_map(self.path))
+                    _loaded[self.key] = reader.read_all().column(0).combine_chunks()
+        return _loaded[self.key]
+
+    def __store(self) -> None:
+        os.makedirs(CONFIG.pool.dir_path, exist_ok=True)
+        table = pa.table({"value": self.generate(self.size)})
+        # other processes may generate the same pool, only complete files are visible
+        temp_path = "%s.%d.tmp" % (self.path, os.getpid())
+        with ipc.new_file(temp_path, table.schema) as writer:
+            writer.write_table(table)
+        os.replace(temp_path, self.path)
+
+    def sample(self, size: int = None, rng: np.random.Generator = None) -> Any:
+        """
+        Draws values from the pool with uniformly sampled indexes.
+
+        :param size: number of values, a single value is returned if not given
+        :param rng: random number generator of vectorized draws, global numpy random by
+        default
+        :return: single value or numpy array of values
+        """
+        if size is None:
+            if self.__list is None:
+                self.__list = self.values.to_pylist()
+            return self.__list[random.randrange(len(self.__list))]
+        if rng is None:
+            indexes = np.random.randint(0, len(self.values), size)
+        else:
+            indexes = rng.integers(0, len(self.values), size)
+        return self.values.take(pa.array(indexes)).to_numpy(zero_copy_only=False)
+
+    def __call__(self, ctx) -> np.ndarray:
+        # column generator protocol of `lokii.columns`
+        return self.sample(ctx.size, ctx.rng)
+
+    def __getstate__(self):
+        # loaded values are not copied to other processes, they are memory-mapped again
+        state = self.__dict__.copy()
+        state["_ValuePool__list"] = None
+        return state
+
+
+def _faker_values(provider: str, locale: str, seed: int, kwargs: dict, size: int):
+    try:
+        from faker import Faker
+    except ImportError:
+        raise ImportError("Faker pools require `faker` package to be installed")
+    fake = Faker(locale)
+    fake.seed_instance(seed)
+    func = getattr(fake, provider)
+    return [func(**kwargs) for _ in range(size)]
+
+
+def faker(
+    provider: str, size: int = None, locale: str = None, seed: int = 0, **kwargs
+) -> ValuePool:
+    """
+    Creates a pool of values generated by given Faker provider, e.g. `faker("city")`.
+    Pools are cached on disk by provider, arguments, locale, seed and size.
+
+    :param provider: name of the Faker provider method
+    :param size: number of values in the pool, configured pool size by default
+    :param locale: Faker locale, Faker default locale if not given
+    :param seed: seed of the Faker instance that generates the values
+    :param kwargs: arguments of the provider method
+    :return: value pool
+    """
+
+    def generate(n: int) -> list:
+        return _faker_values(provider, locale, seed, kwargs, n)
+
+    key = json.dumps(["faker", provider, locale, seed, kwargs], default=str)
+    return ValuePool(key, generate, size)
@@ -0,0 +1,261 @@
+import ast
+import os
+import random
+import threading
+from bisect import bisect_right
+from typing import Any, Sequence
+
+import numpy as np
+
+# exported column files of the current node generation, keyed by table and columns
+_paths = {}
+# column files memory-mapped in the current process, keyed by file path
+_loaded = {}
+# references created in the current process, keyed by table, column and weights
+_refs = {}
+
+
+class Reference:
+    """
+    Samples values of a generated parent node column, e.g. foreign keys of child rows.
+    Parent columns are exported once as numpy files before the child node is generated
+    and memory-mapped read-only by every worker, so sampling does not touch the database.
+    References can be used in `item` with `sample()`, in `items` with `sample(size)` or
+    directly as a column generator in `columns`.
+
+    :var table: name of the parent node
+    :type table: str
+    :var column: name of the sampled parent column
+    :type column: str
+    :var weights: name of the parent column that holds relative weight of each row
+    :type weights: str or None
+    """
+
+    def __init__(self, table: str, column: str, weights: str = None):
+        """
+        :param table: name of the parent node
+        :param column: name of the sampled parent column
+        :param weights: name of the parent column that holds relative weight of each
+        row, rows are sampled uniformly if not given
+        """
+        self.table = table
+        self.column = column
+        self.weights = weights
+        # exported files of the reference, weights are exported with values
+        self.key = (table, column) if weights is None else (table, column, weights)
+        # cumulative distributions of sampled row positions, keyed by distribution
+        self.__cdf = {}
+
+    @staticmethod
+    def load(key: tuple[str, ...]) -> list[np.ndarray]:
+        """
+        :param key: name of the parent node and its exported columns
+        :return: memory-mapped values of each column, rows are aligned between columns
+        """
+        if key not in _paths:
+            raise KeyError(
+                "Reference `%s.%s` is not exported, use string literals in "
+                "`lokii.ref` calls so it can be found when node is parsed"
+                % (key[0], ",".join(key[1:]))
+            )
+        for file_path in _paths[key]:
+            if file_path not in _loaded:
+                _loaded[file_path] = np.load(file_path, mmap_mode="r")
+        return [_loaded[f] for f in _paths[key]]
+
+    @property
+    def values(self) -> np.ndarray:
+        values = self.load(self.key)[0]
+        if len(values) == 0:
+            raise ValueError(
+                "Reference `%s.%s` can not be sampled, parent node `%s` has no rows"
+                % (self.table, self.column, self.table)
+            )
+        return values
+
+    @property
+    def sources(self) -> list[tuple[str, ...]]:
+        """
+        :return: parent table and columns read by the reference
+        """
+        return [self.key]
+
+    def __cdf_of(self, key: Any) -> np.ndarray or None:
+        """
+        :param key: `None` for configured row weights or zipf exponent
+        :return: cumulative distribution of row positions, `None` if uniform
+        """
+        if key is None and self.weights is None:
+            return None
+        file_path = _paths.get(self.key, [None])[0]
+        if (file_path, key) not in self.__cdf:
+            # empty parent columns fail before their distribution is computed
+            values = self.values
+            if key is None:
+                p = np.asarray(self.load(self.key)[1], dtype=float)
+            else:
+                p = 1.0 / np.arange(1, len(values) + 1, dtype=float) ** key
+            cdf = np.cumsum(p)
+            self.__cdf[(file_path, key)] = cdf / cdf[-1]
+        return self.__cdf[(file_path, key)]
+
+    def __draw(self, cdf: np.ndarray or None, size: int, rng) -> Any:
+        values = self.values
+        if size is None:
+            # single draws use python random, it is much faster than numpy for scalars
+            if cdf is None:
+                return values[random.randrange(len(values))].item()
+            i = min(bisect_right(cdf, random.random()), len(values) - 1)
+            return values[i].item()
+
+        if cdf is None and rng is None:
+            indexes = np.random.randint(0, len(values), size)
+        elif cdf is None:
+            indexes = rng.integers(0, len(values), size)
+        else:
+            u = np.random.random(size) if rng is None else rng.random(size)
+            indexes = np.minimum(np.searchsorted(cdf, u, "right"), len(values) - 1)
+        return values[indexes]
+
+    def sample(self, size: int = None, rng: np.random.Generator = None) -> Any:
+        """
+        Draws parent values uniformly or by configured row weights.
+
+        :param size: number of values, a single value is returned if not given
+        :param rng: random number generator of vectorized draws, global numpy random by
+        default
+        :return: single value or numpy array of values
+        """
+        return self.__draw(self.__cdf_of(None), size, rng)
+
+    def zipf(
+        self, a: float = 1.0, size: int = None, rng: np.random.Generator = None
+    ) -> Any:
+        """
+        Draws parent values with zipf distributed row ranks, so first parent rows are
+        referenced much more than the last ones.
+
+        :param a: distribution exponent, larger values skew more
+        :param size: number of values, a single value is returned if not given
+        :param rng: random number generator of vectorized draws, global numpy random by
+        default
+        :return: single value or numpy array of values
+        """
+        return self.__draw(self.__cdf_of(float(a)), size, rng)
+
+    def __call__(self, ctx) -> np.ndarray:
+        # column generator protocol of `lokii.columns`
+        return self.sample(ctx.size, ctx.rng)
+
+    def __getstate__(self):
+        # distributions are computed again from memory-mapped columns in other processes
+        state = self.__dict__.copy()
+        state["_Reference__cdf"] = {}
+        return state
+
+
+def ref(table: str, column: str, weights: str = None) -> Reference:
+    """
+    Creates a reference to a column of a parent node, e.g.
+    `lokii.ref("employees", "employee_number")`. Parent node becomes a dependency of the
+    node, so it is generated before. Table, column and weights names must be string
+    literals to be found when the node is parsed.
+
+    :param table: name of the parent node
+    :param column: name of the sampled parent column
+    :param weights: name of the parent column that holds relative weight of each row
+    :return: parent column reference
+    """
+    key = (table, column, weights)
+    if key not in _refs:
+        _refs[key] = Reference(table, column, weights)
+    return _refs[key]
+
+
+def bind(paths: dict[tuple[str, ...], list[str]]) -> None:
+    """
+    Sets exported column files that references of the current node generation read.
+
+    :param paths: exported file paths of each column keyed by table and columns
+    """
+    _paths.update(paths)
+
+
+def store(values: np.ndarray, file_path: str) -> None:
+    """
+    Writes exported column values to a numpy file that can be memory-mapped.
+
+    :param values: column values
+    :param file_path: path of the numpy file
+    """
+    if values.dtype == object:
+        # memory-mapped files require fixed width values instead of python objects
+        values = values.astype(str)
+    os.makedirs(os.path.dirname(file_path), exist_ok=True)
+    # temp file is unique to the writing thread, so concurrent writers do not collide
+    temp_path = "%s.%d.%d.tmp" % (file_path, os.getpid(), threading.get_ident())
+    with open(temp_path, "wb") as _f:
+        np.save(_f, values)
+    os.replace(temp_path, file_path)
+
+
+def find_refs(
+    source: str, func: str = "ref", args: Sequence[str] = ("table", "column", "weights")
+) -> list[tuple[str, ...]]:
+    """
+    Finds parent columns referenced with `ref` like calls in node module source.
+
+    :param source: source code of the node module
+    :param func: name of the called function
+    :param args: parameter names of the function, first one is the parent table and the
+    rest are its columns
+    :return: referenced table and its given columns, e.g. values and weights
+    :raises ValueError: if an optional column of a literal reference is not a literal
+    """
+    found = []
+    for node in ast.walk(ast.parse(source)):
+        if not isinstance(node, ast.Call):
+            continue
+        f = node.func
+        name = f.attr if isinstance(f, ast.Attribute) else getattr(f, "id", "")
+        if name != func:
+            continue
+        params = dict(zip(args, node.args))
+        params.update({k.arg: k.value for k in node.keywords if k.arg})
+        lits = {
+            k: v.value
+            for k, v in params.items()
+            if isinstance(v, ast.Constant) and isinstance(v.value, str)
+        }
+        if args[0] not in lits or args[1] not in lits:
+            continue
+        # reference would be exported without its optional columns, e.g. uniformly
+        for a in args[2:]:
+            v = params.get(a)
+            if a not in lits and getattr(v, "value", v) is not None:
+                raise ValueError(
+                    "`%s` of reference `%s.%s` must be a string literal at line %d"
+                    % (a, lits[args[0]], lits[args[1]], node.lineno)
+                )
+        key = tuple([lits[args[0]]] + [lits[a] for a in args[1:] if a in lits])
+        if key not in found:
+            found.append(key)
+    return found
+
+
+def module_refs(mod: Any, cls: type = Reference) -> list[tuple[str, ...]]:
+    """
+    Finds references that are created when node module is loaded.
+
+    :param mod: loaded node module
+    :param cls: class of the references with `sources` property
+    :return: referenced table and its columns, e.g. values and weights
+    """
+    found, values = [], list(vars(mod).values())
+    # references are also declared directly in `columns`
+    values += [v for d in values if isinstance(d, dict) for v in d.values()]
+    for value in values:
+        if not isinstance(value, cls):
+            continue
+        found += [s for s in value.sources if s not in found]
+    return found
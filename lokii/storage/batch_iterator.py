@@ -24,13 +24,14 @@ class BatchIterator:
         self.node_name = node_name
         self.cur_batch = 0
 
+        # node table is queried once and streamed in batches
+        q = "SELECT * FROM %s" % self.node_name
+        self.__stream = self.data_storage.stream(q, CONFIG.gen.batch_size)
+
     def __iter__(self):
         return self
 
     def __next__(self):
-        q = "SELECT * FROM %s" % self.node_name
-        data = self.data_storage.exec(q, self.cur_batch, CONFIG.gen.batch_size)
-        if len(data) > 0:
-            self.cur_batch += 1
-            return data
-        raise StopIteration
+        data = next(self.__stream)
+        self.cur_batch += 1
+        return data.to_pylist()
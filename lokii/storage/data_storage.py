@@ -1,13 +1,57 @@
+import hashlib
+import json
 import logging
 import os.path
-from functools import partial
+import threading
 
 import duckdb
-from typing import TypedDict, Callable
+import numpy as np
+import pyarrow as pa
+from typing import TypedDict, Iterator
 
 from lokii.config import CONFIG
+from lokii.storage.temp_format import find_format
 
-NodeMetadata = TypedDict("NodeMetadata", {"name": str, "version": str, "gen_id": str})
+# table that holds materialized source query result of a node
+SOURCE_TABLE = "__src_%s"
+# column that holds stable row id of each materialized source row
+SOURCE_INDEX = "__index"
+# table that holds generated batches of a node until generation is completed
+STAGE_TABLE = "__gen_%s"
+
+# concurrent connects to the same database file in a process conflict while attaching it
+_connect_lock = threading.Lock()
+
+NodeMetadata = TypedDict(
+    "NodeMetadata",
+    {
+        "name": str,
+        "version": str,
+        "gen_id": str,
+        "fingerprint": str,
+        "dep_key": str,
+    },
+)
+NodeStats = TypedDict(
+    "NodeStats", {"name": str, "elapsed": float, "item_count": int, "rate": float}
+)
+BatchCheckpoint = TypedDict(
+    "BatchCheckpoint",
+    {
+        "version": str,
+        "batch": int,
+        "source_count": int,
+        "item_count": int,
+        "files": list[str],
+        "dep_key": str,
+    },
+)
+
+
+def _exists(conn: duckdb.DuckDBPyConnection, table: str) -> bool:
+    q = "SELECT COUNT() FROM duckdb_tables() WHERE table_name = ?;"
+    (count,) = conn.execute(q, [table]).fetchone()
+    return count > 0
 
 
 class DataStorage:
@@ -16,7 +60,8 @@ class DataStorage:
         Temporary filesystem storage implementation for storing data generated between batches.
         It only stores data temporary and deletes all files after
         """
-        self.connect = partial(duckdb.connect, database=CONFIG.temp.db_path)
+        with _connect_lock:
+            self.__db = duckdb.connect(database=CONFIG.temp.db_path)
         with self.connect() as conn:
             # create node meta table to store run generation information
             q = (
@@ -24,6 +69,44 @@ class DataStorage:
                 "(name TEXT, version TEXT, gen_id TEXT, PRIMARY KEY(name));"
             )
             conn.execute(q).fetchall()
+            # content fingerprint of the node data and fingerprint key of its dependencies
+            for col in ["fingerprint", "dep_key"]:
+                q = "ALTER TABLE __meta ADD COLUMN IF NOT EXISTS %s TEXT;" % col
+                conn.execute(q).fetchall()
+            # create stats table to store generation timings of previous runs
+            q = (
+                "CREATE TABLE IF NOT EXISTS __stats(name TEXT, elapsed DOUBLE,"
+                " item_count BIGINT, rate DOUBLE, PRIMARY KEY(name));"
+            )
+            conn.execute(q).fetchall()
+            # create checkpoint table to store persisted batches of unfinished nodes
+            q = (
+                "CREATE TABLE IF NOT EXISTS __checkpoint"
+                "(name TEXT, version TEXT, batch INTEGER, source_count BIGINT,"
+                " item_count BIGINT, files TEXT, PRIMARY KEY(name, version, batch));"
+            )
+            conn.execute(q).fetchall()
+            # fingerprint key of node dependencies that the batches are generated from
+            q = "ALTER TABLE __checkpoint ADD COLUMN IF NOT EXISTS dep_key TEXT;"
+            conn.execute(q).fetchall()
+
+        # column types of staged batches for each node, `None` if type is not known yet
+        self.__staged = {}
+
+    def connect(self) -> duckdb.DuckDBPyConnection:
+        """
+        Database is opened once and every call gets its own cursor, so nodes, prefetch
+        and writer threads can use the database concurrently.
+
+        :return: new cursor of the database connection
+        """
+        return self.__db.cursor()
+
+    def close(self) -> None:
+        """
+        Closes the database connection, cursors can not be used after it is closed.
+        """
+        self.__db.close()
 
     def deps(self, query: str) -> list:
         names = duckdb.get_table_names(query)
@@ -41,34 +124,170 @@ class DataStorage:
             logging.error("Error occurred while executing count query:\n\n%s\n" % q)
             raise err
 
-    def exec(self, query: str, index: int, size: int) -> list[dict]:
-        args = (query, size, index * size)
-        q = "WITH _t AS (%s) SELECT * FROM _t LIMIT %d OFFSET %d;" % args
-        if CONFIG.data.disable_optimizers:
-            q = "pragma disable_optimizer; " + q
-        try:
-            with self.connect() as conn:
-                data = conn.execute(q).fetch_df()
-                return data.to_dict("records")
-        except duckdb.Error as err:
-            logging.error("Error occurred while executing source query:\n\n%s\n" % q)
-            raise err
+    def materialize(self, name: str, query: str) -> int:
+        """
+        Executes node source query only once and stores its result in a source table with
+        stable row ids, so counting and batch reads do not re-execute the source query.
+
+        :param name: name of the node
+        :param query: source query of the node
+        :return: row count of the source query result
+        """
+        table = SOURCE_TABLE % name
+        q = "CREATE OR REPLACE TABLE %s AS SELECT row_number() OVER () - 1 AS %s, * FROM (%s);"
+        q = q % (table, SOURCE_INDEX, query)
+        with self.connect() as conn:
+            if CONFIG.data.disable_optimizers:
+                conn.execute("PRAGMA disable_optimizer;")
+            try:
+                conn.execute(q).fetchall()
+            except duckdb.Error as err:
+                logging.error(
+                    "Error occurred while executing source query:\n\n%s\n" % q
+                )
+                raise err
+            (count,) = conn.execute("SELECT COUNT() FROM %s;" % table).fetchone()
+            return count
+
+    def source(self, name: str, size: int, start: int = 0) -> Iterator[pa.RecordBatch]:
+        """
+        Streams materialized source rows of the node in batches ordered by their stable
+        row ids in `__index` column, so each batch covers a fixed range of rows.
+
+        :param name: name of the node
+        :param size: number of rows in each batch
+        :param start: row id of the first streamed row
+        :return: iterator of source batches
+        """
+        q = "SELECT * FROM %s WHERE %s >= %d ORDER BY %s"
+        q = q % (SOURCE_TABLE % name, SOURCE_INDEX, start, SOURCE_INDEX)
+        return self.stream(q, size)
+
+    def stage(self, name: str, query: str) -> int:
+        """
+        Creates the stage table of the node directly from given query, so node data is
+        generated inside the database without transferring rows to workers.
+
+        :param name: name of the node
+        :param query: source query of the node
+        :return: row count of the created stage table
+        """
+        self.discard(name)
+        table = STAGE_TABLE % name
+        q = "CREATE TABLE %s AS %s;" % (table, query)
+        with self.connect() as conn:
+            if CONFIG.data.disable_optimizers:
+                conn.execute("PRAGMA disable_optimizer;")
+            try:
+                conn.execute(q).fetchall()
+            except duckdb.Error as err:
+                logging.error(
+                    "Error occurred while executing source query:\n\n%s\n" % q
+                )
+                raise err
+            (count,) = conn.execute("SELECT COUNT() FROM %s;" % table).fetchone()
+            return count
+
+    def exists(self, table: str) -> bool:
+        """
+        :param table: name of the table
+        :return: `True` if table exists in database
+        """
+        with self.connect() as conn:
+            return _exists(conn, table)
+
+    def release(self, name: str) -> None:
+        """
+        Drops materialized source table of the node.
+
+        :param name: name of the node
+        """
+        with self.connect() as conn:
+            conn.execute("DROP TABLE IF EXISTS %s;" % (SOURCE_TABLE % name)).fetchall()
+
+    def stream(self, query: str, size: int) -> Iterator[pa.RecordBatch]:
+        """
+        Executes given query only once and streams its result in batches from a single
+        connection using record batch fetching.
+
+        :param query: query to execute
+        :param size: number of rows in each batch
+        :return: iterator of result batches
+        """
+        with self.connect() as conn:
+            if CONFIG.data.disable_optimizers:
+                conn.execute("PRAGMA disable_optimizer;")
+            try:
+                reader = conn.execute(query).fetch_record_batch(size)
+            except duckdb.Error as err:
+                logging.error("Error occurred while executing query:\n\n%s\n" % query)
+                raise err
+            for batch in reader:
+                yield batch
+
+    def schema(self, name: str) -> pa.Schema:
+        """
+        :param name: name of the node
+        :return: arrow schema of the node table
+        """
+        with self.connect() as conn:
+            return conn.execute("SELECT * FROM %s LIMIT 0;" % name).arrow().schema
+
+    def columns(self, name: str, columns: list[str]) -> list[np.ndarray]:
+        """
+        Fetches values of node columns in insertion order from a single query, rows with
+        a null value in any of the columns are skipped, so values stay aligned by row.
+
+        :param name: name of the node
+        :param columns: names of the columns
+        :return: values of each column
+        """
+        cols = ", ".join('"%s" AS _c%d' % (c, i) for i, c in enumerate(columns))
+        cond = " AND ".join('"%s" IS NOT NULL' % c for c in columns)
+        q = "SELECT %s FROM %s WHERE %s;" % (cols, name, cond)
+        with self.connect() as conn:
+            data = conn.execute(q).fetchnumpy()
+        return [np.asarray(data["_c%d" % i]) for i in range(len(columns))]
 
-    def save(self, gen_id: str, name: str, version: str) -> None:
+    def fingerprint(self, name: str) -> str:
         """
-        Generation id and node version will be stored in a meta table that can be used to check
-        if gen run data is valid for consecutive runs.
+        Computes content fingerprint of the node data with an order independent hash
+        aggregate of its rows. Fingerprint changes only if rows or column types change.
+
+        :param name: name of the node
+        :return: content fingerprint
+        """
+        with self.connect() as conn:
+            q = "SELECT COUNT(), SUM(hash(_t)::HUGEINT) FROM %s AS _t;" % name
+            count, row_hash = conn.execute(q).fetchone()
+            cols = conn.execute("DESCRIBE %s;" % name).fetchall()
+        key = "%d:%s:%s" % (count, row_hash, [(c[0], c[1]) for c in cols])
+        return hashlib.blake2b(key.encode(), digest_size=16).hexdigest()
+
+    def save(
+        self,
+        gen_id: str,
+        name: str,
+        version: str,
+        fingerprint: str = None,
+        dep_key: str = None,
+    ) -> None:
+        """
+        Generation id, node version, content fingerprint and dependency key will be stored in
+        a meta table that can be used to check if gen run data is valid for consecutive runs.
 
         :param gen_id: identification of the generation process
         :param name: identification of the node
         :param version: the code version of the module
+        :param fingerprint: content fingerprint of the generated node data
+        :param dep_key: fingerprint key of node dependencies used in generation
         """
         with self.connect() as conn:
             q = """
-            INSERT OR REPLACE INTO __meta(name, version, gen_id)
-            VALUES ('%s', '%s', '%s');
+            INSERT OR REPLACE INTO __meta(name, version, gen_id, fingerprint, dep_key)
+            VALUES (?, ?, ?, ?, ?);
             """
-            conn.execute(q % (name, version, gen_id)).fetchall()
+            conn.execute(q, [name, version, gen_id, fingerprint, dep_key]).fetchall()
 
     def meta(self, names: list[str]) -> list[NodeMetadata]:
         """
@@ -78,9 +297,55 @@ class DataStorage:
         """
         with self.connect() as conn:
             keys = ",".join(["'%s'" % n for n in names])
-            q = "SELECT name, version, gen_id FROM __meta WHERE name IN (%s);"
-            data = conn.execute(q % keys).fetch_df()
-            return data.to_dict("records")
+            q = "SELECT name, version, gen_id, fingerprint, dep_key FROM __meta"
+            q += " WHERE name IN (%s);"
+            data = conn.execute(q % keys).fetchall()
+            keys = list(NodeMetadata.__annotations__.keys())
+            return [dict(zip(keys, row)) for row in data]
+
+    def save_stats(self, name: str, elapsed: float, item_count: int) -> None:
+        """
+        Stores generation timing of the node to estimate its cost in consecutive runs.
+
+        :param name: identification of the node
+        :param elapsed: wall time of the node generation in seconds
+        :param item_count: generated item count
+        """
+        rate = item_count / elapsed if elapsed > 0 else 0.0
+        with self.connect() as conn:
+            q = "INSERT OR REPLACE INTO __stats VALUES (?, ?, ?, ?);"
+            conn.execute(q, [name, elapsed, item_count, rate]).fetchall()
+
+    def stats(self, names: list[str]) -> dict[str, NodeStats]:
+        """
+        Fetches generation timings of given nodes from previous runs.
+
+        :param names: list of node names
+        :return: node stats dict keyed by node name
+        """
+        if len(names) == 0:
+            return {}
+        with self.connect() as conn:
+            q = "SELECT name, elapsed, item_count, rate FROM __stats"
+            q += " WHERE name IN (%s);" % ",".join(["?"] * len(names))
+            data = conn.execute(q, names).fetchall()
+            keys = list(NodeStats.__annotations__.keys())
+            return {row[0]: dict(zip(keys, row)) for row in data}
+
+    def sizes(self, names: list[str]) -> dict[str, int]:
+        """
+        Fetches estimated row counts of given tables from database catalog, tables are
+        not scanned.
+
+        :param names: list of table names
+        :return: estimated row count keyed by name of existing tables
+        """
+        if len(names) == 0:
+            return {}
+        with self.connect() as conn:
+            q = "SELECT table_name, estimated_size FROM duckdb_tables()"
+            q += " WHERE table_name IN (%s);" % ",".join(["?"] * len(names))
+            return dict(conn.execute(q, names).fetchall())
 
     def cols(self, name) -> list[str]:
         """
@@ -94,25 +359,188 @@ class DataStorage:
             data = conn.execute(q % name).fetchall()
             return [col[0] for col in data]
 
+    def append(
+        self, name: str, batch: pa.Table or None, checkpoint: BatchCheckpoint = None
+    ) -> None:
+        """
+        Appends generated batch to the stage table of the node through a registered arrow
+        relation without writing any temp files. Columns that are introduced or typed
+        later than the first batch are added or widened in the stage table. If checkpoint
+        is given it is recorded in the same transaction with the batch.
+
+        :param name: node name of the module
+        :param batch: generated batch, `None` if only checkpoint will be recorded
+        :param checkpoint: checkpoint of the persisted batch
+        """
+        self.append_outputs({name: (batch, checkpoint)})
+
+    def append_outputs(
+        self,
+        batches: dict[str, tuple[pa.Table or None, BatchCheckpoint or None]],
+        stage_files: bool = False,
+    ) -> None:
+        """
+        Appends generated batches of several output tables and records their checkpoints
+        in a single transaction, so outputs of a node always complete the same batches.
+
+        :param batches: generated batch and checkpoint of each output table
+        :param stage_files: append temp files of checkpoints to the stage table before
+        the batch, so rows keep batch order even if some batches are written to files
+        """
+        staged = []
+        with self.connect() as conn:
+            conn.begin()
+            for name, (batch, checkpoint) in batches.items():
+                if stage_files and checkpoint is not None:
+                    # files are read one by one, each holds at most a batch of rows
+                    for f in checkpoint["files"]:
+                        q = "SELECT * FROM %s;" % find_format(f).scan(conn, [f])
+                        self.__append(conn, name, conn.execute(q).fetch_arrow_table())
+                    staged += checkpoint["files"]
+                    checkpoint = {**checkpoint, "files": []}
+                if batch is not None and batch.num_rows > 0:
+                    self.__append(conn, name, batch)
+                if checkpoint is not None:
+                    q = (
+                        "INSERT OR REPLACE INTO __checkpoint(name, version, batch,"
+                        " source_count, item_count, files, dep_key)"
+                        " VALUES (?, ?, ?, ?, ?, ?, ?);"
+                    )
+                    c = checkpoint
+                    params = [name, c["version"], c["batch"], c["source_count"]]
+                    params += [c["item_count"], json.dumps(c["files"])]
+                    params += [c.get("dep_key")]
+                    conn.execute(q, params).fetchall()
+            conn.commit()
+        for f in staged:
+            os.remove(f)
+
+    def __append(self, conn: duckdb.DuckDBPyConnection, name: str, batch: pa.Table):
+        table = STAGE_TABLE % name
+        # columns that contain only nulls do not carry type information
+        nulls = {f.name for f in batch.schema if pa.types.is_null(f.type)}
+        conn.register("__batch", batch)
+        types = conn.execute("DESCRIBE SELECT * FROM __batch;").fetchall()
+        types = {c[0]: None if c[0] in nulls else c[1] for c in types}
+
+        staged = self.__staged.get(name)
+        if staged is None and _exists(conn, table):
+            # continue appending to the stage table of a resumed generation
+            staged = {
+                c[0]: c[1] for c in conn.execute("DESCRIBE %s;" % table).fetchall()
+            }
+            self.__staged[name] = staged
+        if staged is None:
+            q = "CREATE OR REPLACE TABLE %s AS SELECT * FROM __batch;" % table
+            conn.execute(q).fetchall()
+            self.__staged[name] = types
+            return
+
+        for col, col_type in types.items():
+            if col not in staged:
+                q = 'ALTER TABLE %s ADD COLUMN "%s" %s;'
+                conn.execute(q % (table, col, col_type or "INTEGER")).fetchall()
+                staged[col] = col_type
+            elif staged[col] is None and col_type is not None:
+                q = 'ALTER TABLE %s ALTER "%s" TYPE %s;'
+                conn.execute(q % (table, col, col_type)).fetchall()
+                staged[col] = col_type
+        q = "INSERT INTO %s BY NAME SELECT * FROM __batch;" % table
+        conn.execute(q).fetchall()
+
+    def checkpoints(self, name: str, version: str) -> list[BatchCheckpoint]:
+        """
+        Fetches persisted batch checkpoints of an unfinished node generation.
+
+        :param name: node name of the module
+        :param version: code version of the module
+        :return: list of batch checkpoints ordered by batch index
+        """
+        with self.connect() as conn:
+            q = (
+                "SELECT version, batch, source_count, item_count, files, dep_key"
+                " FROM __checkpoint"
+                " WHERE name = ? AND version = ? ORDER BY batch;"
+            )
+            data = conn.execute(q, [name, version]).fetchall()
+            keys = list(BatchCheckpoint.__annotations__.keys())
+            checkpoints = [dict(zip(keys, row)) for row in data]
+            for c in checkpoints:
+                c["files"] = json.loads(c["files"])
+            return checkpoints
+
+    def discard(self, name: str) -> None:
+        """
+        Drops staged batches and checkpoints of the node.
+
+        :param name: node name of the module
+        """
+        self.__staged.pop(name, None)
+        with self.connect() as conn:
+            conn.execute("DROP TABLE IF EXISTS %s;" % (STAGE_TABLE % name)).fetchall()
+            conn.execute("DELETE FROM __checkpoint WHERE name = ?;", [name]).fetchall()
+
     def insert(self, name: str, files: list[str]) -> None:
         """
         Creates a table for given node name in local relational database. If there is a table
-        with the same node name it will drop all data and create a fresh one. Given files will
-        be concatenated and inserted in the fresh table.
+        with the same node name it will drop all data and create a fresh one. Staged batches
+        and given files will be concatenated and inserted in the fresh table. Batch
+        checkpoints of the node are cleared in the same transaction.
 
         :param name: node name of the module
         :param files: list of generated file paths
         """
+        assert "." not in name, "Node names can not contain dot(.) = %s" % name
+        stage = STAGE_TABLE % name
+        self.__staged.pop(name, None)
+
         with self.connect() as conn:
-            assert "." not in name, "Node names can not contain dot(.) = %s" % name
+            staged = _exists(conn, stage)
+            conn.begin()
+            if staged and len(files) == 0:
+                # stage table already contains all batches, no need to copy
+                conn.execute("DROP TABLE IF EXISTS %s;" % name).fetchall()
+                conn.execute("ALTER TABLE %s RENAME TO %s;" % (stage, name)).fetchall()
+            else:
+                # concatenate and insert staged batches and file contents in a fresh table
+                sources = ["SELECT * FROM %s" % stage] if staged else []
+                if len(files) > 0:
+                    scan = find_format(files[0]).scan(conn, files)
+                    sources.append("SELECT * FROM %s" % scan)
 
-            # concatenate and insert file contents in a fresh table
-            q = "CREATE OR REPLACE TABLE %s AS SELECT * FROM read_json_auto(%s);"
-            q = q % (name, files)
-            if len(files) == 0:
-                q = "CREATE OR REPLACE TABLE %s(id INTEGER);"
-                q = q % name
-            conn.execute(q).fetchall()
+                q = "CREATE OR REPLACE TABLE %s(id INTEGER);" % name
+                if len(sources) > 0:
+                    q = "CREATE OR REPLACE TABLE %s AS %s;"
+                    q = q % (name, " UNION ALL BY NAME ".join(sources))
+                conn.execute(q).fetchall()
+                conn.execute("DROP TABLE IF EXISTS %s;" % stage).fetchall()
+            conn.execute("DELETE FROM __checkpoint WHERE name = ?;", [name]).fetchall()
+            conn.commit()
+
+    def dump(self, name: str, file_path: str) -> None:
+        """
+        Writes node table to a parquet file.
+
+        :param name: name of the node
+        :param file_path: path of the parquet file
+        """
+        with self.connect() as conn:
+            q = "COPY %s TO '%s' (FORMAT PARQUET, COMPRESSION ZSTD);"
+            conn.execute(q % (name, file_path)).fetchall()
+
+    def restore(self, name: str, file_path: str) -> None:
+        """
+        Creates node table from a parquet file written by `dump`. Staged batches and
+        checkpoints of the node are dropped.
+
+        :param name: name of the node
+        :param file_path: path of the parquet file
+        """
+        assert "." not in name, "Node names can not contain dot(.) = %s" % name
+        self.discard(name)
+        with self.connect() as conn:
+            q = "CREATE OR REPLACE TABLE %s AS SELECT * FROM read_parquet('%s');"
+            conn.execute(q % (name, file_path)).fetchall()
 
     def export(self, out_path: str, fmt: str) -> None:
         """
@@ -123,8 +551,8 @@ class DataStorage:
         """
         with self.connect() as conn:
             tables = conn.execute("SHOW TABLES;").fetchall()
-            # exclude meta table from export list
-            tables = [f for (f,) in tables if "__meta" != f]
+            # exclude internal tables from export list
+            tables = [f for (f,) in tables if not f.startswith("__")]
 
             # create out folder if not exists
             if not os.path.exists(out_path):
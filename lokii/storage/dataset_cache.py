@@ -0,0 +1,184 @@
+import hashlib
+import json
+import os
+import threading
+import time
+from typing import TypedDict, Callable
+
+from lokii.config import CONFIG
+
+CacheEntry = TypedDict(
+    "CacheEntry",
+    {
+        "key": str,
+        "name": str,
+        "version": str,
+        "path": str,
+        "size": int,
+        "created": float,
+        "used": float,
+    },
+)
+
+# extension of the cached node dataset and its metadata file
+DATA_EXT = ".parquet"
+META_EXT = ".json"
+
+
+class DatasetCache:
+    def __init__(self, dir_path: str = None, max_size: int = None):
+        """
+        Content addressed store of generated node datasets. Datasets are stored as parquet
+        files named by a key computed from node version, source query and dependency
+        fingerprints, so identical nodes can be restored in any project or branch.
+        Least recently used datasets are evicted when total size exceeds the limit.
+
+        :param dir_path: directory of the cache, configured cache directory by default
+        :param max_size: maximum total size in bytes, configured max size by default
+        """
+        self.dir_path = dir_path or CONFIG.cache.dir_path
+        self.max_size = max_size if max_size is not None else CONFIG.cache.max_size
+        self.__lock = threading.Lock()
+
+    @staticmethod
+    def key(version: str, source: str, dep_key: str) -> str:
+        """
+        :param version: code version of the node module
+        :param source: source query of the node
+        :param dep_key: fingerprint key of node dependencies
+        :return: content address of the node dataset
+        """
+        key = json.dumps([version, source, dep_key])
+        return hashlib.blake2b(key.encode(), digest_size=20).hexdigest()
+
+    def __path(self, key: str, ext: str) -> str:
+        return os.path.join(self.dir_path, key + ext)
+
+    def get(self, key: str) -> CacheEntry or None:
+        """
+        Finds cached dataset and marks it as recently used.
+
+        :param key: content address of the node dataset
+        :return: cache entry, `None` if dataset is not cached
+        """
+        meta_path = self.__path(key, META_EXT)
+        if not os.path.exists(meta_path) or not os.path.exists(
+            self.__path(key, DATA_EXT)
+        ):
+            return None
+        # modification time of the metadata file is used as last access time
+        os.utime(meta_path)
+        return self.__entry(key)
+
+    def put(
+        self, key: str, name: str, version: str, write: Callable[[str], None]
+    ) -> CacheEntry or None:
+        """
+        Stores node dataset in the cache and evicts least recently used datasets if cache
+        exceeds its size limit. Datasets that are already cached are not written again.
+
+        :param key: content address of the node dataset
+        :param name: name of the node
+        :param version: code version of the node module
+        :param write: function that writes node dataset as parquet to given path
+        :return: cache entry, `None` if dataset is larger than the size limit
+        """
+        entry = self.get(key)
+        if entry is not None:
+            return entry
+        if not os.path.exists(self.dir_path):
+            os.makedirs(self.dir_path, exist_ok=True)
+
+        # write to temp paths first, so readers never see partially written datasets
+        suffix = ".%d.%d.tmp" % (os.getpid(), threading.get_ident())
+        data_path = self.__path(key, DATA_EXT)
+        write(data_path + suffix)
+        if os.path.getsize(data_path + suffix) > self.max_size:
+            # dataset would be evicted right away together with every other entry
+            os.remove(data_path + suffix)
+            return None
+        os.replace(data_path + suffix, data_path)
+
+        meta_path = self.__path(key, META_EXT)
+        meta = {"name": name, "version": version, "created": time.time()}
+        with open(meta_path + suffix, "w") as _f:
+            _f.write(json.dumps(meta))
+        os.replace(meta_path + suffix, meta_path)
+
+        self.evict()
+        return self.__entry(key)
+
+    def __entry(self, key: str) -> CacheEntry:
+        meta_path = self.__path(key, META_EXT)
+        data_path = self.__path(key, DATA_EXT)
+        with open(meta_path) as _f:
+            meta = json.loads(_f.read())
+        return {
+            "key": key,
+            "name": meta["name"],
+            "version": meta["version"],
+            "path": data_path,
+            "size": os.path.getsize(data_path),
+            "created": meta["created"],
+            "used": os.path.getmtime(meta_path),
+        }
+
+    def entries(self) -> list[CacheEntry]:
+        """
+        :return: cached datasets ordered from least to most recently used
+        """
+        if not os.path.exists(self.dir_path):
+            return []
+        entries = []
+        for f in os.listdir(self.dir_path):
+            key, ext = os.path.splitext(f)
+            if ext != META_EXT or not os.path.exists(self.__path(key, DATA_EXT)):
+                continue
+            try:
+                entries.append(self.__entry(key))
+            except (OSError, ValueError):
+                # entry is removed or being written by another process
+                continue
+        return sorted(entries, key=lambda e: e["used"])
+
+    def size(self) -> int:
+        """
+        :return: total size of cached datasets in bytes
+        """
+        return sum(e["size"] for e in self.entries())
+
+    def remove(self, key: str) -> None:
+        """
+        :param key: content address of the node dataset
+        """
+        for ext in [META_EXT, DATA_EXT]:
+            if os.path.exists(self.__path(key, ext)):
+                os.remove(self.__path(key, ext))
+
+    def evict(self, max_size: int = None) -> list[CacheEntry]:
+        """
+        Removes least recently used datasets until total size fits in given size.
+
+        :param max_size: maximum total size in bytes, cache size limit by default
+        :return: list of evicted cache entries
+        """
+        max_size = self.max_size if max_size is None else max_size
+        with self.__lock:
+            entries = self.entries()
+            total = sum(e["size"] for e in entries)
+            evicted = []
+            for e in entries:
+                if total <= max_size:
+                    break
+                self.remove(e["key"])
+                total -= e["size"]
+                evicted.append(e)
+            return evicted
+
+    def clear(self) -> list[CacheEntry]:
+        """
+        Removes all cached datasets.
+
+        :return: list of removed cache entries
+        """
+        return self.evict(0)
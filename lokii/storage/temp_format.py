@@ -0,0 +1,113 @@
+import json
+import os
+from abc import ABC, abstractmethod
+
+import pyarrow as pa
+import pyarrow.dataset as ds
+import pyarrow.ipc as ipc
+import pyarrow.parquet as pq
+from duckdb import DuckDBPyConnection
+
+
+class TempFormat(ABC):
+    """
+    File format that is used to store generated batches temporarily before they are
+    loaded in the database. New formats can be registered in `TEMP_FORMATS`.
+
+    :var name: identifier of the format used in configuration
+    :type name: str
+    :var ext: file extension of the format
+    :type ext: str
+    """
+
+    name = None
+    ext = None
+
+    def __init__(self, compression: str = None):
+        """
+        :param compression: compression codec of the written files, `None` to disable
+        """
+        self.compression = compression
+
+    @abstractmethod
+    def write(self, file_path: str, table: pa.Table) -> None:
+        """
+        Writes given batch to file path.
+
+        :param file_path: path of the temp file
+        :param table: generated batch
+        """
+
+    @abstractmethod
+    def scan(self, conn: DuckDBPyConnection, files: list[str]) -> str:
+        """
+        Prepares given files for reading in given connection.
+
+        :param conn: database connection that will read the files
+        :param files: list of temp file paths
+        :return: table expression that can be used in `FROM` clause
+        """
+
+
+class JsonFormat(TempFormat):
+    name = "json"
+    ext = ".json"
+
+    def write(self, file_path: str, table: pa.Table) -> None:
+        with open(file_path, "w") as _f:
+            _f.write(json.dumps(table.to_pylist(), default=str))
+
+    def scan(self, conn: DuckDBPyConnection, files: list[str]) -> str:
+        return "read_json_auto(%s)" % files
+
+
+class ParquetFormat(TempFormat):
+    name = "parquet"
+    ext = ".parquet"
+
+    def write(self, file_path: str, table: pa.Table) -> None:
+        pq.write_table(table, file_path, compression=self.compression or "none")
+
+    def scan(self, conn: DuckDBPyConnection, files: list[str]) -> str:
+        return "read_parquet(%s, union_by_name=true)" % files
+
+
+class ArrowFormat(TempFormat):
+    name = "arrow"
+    ext = ".arrow"
+
+    def write(self, file_path: str, table: pa.Table) -> None:
+        options = ipc.IpcWriteOptions(compression=self.compression)
+        with ipc.new_file(file_path, table.schema, options=options) as writer:
+            writer.write_table(table)
+
+    def scan(self, conn: DuckDBPyConnection, files: list[str]) -> str:
+        # batches may infer different types for columns that contain only nulls
+        schemas = [ipc.open_file(pa.memory_map(f)).schema for f in files]
+        dataset = ds.dataset(files, schema=pa.unify_schemas(schemas), format="ipc")
+        conn.register("__temp_batches", dataset)
+        return "__temp_batches"
+
+
+TEMP_FORMATS = {f.name: f for f in [JsonFormat, ParquetFormat, ArrowFormat]}
+
+
+def get_format(name: str, compression: str = None) -> TempFormat:
+    """
+    :param name: identifier of the format
+    :param compression: compression codec of the written files, `None` to disable
+    :return: temp format instance
+    """
+    assert name in TEMP_FORMATS, "Temp format must be one of %s" % list(TEMP_FORMATS)
+    return TEMP_FORMATS[name](compression)
+
+
+def find_format(file_path: str) -> TempFormat:
+    """
+    :param file_path: path of the temp file
+    :return: temp format instance that can read given file
+    """
+    _, ext = os.path.splitext(file_path)
+    formats = [f for f in TEMP_FORMATS.values() if f.ext == ext]
+    assert len(formats) == 1, "Unknown temp file format: %s" % file_path
+    return formats[0]()
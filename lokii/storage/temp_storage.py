@@ -1,29 +1,75 @@
 import os
-import json
+
+import pyarrow as pa
 
 from lokii.config import CONFIG
+from lokii.storage.temp_format import get_format
+from lokii.util.perf_timer_context import PerfTimerContext
 
 
 class TempStorage:
-    def __init__(self, node_name: str):
+    def __init__(self, node_name: str, fmt: str = None):
         """
         Temporary filesystem storage implementation for storing data generated between batches.
         It only stores data temporary and deletes all files after node generation completed.
         :param node_name: name of the node
+        :param fmt: temp file format, configured temp format is used if not provided
         """
         self.node_name = node_name
+        self.format = get_format(fmt or CONFIG.temp.format, CONFIG.temp.compression)
         self.batches = []
         self.item_count = 0
+        # file paths of each output table of the node
+        self.tables = {}
+
+        # total size of written files in bytes
+        self.size = 0
+        # total time spent to encode and write files in seconds
+        self.elapsed = 0.0
+
+    def dump(self, batch: pa.Table, key: str = None, table: str = None) -> None:
+        """
+        Writes given batch to a temp file in configured format.
 
-    def dump(self, batch_data: list[dict]) -> None:
-        if len(batch_data) == 0:
+        :param batch: generated batch
+        :param key: unique file name of the batch in node, generated if not provided
+        :param table: output table of the batch, node name by default
+        """
+        if batch.num_rows == 0:
             return
 
-        storage_key = self.node_name + str(len(self.batches))
-        storage_path = os.path.join(CONFIG.temp.data_path, "%s.json" % storage_key)
+        # data directory is created only when batches can not be kept in memory
+        os.makedirs(CONFIG.temp.data_path, exist_ok=True)
+
+        storage_key = key or self.node_name + str(len(self.batches))
+        storage_file = storage_key + self.format.ext
+        storage_path = os.path.join(CONFIG.temp.data_path, storage_file)
+
+        with PerfTimerContext() as t:
+            self.format.write(storage_path, batch)
 
-        with open(storage_path, "w") as _f:
-            _f.write(json.dumps(batch_data))
+        self.add(storage_path, batch.num_rows, t.time, table)
 
-        self.batches.append(storage_path)
-        self.item_count = len(batch_data)
+    def add(
+        self, file_path: str, item_count: int, elapsed: float, table: str = None
+    ) -> None:
+        """
+        Tracks a temp file that is written by a worker process.
+
+        :param file_path: path of the temp file
+        :param item_count: number of items in the file
+        :param elapsed: time spent to encode and write the file in seconds
+        :param table: output table of the file, node name by default
+        """
+        self.batches.append(file_path)
+        self.tables.setdefault(table or self.node_name, []).append(file_path)
+        self.item_count += item_count
+        self.size += os.path.getsize(file_path)
+        self.elapsed += elapsed
+
+    def files(self, table: str = None) -> list[str]:
+        """
+        :param table: output table, node name by default
+        :return: temp file paths of the output table
+        """
+        return self.tables.get(table or self.node_name, [])
@@ -0,0 +1,55 @@
+import pyarrow as pa
+
+
+def to_table(items: list[dict]) -> pa.Table:
+    """
+    Converts generated items to a columnar table. Columns are collected from all items
+    so that items with missing keys produce nulls.
+
+    :param items: list of generated items
+    :return: columnar table
+    """
+    cols = dict.fromkeys(k for item in items for k in item)
+    return pa.table({c: [item.get(c) for item in items] for c in cols})
+
+
+def as_table(data) -> pa.Table:
+    """
+    Converts vectorized generation result to a columnar table.
+
+    :param data: arrow table, record batch, pandas data frame or dict of columns
+    :return: columnar table
+    """
+    if isinstance(data, pa.Table):
+        return data
+    if isinstance(data, pa.RecordBatch):
+        return pa.Table.from_batches([data])
+    if isinstance(data, dict):
+        return pa.table(data)
+    if hasattr(data, "to_dict") and hasattr(data, "columns"):
+        return pa.Table.from_pandas(data, preserve_index=False)
+    raise TypeError("Unsupported vectorized result type: %s" % type(data).__name__)
+
+
+def merge_tables(tables: list[pa.Table]) -> pa.Table:
+    """
+    Concatenates tables that may have different columns or null typed columns. Missing
+    columns are filled with nulls and null typed columns are cast to the unified type.
+
+    :param tables: list of tables
+    :return: concatenated table
+    """
+    tables = [t for t in tables if t.num_rows > 0]
+    if len(tables) == 0:
+        return pa.table({})
+    schema = pa.unify_schemas([t.schema for t in tables])
+    unified = []
+    for t in tables:
+        cols = [
+            t.column(f.name).cast(f.type)
+            if f.name in t.column_names
+            else pa.nulls(t.num_rows, f.type)
+            for f in schema
+        ]
+        unified.append(pa.Table.from_arrays(cols, schema=schema))
+    return pa.concat_tables(unified)
@@ -0,0 +1,12 @@
+def format_bytes(size: float) -> str:
+    """
+    Formats given byte count with the largest fitting binary unit.
+
+    :param size: number of bytes
+    :return: human readable size
+    """
+    units = ["B", "KB", "MB", "GB", "TB"]
+    for unit in units:
+        if abs(size) < 1024 or unit == units[-1]:
+            return "{:.2f}{}".format(size, unit)
+        size /= 1024
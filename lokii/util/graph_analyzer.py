@@ -1,7 +1,17 @@
-from collections import defaultdict
+from collections import defaultdict, deque
 
 
 class GraphAnalyzer:
+    """
+    Analyzes dependency graph of nodes. Nodes are indexed once, so all traversals run in
+    O(V+E) without recursion and their results are cached.
+
+    :var nodes: node names in definition order
+    :type nodes: list[str]
+    :var graph: direct dependencies of each node
+    :type graph: dict[str, list[str]]
+    """
+
     def __init__(self, nodes: list[(str, list[str])]):
         """
         Reads and validates dataset configuration from filesystem structure.
@@ -14,50 +24,116 @@ class GraphAnalyzer:
             self.nodes.append(node)
             self.graph[node].extend(deps)
 
-    def __cycle(self, index, node, visited, stack):
-        visited[index] = True
-        stack[index] = True
+        self.__index = {node: i for i, node in enumerate(self.nodes)}
+        # dependency and dependent indexes of each node
+        self.__deps = [[] for _ in self.nodes]
+        self.__dependents = [[] for _ in self.nodes]
+        for i, node in enumerate(self.nodes):
+            for dep in self.graph[node]:
+                if dep not in self.__index:
+                    raise AssertionError(
+                        "Dependency `%s` is not found!\nNode: %s" % (dep, node)
+                    )
+                self.__deps[i].append(self.__index[dep])
+                self.__dependents[self.__index[dep]].append(i)
+
+        self.__order = None
+        self.__closures = {}
+
+    def __kahn(self) -> list[int]:
+        """
+        :return: indexes of nodes that are not part of a cycle in topological order
+        """
+        if self.__order is None:
+            in_degree = [len(deps) for deps in self.__deps]
+            queue = deque(i for i, d in enumerate(in_degree) if d == 0)
+            order = []
+            while queue:
+                i = queue.popleft()
+                order.append(i)
+                for dependent in self.__dependents[i]:
+                    in_degree[dependent] -= 1
+                    if in_degree[dependent] == 0:
+                        queue.append(dependent)
+            self.__order = order
+        return self.__order
+
+    def __cycle(self, remaining: set[int]) -> list[int]:
+        """
+        Finds a cycle path with an iterative depth first search over nodes that could not
+        be sorted.
 
-        for neighbour in self.graph[node]:
-            n_index = self.nodes.index(neighbour)
-            if not visited[n_index]:
-                if self.__cycle(n_index, neighbour, visited, stack):
-                    return True
-            elif stack[n_index]:
-                return True
-        stack[index] = False
-        return False
+        :param remaining: indexes of nodes that are part of or depend on a cycle
+        :return: node indexes of the cycle path, first node is repeated at the end
+        """
+        visited = set()
+        for start in sorted(remaining):
+            if start in visited:
+                continue
+            path, on_path = [start], {start: 0}
+            stack = [iter(self.__deps[start])]
+            visited.add(start)
+            while stack:
+                dep = next(stack[-1], None)
+                if dep is None:
+                    on_path.pop(path.pop())
+                    stack.pop()
+                elif dep in on_path:
+                    return path[on_path[dep] :] + [dep]
+                elif dep not in visited and dep in remaining:
+                    visited.add(dep)
+                    on_path[dep] = len(path)
+                    path.append(dep)
+                    stack.append(iter(self.__deps[dep]))
+        return []
 
     def check_cyclic(self):
-        length = len(self.nodes) + 1
-        visited = [False] * length
-        stack = [False] * length
-        for index, node in enumerate(self.nodes):
-            if not visited[index] and self.__cycle(index, node, visited, stack):
-                raise AssertionError("Found cyclic dependencies!\n%s" % node)
-
-    def __sort(self, index, node, visited, stack):
-        visited[index] = True
-        for element in self.graph[node]:
-            e_index = self.nodes.index(element)
-            if not visited[e_index]:
-                self.__sort(e_index, element, visited, stack)
-        stack.insert(0, node)
-
-    def topological_sort(self):
-        stack = []
-        visited = [False] * len(self.nodes)
-        for index, node in enumerate(self.nodes):
-            if not visited[index]:
-                self.__sort(index, node, visited, stack)
-        return stack[::-1]
+        order = self.__kahn()
+        if len(order) == len(self.nodes):
+            return
+        remaining = set(range(len(self.nodes))) - set(order)
+        cycle = [self.nodes[i] for i in self.__cycle(remaining)]
+        raise AssertionError("Found cyclic dependencies!\n%s" % " -> ".join(cycle))
+
+    def topological_sort(self) -> list[str]:
+        """
+        :return: node names ordered so that each node comes after its dependencies
+        """
+        return [self.nodes[i] for i in self.__kahn()]
 
     def dependencies(self, name: str) -> list[str]:
-        stack = []
-        visited = [False] * len(self.nodes)
-        index = self.nodes.index(name)
-        self.__sort(index, name, visited, stack)
-        return stack[::-1]
+        """
+        :param name: name of the node
+        :return: transitive dependencies of the node in topological order, including the
+        node itself as the last element
+        """
+        if name not in self.__closures:
+            self.check_cyclic()
+            position = {i: p for p, i in enumerate(self.__kahn())}
+            closure, stack = set(), list(self.__deps[self.__index[name]])
+            while stack:
+                i = stack.pop()
+                if i not in closure:
+                    closure.add(i)
+                    stack.extend(self.__deps[i])
+            ordered = sorted(closure, key=position.get)
+            self.__closures[name] = [self.nodes[i] for i in ordered] + [name]
+        return self.__closures[name]
+
+    def levels(self) -> list[list[str]]:
+        """
+        Groups nodes by their depth in the graph. Nodes in the same level do not depend on
+        each other and can be processed in parallel after previous levels are completed.
+
+        :return: list of node name lists for each level
+        """
+        self.check_cyclic()
+        depth = [0] * len(self.nodes)
+        levels = defaultdict(list)
+        for i in self.__kahn():
+            depth[i] = max((depth[d] + 1 for d in self.__deps[i]), default=0)
+            levels[depth[i]].append(self.nodes[i])
+        return [levels[d] for d in range(len(levels))]
 
     def execution_order(self) -> list[str]:
         self.check_cyclic()
@@ -0,0 +1,47 @@
+import os
+
+# linux memory statistics, available memory includes reclaimable page cache
+MEMINFO_PATH = "/proc/meminfo"
+
+
+def available_memory() -> int or None:
+    """
+    Reads `MemAvailable` on linux, free pages that exclude reclaimable page cache are
+    used on other platforms.
+
+    :return: available physical memory in bytes, `None` if platform does not support it
+    """
+    try:
+        with open(MEMINFO_PATH) as _f:
+            for line in _f:
+                if line.startswith("MemAvailable:"):
+                    return int(line.split()[1]) * 1024
+    except (OSError, ValueError, IndexError):
+        pass
+    try:
+        return os.sysconf("SC_AVPHYS_PAGES") * os.sysconf("SC_PAGE_SIZE")
+    except (AttributeError, ValueError, OSError):
+        return None
+
+
+def total_memory() -> int or None:
+    """
+    :return: total physical memory in bytes, `None` if platform does not support it
+    """
+    try:
+        return os.sysconf("SC_PHYS_PAGES") * os.sysconf("SC_PAGE_SIZE")
+    except (AttributeError, ValueError, OSError):
+        return None
+
+
+def memory_pressure(min_free: float) -> bool:
+    """
+    Checks if available physical memory dropped under given ratio of total memory.
+
+    :param min_free: minimum free memory ratio between 0 and 1
+    :return: `True` if memory is under pressure, `False` if not or can not be measured
+    """
+    available, total = available_memory(), total_memory()
+    if not available or not total:
+        return False
+    return available / total < min_free
@@ -2,6 +2,7 @@ import os
 import sys
 import hashlib
 import inspect
+import tokenize
 from types import ModuleType
 
 
@@ -19,6 +20,10 @@ class ModuleFileLoader:
         """
         self.path = os.path.abspath(file_path)
         self.filename = os.path.basename(file_path)
+        # modules with the same filename in different groups are loaded concurrently,
+        # so module name must be unique for the file path
+        path_key = hashlib.blake2b(self.path.encode(), digest_size=6).hexdigest()
+        self.name = "%s_%s" % (self.filename, path_key)
 
         self.module = None
         self.version = None
@@ -30,23 +35,38 @@ class ModuleFileLoader:
         try:
             import importlib.util
 
-            # read file spec from given path. filename is used as module name
-            spec = importlib.util.spec_from_file_location(self.filename, self.path)
+            # read file spec from given path. unique name of the file is used as module name
+            spec = importlib.util.spec_from_file_location(self.name, self.path)
             module = importlib.util.module_from_spec(spec)
 
             # introduce module to system
-            sys.modules[self.filename] = module
+            sys.modules[self.name] = module
             spec.loader.exec_module(module)
             self.module = module
         except ImportError:
             from imp import load_source
 
-            module = load_source(self.filename, self.path)
+            module = load_source(self.name, self.path)
 
         # acquire module source code as str
         src = inspect.getsource(module).encode("utf-8")
+        # hash source code to detect changes
+        self.version = ModuleFileLoader.hash(src)
+
+    @staticmethod
+    def hash(src: bytes) -> str:
         h = hashlib.blake2b(digest_size=20)
         h.update(src)
+        return h.hexdigest()
 
-        # hash source code to detect changes
-        self.version = h.hexdigest()
+    @staticmethod
+    def file_version(file_path: str) -> str:
+        """
+        Computes code version of the module from its file content without executing it.
+        File is decoded the same way `inspect.getsource` reads module source.
+
+        :param file_path: file path of the module
+        :return: content hash of the module source
+        """
+        with tokenize.open(file_path) as _f:
+            return ModuleFileLoader.hash(_f.read().encode("utf-8"))
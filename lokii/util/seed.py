@@ -0,0 +1,35 @@
+import hashlib
+import random
+import sys
+
+import numpy as np
+
+
+def derive_seed(*parts) -> int:
+    """
+    Derives a seed from given parts that is stable between processes and runs, unlike
+    python `hash` of strings.
+
+    :param parts: seed parts, e.g. run seed, node name and chunk index
+    :return: 64 bit seed
+    """
+    key = ":".join(str(p) for p in parts).encode()
+    return int.from_bytes(hashlib.blake2b(key, digest_size=8).digest(), "little")
+
+
+def seed_all(seed: int) -> np.random.Generator:
+    """
+    Seeds global generators of `random`, numpy and Faker in the current process. Faker
+    is seeded only if it is already imported by a node module.
+
+    :param seed: 64 bit seed
+    :return: numpy random number generator with the same seed
+    """
+    random.seed(seed)
+    # legacy numpy global generator only accepts 32 bit seeds
+    np.random.seed(seed % 2**32)
+    faker = sys.modules.get("faker")
+    if faker is not None:
+        # instances that are not seeded with `seed_instance` share this generator
+        faker.Faker.seed(seed)
+    return np.random.default_rng(seed)
@@ -40,6 +40,7 @@ setup(
     install_requires=[
         "pandas==2.0.1",
         "pathos==0.3.0",
+        "pyarrow==12.0.0",
         "tqdm==4.65.0",
         "duckdb==0.8.0",
         "typing==3.7.4.3",
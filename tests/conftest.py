@@ -6,7 +6,6 @@ from pytest import FixtureRequest
 from pytest_mock import MockerFixture
 
 
-from lokii.config import CONFIG
 from lokii import Lokii
 
 
@@ -23,14 +22,7 @@ def glob_files(mocker, request):
     """
     files = request.param if hasattr(request, "param") else []
     files = [os.path.normpath(f) for f in files]
-    mocker.patch(
-        "lokii.parse.group_parser.glob",
-        return_value=[f for f in files if CONFIG.gen.group_ext in f],
-    )
-    mocker.patch(
-        "lokii.parse.node_parser.glob",
-        return_value=[f for f in files if CONFIG.gen.node_ext in f],
-    )
+    mocker.patch("lokii.parse.module_finder.ModuleFinder.walk", return_value=files)
     return files
 
 
@@ -61,6 +53,10 @@ def load_modules(mocker, request, glob_files):
 
     node_mock = mocker.patch("lokii.parse.node_parser.ModuleFileLoader")
     node_mock.side_effect = module_file_loader_side_effect
+
+    # forked worker processes load node modules by themselves
+    worker_mock = mocker.patch("lokii.exec.node_executor.ModuleFileLoader")
+    worker_mock.side_effect = module_file_loader_side_effect
     return request.param if hasattr(request, "param") else []
 
 
@@ -73,3 +69,38 @@ def setup_test_env(request):
 
     Lokii.setup_env()
     request.addfinalizer(teardown)
+
+
+@pytest.fixture(autouse=True)
+def cache_dir(mocker, tmp_path):
+    """
+    Isolates dataset cache of each test in a temporary directory, cache is disabled by
+    default as it is in a regular run.
+
+    :param mocker: Fixture that provides the same interface to functions in the mock module,
+    ensuring that they are uninstalled at the end of each test.
+    :type mocker: MockerFixture
+    :param tmp_path: A temporary directory unique to the test invocation.
+    :return: path of the cache directory
+    :rtype: str
+    """
+    path = str(tmp_path / "cache")
+    mocker.patch("lokii.config.CACHE_DIR_PATH", path)
+    return path
+
+
+@pytest.fixture
+def cache_enabled(mocker, cache_dir):
+    """
+    Enables dataset cache of the test in its isolated directory.
+
+    :param mocker: Fixture that provides the same interface to functions in the mock module,
+    ensuring that they are uninstalled at the end of each test.
+    :type mocker: MockerFixture
+    :param cache_dir: Isolated dataset cache directory of the test.
+    :type cache_dir: str
+    :return: path of the cache directory
+    :rtype: str
+    """
+    mocker.patch("lokii.config.CACHE_ENABLED", "true")
+    return cache_dir
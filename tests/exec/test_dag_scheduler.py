@@ -0,0 +1,60 @@
+import threading
+
+import pytest
+
+from lokii.exec.dag_scheduler import DagScheduler
+
+
+def test_run_should_start_nodes_after_dependencies():
+    n1, n2, n3, n4 = (("n1", ["n3"]), ("n2", ["n1", "n3"]), ("n3", []), ("n4", ["n2"]))
+    completed = []
+    lock = threading.Lock()
+
+    def func(name):
+        with lock:
+            deps = dict([n1, n2, n3, n4])[name]
+            assert all(d in completed for d in deps)
+            completed.append(name)
+
+    DagScheduler([n1, n2, n3, n4], 4).run(func)
+    assert completed == ["n3", "n1", "n2", "n4"]
+
+
+def test_run_should_execute_independent_nodes_concurrently():
+    # both nodes must be running at the same time to pass the barrier
+    barrier = threading.Barrier(2, timeout=5)
+    results = DagScheduler([("n1", []), ("n2", [])], 2).run(lambda n: barrier.wait())
+    assert sorted(results.keys()) == ["n1", "n2"]
+
+
+def test_run_should_return_results_for_each_node():
+    results = DagScheduler([("n1", []), ("n2", ["n1"])], 2).run(lambda n: n * 2)
+    assert results == {"n1": "n1n1", "n2": "n2n2"}
+
+
+def test_run_should_raise_error_and_skip_dependents_on_failure():
+    called = []
+
+    def func(name):
+        called.append(name)
+        if name == "n1":
+            raise ValueError("failed")
+
+    with pytest.raises(ValueError):
+        DagScheduler([("n1", []), ("n2", ["n1"])], 2).run(func)
+    assert called == ["n1"]
+
+
+def test_critical_paths_should_sum_costs_along_longest_dependent_chain():
+    nodes = [("n1", []), ("n2", ["n1"]), ("n3", ["n1"]), ("n4", ["n3"])]
+    costs = {"n1": 1.0, "n2": 10.0, "n3": 2.0, "n4": 3.0}
+    priority = DagScheduler(nodes, 1, costs).priority
+    assert priority == {"n1": 11.0, "n2": 10.0, "n3": 5.0, "n4": 3.0}
+
+
+def test_run_should_start_ready_nodes_with_longest_critical_path_first():
+    nodes = [("leaf", []), ("cheap", []), ("slow", []), ("after_slow", ["slow"])]
+    costs = {"leaf": 1.0, "cheap": 2.0, "slow": 5.0, "after_slow": 5.0}
+    started = []
+    DagScheduler(nodes, 1, costs).run(started.append)
+    assert started == ["slow", "after_slow", "cheap", "leaf"]
@@ -1,34 +1,394 @@
 from unittest.mock import Mock
 
+import numpy as np
+import pandas as pd
+import pyarrow as pa
 import pytest
 import os
+import random
+from concurrent.futures import ThreadPoolExecutor
 
-from lokii.storage.data_storage import DataStorage
+from lokii.config import CONFIG
+from lokii.storage.data_storage import DataStorage, SOURCE_INDEX
 from lokii.exec.node_executor import NodeExecutor, _exec_chunk
+from lokii import columns, lookup_index
+from lokii.exec.worker_pool import WorkerPool
 from lokii.model.node_module import GenNodeModule
 
 
-@pytest.mark.usefixtures("setup_test_env")
+@pytest.fixture
+def pool():
+    with WorkerPool(2) as _pool:
+        yield _pool
+
+
+def _chunk(size: int) -> pa.RecordBatch:
+    return pa.RecordBatch.from_pydict(
+        {SOURCE_INDEX: list(range(size)), "data": list(range(size))}
+    )
+
+
 def test__exec_chunk_should_call_func_for_list_length():
-    func = Mock()
-    _exec_chunk(func, [{"data": f} for f in range(100)])
+    func = Mock(return_value={"data": 1})
+    count, item_count, items, _ = _exec_chunk(func, False, None, _chunk(100))
     assert func.call_count == 100
+    assert count == 100
+    assert item_count == items.num_rows == 100
 
 
 @pytest.mark.usefixtures("setup_test_env")
-def test_prepare_node_should_return_total_target_count_for_query():
+def test__exec_chunk_should_write_chunk_file_and_return_only_path():
+    func = Mock(return_value={"data": 1})
+    count, item_count, file_path, _ = _exec_chunk(func, False, "n1", _chunk(10))
+    assert (count, item_count) == (10, 10)
+    assert os.path.basename(file_path).startswith("n1_0.")
+    assert os.path.exists(file_path)
+
+
+def test__exec_chunk_should_pass_row_ids_and_params():
+    func = Mock(return_value=None)
+    _exec_chunk(func, False, None, _chunk(3))
+    assert func.call_args.args[0] == {"index": 2, "id": 3, "params": {"data": 2}}
+
+
+def test__exec_chunk_should_call_vectorized_func_once_with_columns():
+    func = Mock(
+        side_effect=lambda b: {"id": b["id"], "double": b["params"]["data"] * 2}
+    )
+    count, _, items, _ = _exec_chunk(func, True, None, _chunk(100))
+    assert func.call_count == 1
+    assert count == 100
+    assert items.column("double").to_pylist() == [i * 2 for i in range(100)]
+
+
+@pytest.mark.parametrize(
+    "result",
+    [
+        pd.DataFrame({"data": [1, 2]}),
+        pa.table({"data": [1, 2]}),
+        {"data": np.array([1, 2])},
+    ],
+)
+def test__exec_chunk_should_accept_vectorized_result_types(result):
+    _, _, items, _ = _exec_chunk(lambda b: result, True, None, _chunk(2))
+    assert items.column("data").to_pylist() == [1, 2]
+
+
+@pytest.mark.usefixtures("setup_test_env")
+def test_prepare_node_should_return_total_target_count_for_query(pool):
     data_storage = DataStorage()
     node = GenNodeModule("SELECT 1", lambda x: x, name="n1")
-    executor = NodeExecutor(node, data_storage)
+    executor = NodeExecutor(node, data_storage, pool)
     assert executor.prepare_node() == 1
 
 
 @pytest.mark.usefixtures("setup_test_env")
-def test_exec_node_should_return_generated_list_of_files():
+def test_exec_node_should_return_generated_list_of_files(pool, mocker):
+    mocker.patch("lokii.config.DATA_INGEST", "file")
     data_storage = DataStorage()
     node = GenNodeModule("SELECT 1", lambda x: x, name="n1")
-    executor = NodeExecutor(node, data_storage)
+    executor = NodeExecutor(node, data_storage, pool)
     executor.prepare_node()
     files = executor.exec_node()
     assert len(files) == 1
     assert os.path.exists(files[0])
+
+
+@pytest.mark.usefixtures("setup_test_env")
+def test_exec_node_should_append_batches_in_memory_without_files(pool):
+    data_storage = DataStorage()
+    node = GenNodeModule("SELECT * FROM range(10)", lambda x: x["params"], name="n1")
+    executor = NodeExecutor(node, data_storage, pool)
+    executor.prepare_node()
+    assert executor.exec_node() == []
+    data_storage.insert("n1", [])
+    with data_storage.connect() as conn:
+        assert conn.execute("SELECT COUNT() FROM n1;").fetchone() == (10,)
+
+
+@pytest.mark.usefixtures("setup_test_env")
+def test_exec_node_should_fall_back_to_files_on_memory_pressure(pool, mocker):
+    mocker.patch("lokii.exec.node_executor.memory_pressure", return_value=True)
+    data_storage = DataStorage()
+    node = GenNodeModule("SELECT 1", lambda x: x, name="n1")
+    executor = NodeExecutor(node, data_storage, pool)
+    executor.prepare_node()
+    assert len(executor.exec_node()) == 1
+
+
+@pytest.mark.usefixtures("setup_test_env")
+def test_exec_node_should_load_node_module_once_per_worker(pool, tmp_path):
+    node_path = tmp_path / "n1.node.py"
+    node_path.write_text(
+        "import os\n"
+        "calls = []\n"
+        "def init():\n"
+        "    calls.append(os.getpid())\n"
+        "def item(args):\n"
+        "    return {'pid': os.getpid(), 'init_calls': len(calls)}\n"
+    )
+    data_storage = DataStorage()
+    node = GenNodeModule(
+        "SELECT * FROM range(1000)", None, "n1", "v1", path=str(node_path)
+    )
+    executor = NodeExecutor(node, data_storage, pool)
+    executor.prepare_node()
+    executor.exec_node()
+    data_storage.insert("n1", executor.temp_storage.batches)
+    with data_storage.connect() as conn:
+        q = "SELECT DISTINCT init_calls FROM n1;"
+        assert conn.execute(q).fetchall() == [(1,)]
+
+
+def _fail_after_25(args):
+    # fails in the third batch of 10 rows, so only the first two batches are completed
+    if args["index"] >= 25:
+        raise ValueError("interrupted")
+    return {"index": args["index"], "run": 1}
+
+
+@pytest.mark.usefixtures("setup_test_env")
+def test_prepare_node_should_resume_from_last_completed_batch(pool, mocker):
+    mocker.patch("lokii.config.GEN_BATCH_SIZE", 10)
+    data_storage = DataStorage()
+    node = GenNodeModule("SELECT * FROM range(30)", _fail_after_25, name="n1")
+    executor = NodeExecutor(node, data_storage, pool)
+    executor.prepare_node()
+    with pytest.raises(ValueError):
+        executor.exec_node()
+
+    node = GenNodeModule(
+        "SELECT * FROM range(30)", lambda a: {"index": a["index"], "run": 2}, "n1"
+    )
+    executor = NodeExecutor(node, data_storage, pool)
+    assert executor.prepare_node(resume=True) == 30
+    assert executor.g_count == 20
+    executor.exec_node()
+    assert executor.g_count == 30
+    data_storage.insert("n1", executor.temp_storage.batches)
+    with data_storage.connect() as conn:
+        q = "SELECT run, COUNT(), MIN(index), MAX(index) FROM n1 GROUP BY run ORDER BY run;"
+        assert conn.execute(q).fetchall() == [(1, 20, 0, 19), (2, 10, 20, 29)]
+        assert conn.execute("SELECT COUNT() FROM __checkpoint;").fetchone() == (0,)
+
+
+def test__exec_chunk_should_merge_declared_columns_with_items():
+    def item(args):
+        return None if args["index"] == 1 else {"data": args["params"]["data"]}
+
+    node = GenNodeModule("", item, columns={"seq": lambda ctx: ctx.index * 2})
+    _, count, items, _ = _exec_chunk(node, False, None, _chunk(3))
+    assert count == 2
+    assert items.to_pylist() == [{"data": 0, "seq": 0}, {"data": 2, "seq": 4}]
+
+
+def test__exec_chunk_should_generate_only_declared_columns():
+    node = GenNodeModule("", None, columns={"seq": lambda ctx: ctx.id})
+    _, count, items, _ = _exec_chunk(node, False, None, _chunk(3))
+    assert items.column("seq").to_pylist() == [1, 2, 3]
+
+
+def _order_lines(args):
+    for line in range(args["index"]):
+        yield {"order": args["id"], "line": line}
+
+
+@pytest.mark.parametrize(
+    "item",
+    [
+        _order_lines,
+        lambda a: [{"order": a["id"], "line": i} for i in range(a["index"])],
+    ],
+)
+def test__exec_chunk_should_expand_rows_that_generate_many_items(item):
+    node = GenNodeModule("", item, columns={"seq": lambda ctx: ctx.index * 2})
+    count, item_count, items, _ = _exec_chunk(node, False, None, _chunk(4))
+    assert (count, item_count) == (4, 6)
+    assert items.column("order").to_pylist() == [2, 3, 3, 4, 4, 4]
+    assert items.column("line").to_pylist() == [0, 0, 1, 0, 1, 2]
+    assert items.column("seq").to_pylist() == [2, 4, 4, 6, 6, 6]
+
+
+def test__exec_chunk_should_raise_error_if_item_result_is_not_valid():
+    with pytest.raises(TypeError, match="`item` must return"):
+        _exec_chunk(lambda a: "item", False, None, _chunk(1))
+
+
+@pytest.mark.usefixtures("setup_test_env")
+def test_exec_node_should_spill_items_of_rows_that_generate_many_items(pool, mocker):
+    mocker.patch("lokii.config.GEN_BATCH_SIZE", 10)
+    mocker.patch("lokii.config.GEN_CHUNK_SIZE", 5)
+    data_storage = DataStorage()
+    node = GenNodeModule("SELECT * FROM range(20)", _order_lines, name="n1")
+    executor = NodeExecutor(node, data_storage, pool)
+    executor.prepare_node()
+    files = executor.exec_node()
+    assert executor.g_count == sum(range(20))
+    assert len(files) > 0
+    data_storage.insert("n1", files)
+    with data_storage.connect() as conn:
+        assert conn.execute("SELECT COUNT() FROM n1;").fetchone() == (190,)
+
+
+def _sale(args):
+    lines = [{"sale": args["id"], "line": i} for i in range(args["index"])]
+    return {"sales": {"id": args["id"]}, "lines": lines}
+
+
+def test__exec_chunk_should_generate_each_output_table():
+    node = GenNodeModule("", _sale, outputs=["sales", "lines"])
+    count, item_count, data, _ = _exec_chunk(node, False, None, _chunk(3))
+    assert (count, item_count) == (3, 6)
+    assert data["sales"][0] == 3 and data["lines"][0] == 3
+    assert data["sales"][1].column("id").to_pylist() == [1, 2, 3]
+    assert data["lines"][1].column("sale").to_pylist() == [2, 3, 3]
+
+
+def test__exec_chunk_should_generate_vectorized_output_tables():
+    def items(batch):
+        return {"sales": {"id": batch["id"]}}
+
+    node = GenNodeModule("", None, items=items, outputs=["sales", "lines"])
+    _, item_count, data, _ = _exec_chunk(node, True, None, _chunk(3))
+    assert item_count == 3
+    assert data["lines"][1].num_rows == 0
+
+
+def test__exec_chunk_should_raise_error_for_unknown_output():
+    node = GenNodeModule("", lambda a: {"other": {}}, outputs=["sales"])
+    with pytest.raises(KeyError, match="other"):
+        _exec_chunk(node, False, None, _chunk(1))
+
+
+@pytest.mark.usefixtures("setup_test_env")
+@pytest.mark.parametrize("ingest", ["memory", "file"])
+def test_exec_node_should_generate_output_tables_in_one_pass(pool, mocker, ingest):
+    mocker.patch("lokii.config.DATA_INGEST", ingest)
+    mocker.patch("lokii.config.GEN_BATCH_SIZE", 10)
+    data_storage = DataStorage()
+    node = GenNodeModule(
+        "SELECT * FROM range(20)", _sale, name="n1", outputs=["sales", "lines"]
+    )
+    executor = NodeExecutor(node, data_storage, pool)
+    executor.prepare_node()
+    executor.exec_node()
+    assert executor.g_count == 20 + sum(range(20))
+    for table in node.tables:
+        data_storage.insert(table, executor.temp_storage.files(table))
+    with data_storage.connect() as conn:
+        assert conn.execute("SELECT COUNT() FROM sales;").fetchone() == (20,)
+        assert conn.execute("SELECT COUNT() FROM lines;").fetchone() == (190,)
+
+
+def _random(args):
+    return {"id": args["id"], "r": random.random(), "n": float(np.random.random())}
+
+
+def test__exec_chunk_should_generate_same_items_for_same_seed():
+    node = GenNodeModule("", _random, columns={"u": columns.uniform(0, 1)})
+    _, _, first, _ = _exec_chunk(node, False, None, _chunk(10), seed=1)
+    _, _, second, _ = _exec_chunk(node, False, None, _chunk(10), seed=1)
+    _, _, other, _ = _exec_chunk(node, False, None, _chunk(10), seed=2)
+    assert first.equals(second)
+    assert not first.equals(other)
+
+
+@pytest.mark.usefixtures("setup_test_env")
+def test_exec_node_should_generate_same_ordered_rows_for_any_worker_count(mocker):
+    mocker.patch("lokii.config.GEN_CHUNK_SIZE", 7)
+    node = GenNodeModule("SELECT * FROM range(100)", _random, name="n1")
+    results = []
+    for concurrency in [1, 3]:
+        data_storage = DataStorage()
+        with WorkerPool(concurrency) as pool:
+            executor = NodeExecutor(node, data_storage, pool, seed=1, ordered=True)
+            executor.prepare_node()
+            executor.exec_node()
+        data_storage.insert("n1", [])
+        with data_storage.connect() as conn:
+            results.append(conn.execute("SELECT * FROM n1;").fetchall())
+    assert results[0] == results[1]
+    assert [r[0] for r in results[0]] == list(range(1, 101))
+
+
+@pytest.mark.usefixtures("setup_test_env")
+def test_build_lookups_should_build_empty_index_of_empty_node(pool):
+    data_storage = DataStorage()
+    data_storage.stage("n0", "SELECT 1 AS a WHERE false")
+    data_storage.insert("n0", [])
+    node = GenNodeModule("SELECT 1", lambda x: x, name="n1", lookups=[("n0", "a")])
+    NodeExecutor(node, data_storage, pool).build_lookups()
+    assert lookup_index.lookup("n0", "a").get(1) is None
+
+
+@pytest.mark.usefixtures("setup_test_env")
+def test_build_lookups_should_build_shared_index_once_in_concurrent_nodes(pool, mocker):
+    build = mocker.spy(lookup_index, "build")
+    data_storage = DataStorage()
+    data_storage.stage("n0", "SELECT range AS a FROM range(1000)")
+    data_storage.insert("n0", [])
+    data_storage.save("g1", "n0", "v1", data_storage.fingerprint("n0"))
+    nodes = [
+        GenNodeModule("SELECT 1", lambda x: x, name="n%d" % i, lookups=[("n0", "a")])
+        for i in range(1, 5)
+    ]
+    with ThreadPoolExecutor(4) as executor:
+        futures = [
+            executor.submit(NodeExecutor(n, data_storage, pool).build_lookups)
+            for n in nodes
+        ]
+        assert len({tuple(f.result().values()) for f in futures}) == 1
+    assert build.call_count == 1
+
+
+@pytest.mark.usefixtures("setup_test_env")
+def test_exec_node_should_keep_ordered_rows_in_batch_order_when_spilled(pool, mocker):
+    mocker.patch("lokii.config.GEN_BATCH_SIZE", 10)
+    mocker.patch("lokii.config.GEN_CHUNK_SIZE", 5)
+    # every other batch is written to files as if memory is low
+    pressure = mocker.patch("lokii.exec.node_executor.memory_pressure")
+    pressure.side_effect = [i % 2 == 1 for i in range(10)]
+    data_storage = DataStorage()
+    node = GenNodeModule("SELECT * FROM range(40)", _order_lines, name="n1")
+    executor = NodeExecutor(node, data_storage, pool, seed=1, ordered=True)
+    executor.prepare_node()
+    assert executor.exec_node() == []
+    data_storage.insert("n1", executor.temp_storage.files())
+    with data_storage.connect() as conn:
+        rows = conn.execute('SELECT "order", line FROM n1;').fetchall()
+    assert len(rows) == sum(range(40)) and rows == sorted(rows)
+    assert not os.path.exists(CONFIG.temp.data_path) or not os.listdir(
+        CONFIG.temp.data_path
+    )
+
+
+@pytest.mark.usefixtures("setup_test_env")
+def test_export_refs_should_reuse_files_of_fingerprinted_tables(pool):
+    data_storage = DataStorage()
+    data_storage.stage("lines", "SELECT range AS id FROM range(5)")
+    data_storage.insert("lines", [])
+    data_storage.save("g1", "lines", "v1", data_storage.fingerprint("lines"))
+    node = GenNodeModule("SELECT 1", lambda x: x, name="n2", refs=[("lines", "id")])
+    first = NodeExecutor(node, data_storage, pool).export_refs()
+    second = NodeExecutor(node, data_storage, pool).export_refs()
+    assert first == second
+
+
+@pytest.mark.usefixtures("setup_test_env")
+@pytest.mark.parametrize("dep_key, resumed", [("d1", True), ("d2", False)])
+def test_prepare_node_should_resume_only_for_same_dependencies(
+    pool, mocker, dep_key, resumed
+):
+    mocker.patch("lokii.config.GEN_BATCH_SIZE", 10)
+    mocker.patch("lokii.config.DATA_INGEST", "file")
+    data_storage = DataStorage()
+    node = GenNodeModule("SELECT * FROM range(30)", _fail_after_25, name="n1")
+    executor = NodeExecutor(node, data_storage, pool, dep_key="d1")
+    executor.prepare_node()
+    with pytest.raises(ValueError):
+        executor.exec_node()
+
+    executor = NodeExecutor(node, data_storage, pool, dep_key=dep_key)
+    executor.prepare_node(resume=True)
+    assert executor.g_count == (20 if resumed else 0)
+    assert executor.temp_storage.item_count == executor.g_count
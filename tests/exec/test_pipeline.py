@@ -0,0 +1,66 @@
+import threading
+import time
+
+import pytest
+
+from lokii.exec.pipeline import prefetch, BackgroundWriter
+
+
+def test_prefetch_should_yield_all_items_in_order():
+    assert list(prefetch(iter(range(100)), 2)) == list(range(100))
+
+
+def test_prefetch_should_keep_at_most_depth_items_ready():
+    produced = []
+
+    def source():
+        for i in range(10):
+            produced.append(i)
+            yield i
+
+    items = prefetch(source(), 2)
+    assert next(items) == 0
+    time.sleep(0.2)
+    # one item consumed, two items queued and one item waiting to be queued
+    assert len(produced) <= 4
+    items.close()
+
+
+def test_prefetch_should_raise_producer_error():
+    def source():
+        yield 1
+        raise ValueError("source failed")
+
+    with pytest.raises(ValueError):
+        list(prefetch(source(), 2))
+
+
+def test_writer_should_consume_all_items_in_background():
+    consumed = []
+    with BackgroundWriter(consumed.append, 2) as writer:
+        for i in range(100):
+            writer.put(i)
+    assert consumed == list(range(100))
+
+
+def test_writer_should_block_put_while_queue_is_full():
+    release = threading.Event()
+    writer = BackgroundWriter(lambda _: release.wait(), 1)
+    with writer:
+        writer.put(1)  # consumed and blocked in function
+        writer.put(2)  # waits in queue
+        blocked = threading.Thread(target=writer.put, args=(3,))
+        blocked.start()
+        time.sleep(0.2)
+        assert blocked.is_alive()
+        release.set()
+        blocked.join()
+
+
+def test_writer_should_raise_consumer_error_on_close():
+    def func(_):
+        raise ValueError("persist failed")
+
+    with pytest.raises(ValueError):
+        with BackgroundWriter(func, 2) as writer:
+            writer.put(1)
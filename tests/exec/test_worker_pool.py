@@ -0,0 +1,40 @@
+import pytest
+
+from lokii.exec.worker_pool import WorkerPool
+
+
+def test_start_should_measure_startup_cost():
+    pool = WorkerPool(2)
+    assert pool.startup is None
+    pool.start()
+    assert pool.started
+    assert pool.startup.time > 0
+    pool.close()
+    assert not pool.started
+
+
+def test_pool_should_be_reused_across_maps():
+    with WorkerPool(2) as pool:
+        startup = pool.startup
+        assert sorted(pool.uimap(abs, [-1, -2])) == [1, 2]
+        assert sorted(pool.uimap(abs, [-3, -4])) == [3, 4]
+        assert pool.startup is startup
+
+
+def test_exit_should_terminate_pool_on_error():
+    pool = WorkerPool(2)
+    with pytest.raises(ValueError):
+        with pool:
+            raise ValueError("generation failed")
+    assert not pool.started
+
+
+def test_uimap_should_raise_error_if_not_started():
+    with pytest.raises(AssertionError) as err:
+        WorkerPool(2).uimap(abs, [-1])
+    assert "must be started" in str(err.value)
+
+
+def test_imap_should_yield_results_in_argument_order():
+    with WorkerPool(3) as pool:
+        assert list(pool.imap(abs, range(-20, 0))) == list(range(20, 0, -1))
@@ -0,0 +1,19 @@
+from lokii.logger.progress import ProgressLogger
+
+
+def test_estimate_should_refine_total_from_completed_rows():
+    logger = ProgressLogger(100)
+    logger.update(30)
+    logger.estimate(10, 30)
+    assert logger.pbar.total == 300
+    logger.estimate(0, 0)
+    assert logger.pbar.total == 300
+    logger.close()
+
+
+def test_estimate_should_not_be_less_than_generated_items():
+    logger = ProgressLogger(100)
+    logger.update(50)
+    logger.estimate(100, 40)
+    assert logger.pbar.total == 50
+    logger.close()
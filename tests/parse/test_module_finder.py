@@ -0,0 +1,38 @@
+import os
+
+from lokii.parse.module_finder import ModuleFinder
+from lokii.parse.group_parser import GroupParser
+from lokii.parse.node_parser import NodeParser
+
+
+def _touch(root, *parts):
+    file_path = os.path.join(root, *parts)
+    os.makedirs(os.path.dirname(file_path), exist_ok=True)
+    open(file_path, "w").close()
+    return file_path
+
+
+def test_files_should_classify_node_and_group_files(tmp_path):
+    root = str(tmp_path)
+    n1 = _touch(root, "n1.node.py")
+    n2 = _touch(root, "g1", "n2.node.py")
+    g1 = _touch(root, "g1", "g1.group.py")
+    _touch(root, "g1", "util.py")
+    finder = ModuleFinder(root)
+    assert finder.files(".node.py") == sorted([n1, n2])
+    assert finder.files(".group.py") == [g1]
+
+
+def test_walk_should_skip_hidden_directories(tmp_path):
+    root = str(tmp_path)
+    n1 = _touch(root, "n1.node.py")
+    _touch(root, ".temp", "n2.node.py")
+    assert ModuleFinder(root).walk() == [n1]
+
+
+def test_files_should_walk_directory_once_for_all_parsers(tmp_path, mocker):
+    finder = ModuleFinder(str(tmp_path))
+    walk = mocker.spy(finder, "walk")
+    NodeParser(str(tmp_path), finder).parse()
+    GroupParser(str(tmp_path), finder).parse()
+    assert walk.call_count == 1
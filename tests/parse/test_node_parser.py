@@ -3,6 +3,8 @@ import pytest
 from lokii.config import CONFIG
 
 from lokii.parse.node_parser import NodeParser
+from lokii.lookup_index import lookup
+from lokii.reference import ref
 
 pytestmark = [pytest.mark.usefixtures("glob_files", "load_modules")]
 
@@ -75,16 +77,129 @@ def test_parse_should_use_file_path_to_extract_groups(glob_files, load_modules,
         assert expect[i] == parser.nodes[node_name].groups
 
 
+@pytest.mark.parametrize(
+    "glob_files, load_modules",
+    [(["/test/path/t1.node.py"], [{"source": "SELECT 1", "items": lambda x: x}])],
+    indirect=True,
+)
+def test_parse_should_accept_vectorized_items_function(load_modules):
+    parsed = NodeParser("/test/path").parse()
+    assert parsed["t1"].item is None
+    assert parsed["t1"].items is load_modules[0]["items"]
+
+
+@pytest.mark.parametrize(
+    "glob_files, load_modules",
+    [
+        (
+            ["/test/path/t1.node.py", "/test/path/t2.node.py"],
+            [
+                {"source": "SELECT 1"},
+                {"source": "SELECT 1", "item": lambda x: x, "sql_only": True},
+            ],
+        )
+    ],
+    indirect=True,
+)
+def test_parse_should_accept_sql_only_nodes():
+    parsed = NodeParser("/test/path").parse()
+    assert parsed["t1"].sql_only and parsed["t2"].sql_only
+    assert parsed["t2"].item is None
+
+
+@pytest.mark.parametrize(
+    "glob_files, load_modules",
+    [(["/test/path/t1.node.py"], [{"source": "1", "columns": {"a": lambda c: 1}}])],
+    indirect=True,
+)
+def test_parse_should_accept_columns_without_item(load_modules):
+    parsed = NodeParser("/test/path").parse()
+    assert not parsed["t1"].sql_only
+    assert parsed["t1"].columns is load_modules[0]["columns"]
+
+
+@pytest.mark.parametrize(
+    "glob_files, load_modules",
+    [
+        (
+            ["/test/path/t1.node.py"],
+            [
+                {
+                    "source": "1",
+                    "item": lambda x: x,
+                    "r": ref("t2", "id", "w"),
+                    "l": lookup("t3", "code"),
+                }
+            ],
+        )
+    ],
+    indirect=True,
+)
+def test_parse_should_find_module_references():
+    parsed = NodeParser("/test/path").parse()
+    assert parsed["t1"].refs == [("t2", "id", "w")]
+    assert parsed["t1"].lookups == [("t3", "code")]
+
+
+@pytest.mark.parametrize(
+    "glob_files, load_modules",
+    [
+        (
+            ["/test/path/t1.node.py", "/test/path/t2.node.py"],
+            [
+                {"source": "1", "item": lambda x: x, "outputs": ["a", "b"]},
+                {"source": "1", "item": lambda x: x},
+            ],
+        )
+    ],
+    indirect=True,
+)
+def test_parse_should_accept_multi_output_nodes():
+    parsed = NodeParser("/test/path").parse()
+    assert parsed["t1"].outputs == ["a", "b"]
+    assert parsed["t1"].tables == ["a", "b"]
+    assert parsed["t2"].tables == ["t2"]
+
+
 @pytest.mark.parametrize("glob_files", [["/test/path/g1/t1.node.py"]], indirect=True)
 @pytest.mark.parametrize(
     "load_modules, expect",
     [
         ([{}], "`source` not found"),
         ([{"source": 1000}], "`source` must be str"),
-        ([{"source": "1"}], "`item` not found"),
+        ([{"source": "1", "sql_only": "yes"}], "`sql_only` must be bool"),
+        ([{"source": "1", "columns": []}], "`columns` must be dict"),
+        ([{"source": "1", "columns": {"a": 1}}], "`columns.a` must be callable"),
         ([{"source": "1", "item": ""}], "`item` must be function"),
         ([{"source": "1", "item": lambda x, y: x}], "`item` accepts only one param"),
         ([{"source": "1", "item": lambda x: x, "name": 10}], "`name` must be str"),
+        ([{"source": "1", "items": ""}], "`items` must be function"),
+        ([{"source": "1", "item": lambda x: x, "init": ""}], "`init` must be function"),
+        (
+            [{"source": "1", "item": lambda x: x, "init": lambda x: x}],
+            "`init` accepts no params",
+        ),
+        ([{"source": "1", "items": lambda x, y: x}], "`items` accepts only one param"),
+        (
+            [{"source": "1", "item": lambda x: x, "items": lambda x: x}],
+            "`item` and `items` can not be used together",
+        ),
+        ([{"source": "1", "item": lambda x: x, "outputs": "a"}], "must be list"),
+        ([{"source": "1", "item": lambda x: x, "outputs": []}], "can not be empty"),
+        ([{"source": "1", "item": lambda x: x, "outputs": [1]}], "must be str"),
+        ([{"source": "1", "item": lambda x: x, "outputs": ["a", "a"]}], "unique"),
+        ([{"source": "1", "outputs": ["a"]}], "`outputs` require `item` or `items`"),
+        (
+            [
+                {
+                    "source": "1",
+                    "item": lambda x: x,
+                    "columns": {"a": lambda c: 1},
+                    "outputs": ["a"],
+                }
+            ],
+            "`outputs` and `columns` can not be used together",
+        ),
     ],
     indirect=["load_modules"],
 )
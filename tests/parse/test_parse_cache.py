@@ -0,0 +1,76 @@
+import os
+
+import pytest
+
+from lokii.parse.node_parser import NodeParser
+from lokii.parse.parse_cache import ParseCache
+from lokii.util.module_file_loader import ModuleFileLoader
+
+NODE_CODE = 'source = "SELECT 1"\n\ndef item(args):\n    return args\n'
+
+
+@pytest.fixture
+def node_file(tmp_path):
+    file_path = tmp_path / "n1.node.py"
+    file_path.write_text(NODE_CODE)
+    return str(file_path)
+
+
+def test_get_should_return_none_if_not_cached(node_file, tmp_path):
+    cache = ParseCache(str(tmp_path / "cache.json"))
+    assert cache.get(node_file) is None
+
+
+def test_get_should_return_definition_after_save(node_file, tmp_path):
+    cache = ParseCache(str(tmp_path / "cache.json"))
+    cache.put(node_file, ModuleFileLoader.file_version(node_file), {"name": "n1"})
+    cache.save()
+    assert ParseCache(str(tmp_path / "cache.json")).get(node_file)["name"] == "n1"
+
+
+def test_get_should_return_definition_if_file_touched_without_changes(
+    node_file, tmp_path
+):
+    cache = ParseCache(str(tmp_path / "cache.json"))
+    cache.put(node_file, ModuleFileLoader.file_version(node_file), {"name": "n1"})
+    os.utime(node_file, (0, 0))
+    assert cache.get(node_file)["name"] == "n1"
+
+
+def test_get_should_return_none_if_file_changed(node_file, tmp_path):
+    cache = ParseCache(str(tmp_path / "cache.json"))
+    cache.put(node_file, ModuleFileLoader.file_version(node_file), {"name": "n1"})
+    with open(node_file, "a") as _f:
+        _f.write("# changed\n")
+    assert cache.get(node_file) is None
+
+
+@pytest.mark.usefixtures("setup_test_env")
+def test_node_parser_should_not_load_unchanged_modules(node_file, tmp_path, mocker):
+    first = NodeParser(str(tmp_path)).parse()
+    load = mocker.spy(ModuleFileLoader, "load")
+    second = NodeParser(str(tmp_path)).parse()
+    assert load.call_count == 0
+    assert second["n1"].version == first["n1"].version
+    assert second["n1"].source == "SELECT 1"
+    assert second["n1"].item is None and second["n1"].path == node_file
+
+
+@pytest.mark.parametrize(
+    "env, cached",
+    [
+        ({"LOKII__TEST_SOURCE": "SELECT 2"}, False),
+        ({"TEST_SOURCE": "SELECT 2"}, False),
+        ({"OLDPWD": "/tmp", "SHLVL": "9"}, True),
+    ],
+)
+def test_get_should_return_none_if_read_environment_changed(
+    node_file, tmp_path, mocker, env, cached
+):
+    mocker.patch("lokii.config.TEMP_PARSE_CACHE_ENV", "TEST_SOURCE, TEST_COUNT")
+    cache = ParseCache(str(tmp_path / "cache.json"))
+    cache.put(node_file, ModuleFileLoader.file_version(node_file), {"name": "n1"})
+    cache.save()
+    mocker.patch.dict(os.environ, env)
+    entry = ParseCache(str(tmp_path / "cache.json")).get(node_file)
+    assert (entry is not None) == cached
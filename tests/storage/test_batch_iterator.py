@@ -0,0 +1,16 @@
+import pytest
+
+from lokii.storage.batch_iterator import BatchIterator
+from lokii.storage.data_storage import DataStorage
+
+pytestmark = [pytest.mark.usefixtures("setup_test_env")]
+
+
+def test_iterator_should_yield_all_rows_of_node_in_batches(mocker):
+    mocker.patch("lokii.config.GEN_BATCH_SIZE", 4)
+    storage = DataStorage()
+    with storage.connect() as conn:
+        conn.execute("CREATE TABLE n1 AS SELECT * FROM range(10);")
+    batches = list(BatchIterator(storage, "n1"))
+    assert [len(b) for b in batches] == [4, 4, 2]
+    assert [r["range"] for b in batches for r in b] == list(range(10))
@@ -1,10 +1,17 @@
 import os.path
 
+import pyarrow as pa
 import pytest
 
 from lokii.config import CONFIG
-from lokii.storage.data_storage import DataStorage
+from lokii.storage.data_storage import (
+    DataStorage,
+    SOURCE_TABLE,
+    SOURCE_INDEX,
+    STAGE_TABLE,
+)
 from lokii.storage.temp_storage import TempStorage
+from lokii.util.arrow_table import to_table
 
 pytestmark = [pytest.mark.usefixtures("setup_test_env")]
 
@@ -13,7 +20,7 @@ def test_init_should_create_database_and_meta_table():
     storage = DataStorage()
     with storage.connect() as conn:
         assert os.path.exists(CONFIG.temp.db_path)
-        assert "__meta" in conn.execute("SHOW TABLES;").fetchone()
+        assert ("__meta",) in conn.execute("SHOW TABLES;").fetchall()
 
 
 @pytest.mark.parametrize(
@@ -40,17 +47,55 @@ def test_count_should_return_row_count_for_query_result():
     assert storage.count("SELECT unnest([1, 2, 3])") == 3
 
 
-def test_exec_should_return_query_result_for_given_page():
+def test_materialize_should_return_row_count_and_create_source_table():
+    storage = DataStorage()
+    assert (
+        storage.materialize("n1", "SELECT * FROM range(0, 1000) USING SAMPLE 10") == 10
+    )
+    with storage.connect() as conn:
+        q = "SELECT COUNT() FROM %s;" % (SOURCE_TABLE % "n1")
+        assert conn.execute(q).fetchone() == (10,)
+
+
+def test_source_should_yield_materialized_rows_with_stable_ids():
+    storage = DataStorage()
+    storage.materialize("n1", "SELECT * FROM range(100, 125)")
+    first = [r for b in storage.source("n1", 10) for r in b.to_pylist()]
+    second = [r for b in storage.source("n1", 7) for r in b.to_pylist()]
+    # rows are streamed in stable row id order regardless of batch size
+    assert [r[SOURCE_INDEX] for r in first] == list(range(25))
+    assert first == second
+    rest = [r for b in storage.source("n1", 10, 20) for r in b.to_pylist()]
+    assert rest == first[20:]
+
+
+def test_release_should_drop_source_table():
+    storage = DataStorage()
+    storage.materialize("n1", "SELECT 1")
+    storage.release("n1")
+    with storage.connect() as conn:
+        assert (SOURCE_TABLE % "n1",) not in conn.execute("SHOW TABLES;").fetchall()
+
+
+def test_stream_should_yield_query_result_in_batches():
     storage = DataStorage()
     q = "SELECT * FROM range(0, 25)"
-    first_page = storage.exec(q, 0, 20)
-    second_page = storage.exec(q, 1, 20)
+    first_page, second_page = [b.to_pylist() for b in storage.stream(q, 20)]
     assert len(first_page) == 20
     assert first_page[0]["range"] == 0
     assert len(second_page) == 5
     assert second_page[0]["range"] == 20
 
 
+def test_stream_should_execute_query_only_once():
+    storage = DataStorage()
+    # every execution would produce a different sample
+    q = "SELECT * FROM range(0, 1000) USING SAMPLE 100"
+    rows = [r for batch in storage.stream(q, 30) for r in batch.column(0).to_pylist()]
+    assert len(rows) == 100
+    assert len(set(rows)) == 100
+
+
 def test_save_should_insert_record_to_meta_table():
     storage = DataStorage()
     with storage.connect() as conn:
@@ -79,10 +124,39 @@ def test_meta_should_return_data_for_given_keys():
     assert len([d for d in deps if d["name"] == "test_node3"]) == 1
 
 
+def test_meta_should_return_fingerprint_and_dep_key():
+    storage = DataStorage()
+    storage.save("test_gen1", "test_node1", "test_v1", "f1", "d1")
+    (meta,) = storage.meta(["test_node1"])
+    assert (meta["fingerprint"], meta["dep_key"]) == ("f1", "d1")
+
+
+def test_fingerprint_should_change_only_if_content_changes():
+    storage = DataStorage()
+    with storage.connect() as conn:
+        conn.execute("CREATE TABLE n1 AS SELECT range AS id FROM range(10);")
+        conn.execute("CREATE TABLE n2 AS SELECT * FROM n1 ORDER BY id DESC;")
+        conn.execute("CREATE TABLE n3 AS SELECT range AS id FROM range(1, 11);")
+    assert storage.fingerprint("n1") == storage.fingerprint("n2")
+    assert storage.fingerprint("n1") != storage.fingerprint("n3")
+
+
+def test_stats_should_return_saved_timings_for_given_nodes():
+    storage = DataStorage()
+    storage.save_stats("n1", 2.0, 100)
+    storage.save_stats("n1", 4.0, 100)
+    storage.save_stats("n2", 0.0, 0)
+    stats = storage.stats(["n1"])
+    assert stats == {
+        "n1": {"name": "n1", "elapsed": 4.0, "item_count": 100, "rate": 25.0}
+    }
+    assert storage.stats([]) == {}
+
+
 def test_cols_should_return_column_names_for_given_node():
     storage = DataStorage()
     _temp = TempStorage("_")
-    _temp.dump([{"col1": i, "col2": i} for i in range(10)])
+    _temp.dump(to_table([{"col1": i, "col2": i} for i in range(10)]))
     storage.insert("n1", _temp.batches)
     assert ["col1", "col2"] == storage.cols("n1")
 
@@ -91,7 +165,7 @@ def test_cols_should_return_column_names_for_given_node():
 def test_insert_should_raise_error_if_schema_exists(node, expect):
     storage = DataStorage()
     _temp = TempStorage("_")
-    _temp.dump([{"data": i} for i in range(10)])
+    _temp.dump(to_table([{"data": i} for i in range(10)]))
     with pytest.raises(AssertionError) as err:
         storage.insert(node, _temp.batches)
     assert "Node names can not contain dot" in str(err.value)
@@ -103,15 +177,119 @@ def test_insert_should_create_table_from_generated_files(loop, expect):
     with storage.connect() as conn:
         _temp = TempStorage("_")
         for count in loop:
-            _temp.dump([{"data": i} for i in range(count)])
+            _temp.dump(to_table([{"data": i} for i in range(count)]))
         storage.insert("n1", _temp.batches)
         assert expect in conn.execute("SELECT COUNT() FROM n1;").fetchone()
 
 
+@pytest.mark.parametrize("fmt", ["json", "parquet", "arrow"])
+def test_insert_should_load_temp_files_of_each_format(fmt):
+    storage = DataStorage()
+    _temp = TempStorage("_", fmt)
+    # first batch infers null type for `data` column
+    _temp.dump(to_table([{"id": i, "data": None} for i in range(3)]))
+    _temp.dump(to_table([{"id": i, "data": "d%d" % i} for i in range(4)]))
+    storage.insert("n1", _temp.batches)
+    with storage.connect() as conn:
+        q = "SELECT COUNT(), COUNT(data) FROM n1;"
+        assert conn.execute(q).fetchone() == (7, 4)
+
+
+def test_append_should_widen_columns_of_staged_batches():
+    storage = DataStorage()
+    storage.append("n1", pa.table({"id": [1, 2], "data": [None, None]}))
+    storage.append("n1", pa.table({"id": [3], "data": ["d3"], "extra": [1.5]}))
+    storage.insert("n1", [])
+    with storage.connect() as conn:
+        rows = conn.execute("SELECT * FROM n1 ORDER BY id;").fetchall()
+        assert rows == [(1, None, None), (2, None, None), (3, "d3", 1.5)]
+
+
+def test_insert_should_concatenate_staged_batches_and_files():
+    storage = DataStorage()
+    _temp = TempStorage("_")
+    _temp.dump(to_table([{"data": i} for i in range(3)]))
+    storage.append("n1", pa.table({"data": [10, 11]}))
+    storage.insert("n1", _temp.batches)
+    with storage.connect() as conn:
+        assert conn.execute("SELECT COUNT() FROM n1;").fetchone() == (5,)
+        tables = conn.execute("SHOW TABLES;").fetchall()
+        assert (STAGE_TABLE % "n1",) not in tables
+
+
+def test_stage_should_create_node_data_from_query():
+    storage = DataStorage()
+    assert storage.stage("n1", "SELECT range AS id FROM range(3)") == 3
+    storage.insert("n1", [])
+    with storage.connect() as conn:
+        assert conn.execute("SELECT SUM(id) FROM n1;").fetchone() == (3,)
+
+
+def test_append_outputs_should_stage_each_output_with_checkpoint():
+    storage = DataStorage()
+    checkpoint = {"version": "v1", "batch": 0, "source_count": 2, "files": []}
+    storage.append_outputs(
+        {
+            "a": (pa.table({"x": [1, 2]}), {**checkpoint, "item_count": 2}),
+            "b": (pa.table({"y": [1, 2, 3]}), {**checkpoint, "item_count": 3}),
+        }
+    )
+    assert storage.checkpoints("a", "v1")[0]["item_count"] == 2
+    assert storage.checkpoints("b", "v1")[0]["item_count"] == 3
+    storage.insert("a", [])
+    storage.insert("b", [])
+    with storage.connect() as conn:
+        assert conn.execute("SELECT COUNT() FROM b;").fetchone() == (3,)
+
+
+def test_columns_should_fetch_non_null_values():
+    storage = DataStorage()
+    storage.stage("n1", "SELECT * FROM (VALUES ('a'), (NULL), ('b')) AS _t(code)")
+    storage.insert("n1", [])
+    assert storage.columns("n1", ["code"])[0].tolist() == ["a", "b"]
+
+
+def test_columns_should_keep_values_of_columns_aligned():
+    storage = DataStorage()
+    q = "SELECT * FROM (VALUES (1, NULL), (NULL, 5), (3, 1)) AS _t(v, w)"
+    storage.stage("n1", q)
+    storage.insert("n1", [])
+    values, weights = storage.columns("n1", ["v", "w"])
+    assert (values.tolist(), weights.tolist()) == ([3], [1])
+
+
+def test_discard_should_drop_staged_batches():
+    storage = DataStorage()
+    storage.append("n1", pa.table({"data": [10, 11]}))
+    storage.discard("n1")
+    storage.insert("n1", [])
+    with storage.connect() as conn:
+        assert conn.execute("SELECT COUNT() FROM n1;").fetchone() == (0,)
+
+
+def test_append_should_record_checkpoint_with_batch():
+    storage = DataStorage()
+    checkpoint = {"version": "v1", "source_count": 2, "item_count": 2, "files": []}
+    storage.append("n1", pa.table({"data": [10, 11]}), {**checkpoint, "batch": 0})
+    storage.append("n1", None, {**checkpoint, "batch": 1, "files": ["f1"]})
+    checkpoints = storage.checkpoints("n1", "v1")
+    assert [c["batch"] for c in checkpoints] == [0, 1]
+    assert checkpoints[1]["files"] == ["f1"]
+    assert storage.checkpoints("n1", "v2") == []
+
+
+def test_insert_should_clear_checkpoints_of_node():
+    storage = DataStorage()
+    checkpoint = {"version": "v1", "batch": 0, "source_count": 2, "item_count": 2}
+    storage.append("n1", pa.table({"data": [10, 11]}), {**checkpoint, "files": []})
+    storage.insert("n1", [])
+    assert storage.checkpoints("n1", "v1") == []
+
+
 @pytest.mark.parametrize("nodes, fmt", [(["n1", "n2"], "csv")])
 def test_export_should_create_export_data_files(nodes, fmt):
     _temp = TempStorage("_")
-    _temp.dump([{"data": i} for i in range(100)])
+    _temp.dump(to_table([{"data": i} for i in range(100)]))
     storage = DataStorage()
     for node in nodes:
         storage.insert(node, _temp.batches)
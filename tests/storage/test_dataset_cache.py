@@ -0,0 +1,62 @@
+import os
+
+from lokii.storage.dataset_cache import DatasetCache
+
+
+def _write(size: int):
+    def write(file_path: str):
+        with open(file_path, "wb") as _f:
+            _f.write(b"0" * size)
+
+    return write
+
+
+def test_key_should_change_with_version_source_and_dependencies():
+    key = DatasetCache.key("v1", "SELECT 1", "d1")
+    assert key == DatasetCache.key("v1", "SELECT 1", "d1")
+    assert key != DatasetCache.key("v2", "SELECT 1", "d1")
+    assert key != DatasetCache.key("v1", "SELECT 2", "d1")
+    assert key != DatasetCache.key("v1", "SELECT 1", "d2")
+
+
+def test_get_should_return_stored_entry(cache_dir):
+    cache = DatasetCache()
+    assert cache.get("k1") is None
+    cache.put("k1", "n1", "v1", _write(10))
+    entry = cache.get("k1")
+    assert (entry["name"], entry["version"], entry["size"]) == ("n1", "v1", 10)
+    assert os.path.dirname(entry["path"]) == cache_dir
+
+
+def test_put_should_evict_least_recently_used_entries():
+    cache = DatasetCache(max_size=25)
+    cache.put("k1", "n1", "v1", _write(10))
+    cache.put("k2", "n2", "v1", _write(10))
+    # second entry becomes the least recently used one
+    os.utime(os.path.join(cache.dir_path, "k2.json"), (0, 0))
+    cache.get("k1")
+    cache.put("k3", "n3", "v1", _write(10))
+    assert [e["key"] for e in cache.entries()] == ["k1", "k3"]
+    assert cache.size() == 20
+
+
+def test_put_should_not_write_cached_entries_again():
+    cache = DatasetCache()
+    cache.put("k1", "n1", "v1", _write(10))
+    entry = cache.put("k1", "n1", "v1", _write(20))
+    assert entry["size"] == 10
+
+
+def test_put_should_skip_datasets_larger_than_size_limit():
+    cache = DatasetCache(max_size=15)
+    cache.put("k1", "n1", "v1", _write(10))
+    assert cache.put("k2", "n2", "v1", _write(20)) is None
+    assert [e["key"] for e in cache.entries()] == ["k1"]
+    assert sorted(os.listdir(cache.dir_path)) == ["k1.json", "k1.parquet"]
+
+
+def test_clear_should_remove_all_entries():
+    cache = DatasetCache()
+    cache.put("k1", "n1", "v1", _write(10))
+    assert [e["key"] for e in cache.clear()] == ["k1"]
+    assert cache.entries() == []
@@ -0,0 +1,18 @@
+import pytest
+
+from lokii.storage.temp_format import TempFormat, get_format
+
+
+def test_temp_format_should_require_write_and_scan():
+    class PartialFormat(TempFormat):
+        def write(self, file_path, table):
+            pass
+
+    with pytest.raises(TypeError):
+        PartialFormat()
+
+
+def test_get_format_should_return_registered_formats():
+    assert get_format("parquet", "zstd").compression == "zstd"
+    with pytest.raises(AssertionError, match="must be one of"):
+        get_format("csv")
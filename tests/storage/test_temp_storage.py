@@ -1,12 +1,42 @@
+import pytest
+
 from lokii.storage.temp_storage import TempStorage
+from lokii.util.arrow_table import to_table
 
 
 def test_dump_should_save_to_temp_file_path_dir(mocker):
     mocker.patch("builtins.open")
     mocker.patch("os.path.exists")
+    mocker.patch("os.makedirs")
+    mocker.patch("os.path.getsize", return_value=10)
     mock = mocker.patch("json.dumps")
 
     data = [{"data": "test1"}, {"data": "test2"}]
-    TempStorage("test").dump(data)
+    TempStorage("test", "json").dump(to_table(data))
     assert mock.call_count
     assert data in mock.call_args.args
+
+
+@pytest.mark.usefixtures("setup_test_env")
+@pytest.mark.parametrize(
+    "fmt, ext", [("json", ".json"), ("parquet", ".parquet"), ("arrow", ".arrow")]
+)
+def test_dump_should_track_written_files_size_and_items(fmt, ext):
+    storage = TempStorage("test", fmt)
+    storage.dump(to_table([{"data": i} for i in range(10)]))
+    storage.dump(to_table([{"data": i} for i in range(5)]))
+    assert len(storage.batches) == 2
+    assert all(b.endswith(ext) for b in storage.batches)
+    assert storage.item_count == 15
+    assert storage.size > 0
+
+
+@pytest.mark.usefixtures("setup_test_env")
+def test_dump_should_track_files_of_each_output_table():
+    storage = TempStorage("test", "parquet")
+    storage.dump(to_table([{"data": 1}]), "t1", "a")
+    storage.dump(to_table([{"data": 1}]), "t2")
+    storage.add(storage.batches[0], 1, 0.0, "a")
+    assert len(storage.files("a")) == 2
+    assert storage.files() == storage.files("test") == [storage.batches[1]]
+    assert storage.files("b") == []
@@ -1,9 +1,12 @@
 import os
+import random
 import shutil
+import duckdb
 import pytest
 from io import StringIO
 
 from config import CONFIG
+import lokii
 from lokii import Lokii
 from lokii.cli import exec_cmd, LOKII_ASCII
 
@@ -62,6 +65,48 @@ def test_exec_cmd_should_cache_consequent_runs(glob_files, load_modules, caplog)
     assert "not changed. Using existing dataset." in caplog.text
 
 
+@pytest.mark.usefixtures("glob_files", "load_modules")
+@pytest.mark.parametrize(
+    "glob_files, load_modules",
+    [(["t1.node.py"], [{"source": "SELECT 1", "item": lambda x: x}])],
+    indirect=True,
+)
+def test_exec_cmd_should_not_execute_sources_to_estimate_costs(mocker):
+    count = mocker.spy(lokii.storage.data_storage.DataStorage, "count")
+    exec_cmd("lokii -f tests")
+    assert count.call_count == 0
+    Lokii.clean_env(force=True)
+
+
+@pytest.mark.usefixtures("glob_files", "load_modules")
+@pytest.mark.parametrize(
+    "glob_files, load_modules",
+    [
+        (
+            ["t1.node.py", "t2.node.py", "t3.node.py", "t4.node.py"],
+            [
+                {"source": "SELECT range AS a FROM range(10)", "name": "small"},
+                {"source": "SELECT range AS a FROM range(1000)", "name": "big"},
+                {"source": "SELECT * FROM small", "name": "c1", "item": lambda x: x},
+                {"source": "SELECT * FROM big", "name": "c2", "item": lambda x: x},
+            ],
+        )
+    ],
+    indirect=True,
+)
+def test_exec_cmd_should_estimate_costs_of_new_nodes_from_dependency_size(mocker):
+    # dependencies exist from a previous run, but their children have no history
+    os.makedirs(CONFIG.temp.dir_path, exist_ok=True)
+    with duckdb.connect(CONFIG.temp.db_path) as conn:
+        conn.execute("CREATE TABLE small AS SELECT range AS a FROM range(10);")
+        conn.execute("CREATE TABLE big AS SELECT range AS a FROM range(1000);")
+    scheduler = mocker.spy(lokii.main, "DagScheduler")
+    exec_cmd("lokii -f tests")
+    costs = scheduler.call_args.kwargs["costs"]
+    assert costs["c2"] > costs["c1"] > 0
+    Lokii.clean_env(force=True)
+
+
 gen_mod = {"source": "SELECT 1", "item": lambda x: x, "version": "v1"}
 
 
@@ -102,8 +147,271 @@ def test_exec_cmd_should_regenerate_on_dependency_change(caplog):
     assert os.path.exists(CONFIG.temp.db_path)
     caplog.clear()
 
-    # start generation for dependency code version v2
+    # start generation for dependency code version v2 that generates different data
     gen_mod2["version"] = "v2"
+    gen_mod2["source"] = "SELECT 2"
     exec_cmd("lokii -f tests -p")
+    gen_mod2["source"] = "SELECT 1"
     # should regenerate and not use cache because of dependency change
     assert "not changed. Using existing dataset." not in caplog.text
+
+
+@pytest.mark.usefixtures("glob_files", "load_modules")
+@pytest.mark.parametrize(
+    "glob_files, load_modules",
+    [(["t1.node.py", "t2.node.py"], [gen_mod1, gen_mod2])],
+    indirect=True,
+)
+def test_exec_cmd_should_not_regenerate_if_dependency_data_not_changed(caplog):
+    # start generation for dependency code version v1
+    gen_mod2["version"] = "v1"
+    exec_cmd("lokii  -f tests")
+    caplog.clear()
+
+    # start generation for dependency code version v2 that generates the same data
+    gen_mod2["version"] = "v2"
+    exec_cmd("lokii -f tests -p")
+    assert "Generated data not changed." in caplog.text
+    assert "n1 not changed. Using existing dataset." in caplog.text
+
+
+@pytest.mark.usefixtures("glob_files", "load_modules")
+@pytest.mark.parametrize(
+    "glob_files, load_modules", [(["t1.node.py"], [gen_mod])], indirect=True
+)
+def test_exec_cmd_should_not_write_cache_by_default(cache_dir, caplog):
+    gen_mod["version"] = "v1"
+    exec_cmd("lokii -f tests -p")
+    assert not os.path.exists(cache_dir) or os.listdir(cache_dir) == []
+    exec_cmd("lokii -f tests")
+    assert "restored from cache" not in caplog.text
+    Lokii.clean_env(force=True)
+
+
+@pytest.mark.usefixtures("glob_files", "load_modules", "cache_enabled")
+@pytest.mark.parametrize(
+    "glob_files, load_modules", [(["t1.node.py"], [gen_mod])], indirect=True
+)
+def test_exec_cmd_should_restore_unchanged_nodes_from_cache(caplog):
+    gen_mod["version"] = "v1"
+    exec_cmd("lokii -f tests -p")
+    assert not os.path.exists(CONFIG.temp.db_path)
+    caplog.clear()
+
+    # fresh project database, same node version
+    exec_cmd("lokii -f tests")
+    assert "restored from cache" in caplog.text
+    assert "Generation started" not in caplog.text
+    Lokii.clean_env(force=True)
+
+
+@pytest.mark.usefixtures("glob_files", "load_modules", "cache_enabled")
+@pytest.mark.parametrize(
+    "glob_files, load_modules", [(["t1.node.py"], [gen_mod])], indirect=True
+)
+def test_exec_cmd_should_list_and_clear_cache(mocker):
+    gen_mod["version"] = "v1"
+    exec_cmd("lokii -f tests -p")
+    mock = mocker.patch("sys.stdout", new=StringIO())
+    exec_cmd("lokii cache")
+    assert "1 datasets" in mock.getvalue()
+    exec_cmd("lokii cache clear")
+    assert "1 datasets removed" in mock.getvalue()
+
+
+@pytest.mark.usefixtures("glob_files", "load_modules")
+@pytest.mark.parametrize(
+    "glob_files, load_modules",
+    [
+        (
+            ["t1.node.py", "t2.node.py"],
+            [
+                {"source": "SELECT range AS a FROM range(5)", "name": "n1"},
+                {"source": "SELECT a * 2 AS b FROM n1", "name": "n2"},
+            ],
+        )
+    ],
+    indirect=True,
+)
+def test_exec_cmd_should_generate_sql_only_nodes_in_database(caplog):
+    exec_cmd("lokii -f tests")
+    assert "Generation started in database" in caplog.text
+    with duckdb.connect(CONFIG.temp.db_path) as conn:
+        q = "SELECT SUM(b) FROM n2;"
+        assert conn.execute(q).fetchone() == (20,)
+    Lokii.clean_env(force=True)
+
+
+@pytest.mark.usefixtures("glob_files", "load_modules")
+@pytest.mark.parametrize(
+    "glob_files, load_modules",
+    [
+        (
+            ["t1.node.py", "t2.node.py"],
+            [
+                {
+                    "source": "SELECT * FROM range(50)",
+                    "name": "n2",
+                    "columns": {"owner": lokii.ref("n1", "a")},
+                },
+                {"source": "SELECT range + 100 AS a FROM range(5)", "name": "n1"},
+            ],
+        )
+    ],
+    indirect=True,
+)
+def test_exec_cmd_should_generate_referenced_nodes_before():
+    exec_cmd("lokii -f tests")
+    with duckdb.connect(CONFIG.temp.db_path) as conn:
+        q = "SELECT COUNT(), MIN(owner), MAX(owner) FROM n2;"
+        count, low, high = conn.execute(q).fetchone()
+    assert count == 50 and 100 <= low <= high <= 104
+    Lokii.clean_env(force=True)
+
+
+@pytest.mark.usefixtures("glob_files", "load_modules")
+@pytest.mark.parametrize(
+    "glob_files, load_modules",
+    [
+        (
+            ["t1.node.py", "t2.node.py"],
+            [
+                {
+                    "source": "SELECT range AS a FROM range(5)",
+                    "name": "n2",
+                    "prices": lokii.lookup("n1", "a"),
+                    "item": lambda x: {"p": lokii.lookup("n1", "a")[x["id"]]["p"]},
+                },
+                {
+                    "source": "SELECT range AS a, range * 10 AS p FROM range(10)",
+                    "name": "n1",
+                },
+            ],
+        )
+    ],
+    indirect=True,
+)
+def test_exec_cmd_should_build_lookup_indexes(caplog):
+    exec_cmd("lokii -f tests")
+    assert "Lookup index n1.a built for 10 keys" in caplog.text
+    with duckdb.connect(CONFIG.temp.db_path) as conn:
+        assert conn.execute("SELECT SUM(p) FROM n2;").fetchone() == (150,)
+    Lokii.clean_env(force=True)
+
+
+@pytest.mark.usefixtures("glob_files", "load_modules")
+@pytest.mark.parametrize(
+    "glob_files, load_modules",
+    [
+        (
+            ["t1.node.py", "t2.node.py"],
+            [
+                {
+                    "source": "SELECT SUM(line) AS total FROM lines",
+                    "name": "n2",
+                    "sql_only": True,
+                },
+                {
+                    "source": "SELECT range AS a FROM range(5)",
+                    "name": "n1",
+                    "outputs": ["sales", "lines"],
+                    "item": lambda x: {
+                        "sales": {"a": x["index"]},
+                        "lines": [{"line": x["index"]}, {"line": x["index"]}],
+                    },
+                },
+            ],
+        )
+    ],
+    indirect=True,
+)
+def test_exec_cmd_should_generate_output_tables_of_multi_output_nodes():
+    exec_cmd("lokii -f tests")
+    with duckdb.connect(CONFIG.temp.db_path) as conn:
+        assert conn.execute("SELECT COUNT() FROM sales;").fetchone() == (5,)
+        assert conn.execute("SELECT total FROM n2;").fetchone() == (20,)
+        q = "SELECT name FROM __meta WHERE fingerprint IS NOT NULL ORDER BY name;"
+        assert conn.execute(q).fetchall() == [("lines",), ("n1",), ("n2",), ("sales",)]
+    Lokii.clean_env(force=True)
+
+
+@pytest.mark.usefixtures("glob_files", "load_modules")
+@pytest.mark.parametrize(
+    "glob_files, load_modules",
+    [
+        (
+            ["t1.node.py", "t2.node.py"],
+            [
+                {
+                    "source": "SELECT range AS a FROM range(5)",
+                    "name": "n2",
+                    "outputs": ["n1", "lines"],
+                    "item": lambda x: {"lines": {"a": x["id"]}},
+                },
+                {"source": "SELECT range AS a FROM range(5)", "name": "n1"},
+            ],
+        )
+    ],
+    indirect=True,
+)
+def test_exec_cmd_should_raise_error_if_table_has_more_than_one_node(caplog):
+    exec_cmd("lokii -f tests")
+    assert "Table `n1` is generated by more than one node!" in caplog.text
+    Lokii.clean_env(force=True)
+
+
+@pytest.mark.usefixtures("glob_files", "load_modules")
+@pytest.mark.parametrize(
+    "glob_files, load_modules",
+    [
+        (
+            ["t1.node.py"],
+            [
+                {
+                    "source": "SELECT * FROM range(500)",
+                    "name": "n1",
+                    "item": lambda x: {"id": x["id"], "r": random.random()},
+                }
+            ],
+        )
+    ],
+    indirect=True,
+)
+def test_exec_cmd_should_generate_same_data_for_same_seed():
+    rows = []
+    for seed in [1, 1, 2]:
+        exec_cmd("lokii -f tests -s %d" % seed)
+        with duckdb.connect(CONFIG.temp.db_path) as conn:
+            rows.append(conn.execute("SELECT * FROM n1;").fetchall())
+        Lokii.clean_env(force=True)
+    assert rows[0] == rows[1] != rows[2]
+    assert [r[0] for r in rows[0]] == list(range(1, 501))
+
+
+@pytest.mark.usefixtures("glob_files", "load_modules")
+@pytest.mark.parametrize(
+    "glob_files, load_modules",
+    [
+        (
+            ["t%d.node.py" % i for i in range(6)],
+            [
+                {
+                    "source": "SELECT * FROM range(2000)",
+                    "name": "n%d" % i,
+                    "item": lambda x: {"id": x["id"]},
+                }
+                for i in range(6)
+            ],
+        )
+    ],
+    indirect=True,
+)
+def test_exec_cmd_should_generate_independent_nodes_concurrently(mocker):
+    mocker.patch("lokii.config.GEN_NODE_CONCURRENCY", 6)
+    for _ in range(3):
+        exec_cmd("lokii -f tests")
+        with duckdb.connect(CONFIG.temp.db_path) as conn:
+            for i in range(6):
+                q = "SELECT COUNT() FROM n%d;" % i
+                assert conn.execute(q).fetchone() == (2000,)
+        Lokii.clean_env(force=True)
@@ -0,0 +1,66 @@
+import uuid
+
+import numpy as np
+import pytest
+
+from lokii import columns as c
+from lokii.columns import ColumnContext
+
+
+def _ctx(size: int, start: int = 0) -> ColumnContext:
+    index = np.arange(start, start + size)
+    return ColumnContext(size, index, {"x": index * 10}, np.random.default_rng(1))
+
+
+def test_sequence_should_derive_values_from_row_ids():
+    assert c.sequence(100, 2)(_ctx(3, 5)).tolist() == [110, 112, 114]
+
+
+@pytest.mark.parametrize(
+    "gen, low, high",
+    [
+        (c.integers(1, 6), 1, 6),
+        (c.uniform(1.0, 2.0, decimals=2), 1.0, 2.0),
+        (c.zipf(2.0, high=10), 1, 10),
+    ],
+)
+def test_distributions_should_generate_values_in_range(gen, low, high):
+    values = gen(_ctx(1000))
+    assert len(values) == 1000
+    assert low <= values.min() and values.max() <= high
+
+
+def test_normal_should_generate_values_around_mean():
+    values = c.normal(50, 1)(_ctx(10000))
+    assert abs(values.mean() - 50) < 0.1
+
+
+def test_choice_should_respect_weights():
+    values = c.choice(["a", "b"], weights=[1, 0])(_ctx(100))
+    assert set(values.tolist()) == {"a"}
+
+
+def test_dates_should_generate_dates_in_range():
+    values = c.dates("2020-01-01", "2020-01-03")(_ctx(100))
+    assert str(values.min()) >= "2020-01-01" and str(values.max()) <= "2020-01-03"
+
+
+def test_date_sequence_should_derive_dates_from_row_ids():
+    values = c.date_sequence("2020-01-30", 1)(_ctx(3))
+    assert [str(v) for v in values] == ["2020-01-30", "2020-01-31", "2020-02-01"]
+
+
+def test_template_should_format_row_ids_and_params():
+    assert c.template("E-{id:03d}-{x}")(_ctx(2)) == ["E-001-0", "E-002-10"]
+
+
+def test_uuid4_should_generate_valid_uuids():
+    values = c.uuid4()(_ctx(100))
+    assert len(set(values)) == 100
+    assert all(uuid.UUID(v).version == 4 for v in values)
+
+
+def test_generate_should_broadcast_scalars_and_validate_length():
+    assert c.generate({"a": lambda ctx: 1}, _ctx(3))["a"].tolist() == [1, 1, 1]
+    with pytest.raises(ValueError):
+        c.generate({"a": lambda ctx: [1]}, _ctx(3))
@@ -0,0 +1,101 @@
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pyarrow as pa
+import pytest
+
+from lokii import lookup_index as li
+
+
+@pytest.fixture(autouse=True)
+def clear_loaded():
+    yield
+    li._paths.clear()
+    li._loaded.clear()
+
+
+def _build(tmp_path, table: pa.Table, key: str) -> li.LookupIndex:
+    file_path = str(tmp_path / "index" / key)
+    li.build(iter(table.to_batches(3)), key, file_path)
+    li.bind({("t1", key): file_path})
+    return li.LookupIndex("t1", key)
+
+
+def test_build_should_index_unique_non_null_keys(tmp_path):
+    table = pa.table({"id": [5, 6, None, 5], "v": ["a", "b", "c", "d"]})
+    file_path = str(tmp_path / "index" / "id")
+    count, size = li.build(iter(table.to_batches(2)), "id", file_path)
+    assert count == 2 and size > 0
+    assert li.exists(file_path)
+
+
+def test_build_should_allow_concurrent_builds(tmp_path):
+    table = pa.table({"id": list(range(100))})
+    file_path = str(tmp_path / "index" / "id")
+    with ThreadPoolExecutor(4) as executor:
+        futures = [
+            executor.submit(li.build, iter(table.to_batches(10)), "id", file_path)
+            for _ in range(8)
+        ]
+        assert all(f.result()[0] == 100 for f in futures)
+    assert not any(f.endswith(".tmp") for f in os.listdir(tmp_path / "index"))
+
+
+def test_build_should_fail_if_node_is_empty_without_schema(tmp_path):
+    with pytest.raises(ValueError, match="empty"):
+        li.build(iter([]), "id", str(tmp_path / "id"))
+
+
+def test_build_should_build_empty_index_if_node_is_empty(tmp_path):
+    schema = pa.schema([("id", pa.int64()), ("v", pa.string())])
+    file_path = str(tmp_path / "index" / "id")
+    count, _ = li.build(iter([]), "id", file_path, schema)
+    li.bind({("t1", "id"): file_path})
+    index = li.LookupIndex("t1", "id")
+    assert count == 0 and li.exists(file_path)
+    assert index.get(1) is None and 1 not in index
+    assert index.positions([1, 2]).tolist() == [-1, -1]
+    assert index.take([1]).to_pylist() == [{"id": None, "v": None}]
+
+
+def test_build_should_fail_if_keys_are_not_supported(tmp_path):
+    table = pa.table({"id": [1.5, 2.5]})
+    with pytest.raises(ValueError, match="integer or string"):
+        li.build(iter(table.to_batches()), "id", str(tmp_path / "id"))
+
+
+def test_get_should_find_rows_by_integer_key(tmp_path):
+    index = _build(tmp_path, pa.table({"id": [-3, 10, 20], "v": [1, 2, 3]}), "id")
+    assert index.get(10) == {"id": 10, "v": 2}
+    assert index[np.int64(-3)]["v"] == 1
+    assert index.get(11) is None and index.get("10") is None
+    assert 20 in index and 21 not in index
+    with pytest.raises(KeyError):
+        _ = index[21]
+
+
+def test_get_should_find_first_row_of_duplicate_string_keys(tmp_path):
+    table = pa.table({"code": ["a", "b", "a", None], "v": [1, 2, 3, 4]})
+    index = _build(tmp_path, table, "code")
+    assert index["a"]["v"] == 1 and index["b"]["v"] == 2
+    assert index.get("") is None
+
+
+def test_take_should_find_rows_of_many_keys(tmp_path):
+    ids = np.arange(1000) * 7
+    index = _build(tmp_path, pa.table({"id": ids, "v": ids * 2}), "id")
+    keys = np.array([14, 15, 6993, 0])
+    assert index.positions(keys).tolist() == [2, -1, 999, 0]
+    assert index.take(keys).column("v").to_pylist() == [28, None, 13986, 0]
+    assert all(index.position(k) == i for i, k in enumerate(ids))
+
+
+def test_index_should_fail_if_lookup_is_not_built():
+    with pytest.raises(KeyError, match="t2.id"):
+        li.lookup("t2", "id").get(1)
+
+
+def test_lookup_should_return_same_index():
+    assert li.lookup("t1", "id") is li.lookup("t1", "id")
+    assert li.lookup("t1", "id").sources == [("t1", "id")]
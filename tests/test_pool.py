@@ -0,0 +1,84 @@
+import os
+import sys
+import types
+
+import numpy as np
+import pytest
+
+from lokii import pool as p
+from lokii.columns import ColumnContext, generate
+from lokii.config import CONFIG
+
+
+@pytest.fixture(autouse=True)
+def clear_loaded():
+    p._loaded.clear()
+    yield
+    p._loaded.clear()
+
+
+def _generate(calls: list):
+    def gen(n: int) -> list:
+        calls.append(n)
+        return ["v%d" % i for i in range(n)]
+
+    return gen
+
+
+def test_pool_should_generate_values_once_and_store_on_disk():
+    calls = []
+    pool = p.ValuePool("cities", _generate(calls), 5)
+    assert pool.values.to_pylist() == ["v0", "v1", "v2", "v3", "v4"]
+    assert os.path.exists(pool.path)
+    assert pool.path.startswith(CONFIG.pool.dir_path)
+
+    # other processes read stored values without generating them again
+    p._loaded.clear()
+    again = p.ValuePool("cities", _generate(calls), 5)
+    assert again.values.to_pylist() == pool.values.to_pylist()
+    assert calls == [5]
+
+
+def test_pool_key_should_depend_on_size():
+    assert p.ValuePool("a", list, 5).key != p.ValuePool("a", list, 6).key
+    assert p.ValuePool("a", list, 5).key == p.ValuePool("a", list, 5).key
+
+
+def test_sample_should_draw_values_from_pool():
+    pool = p.ValuePool("cities", _generate([]), 5)
+    values = set(pool.values.to_pylist())
+
+    assert pool.sample() in values
+    drawn = pool.sample(100)
+    assert isinstance(drawn, np.ndarray)
+    assert len(drawn) == 100 and set(drawn) <= values
+
+    rng1, rng2 = np.random.default_rng(7), np.random.default_rng(7)
+    assert pool.sample(10, rng1).tolist() == pool.sample(10, rng2).tolist()
+
+
+def test_pool_should_be_column_generator():
+    pool = p.ValuePool("cities", _generate([]), 5)
+    ctx = ColumnContext(20, np.arange(20), rng=np.random.default_rng(1))
+    data = generate({"city": pool}, ctx)
+    assert len(data["city"]) == 20
+
+
+def test_faker_should_generate_pool_with_seeded_provider(mocker):
+    fake = mocker.Mock()
+    fake.city.side_effect = ["c%d" % i for i in range(3)]
+    module = types.ModuleType("faker")
+    module.Faker = mocker.Mock(return_value=fake)
+    mocker.patch.dict(sys.modules, {"faker": module})
+
+    pool = p.faker("city", size=3, locale="tr_TR", seed=5)
+    assert pool.values.to_pylist() == ["c0", "c1", "c2"]
+    module.Faker.assert_called_once_with("tr_TR")
+    fake.seed_instance.assert_called_once_with(5)
+    assert p.faker("city", size=3, locale="en_US").key != pool.key
+
+
+def test_faker_should_fail_without_faker(mocker):
+    mocker.patch.dict(sys.modules, {"faker": None})
+    with pytest.raises(ImportError, match="faker"):
+        p.faker("city", size=3).sample()
@@ -0,0 +1,118 @@
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pytest
+
+from lokii import reference as r
+from lokii.columns import ColumnContext, generate
+
+
+@pytest.fixture(autouse=True)
+def exported(tmp_path):
+    paths = {("t1", "id"): [str(tmp_path / "id.npy")]}
+    paths[("t1", "id", "w")] = [paths[("t1", "id")][0], str(tmp_path / "w.npy")]
+    r.store(np.arange(1, 11), paths[("t1", "id")][0])
+    r.store(np.array([0] * 9 + [1]), paths[("t1", "id", "w")][1])
+    r.bind(paths)
+    yield paths
+    r._paths.clear()
+    r._loaded.clear()
+
+
+def test_store_should_write_memory_mappable_strings(tmp_path):
+    file_path = str(tmp_path / "refs" / "s.npy")
+    r.store(np.array(["a", "bb"], dtype=object), file_path)
+    values = np.load(file_path, mmap_mode="r")
+    assert isinstance(values, np.memmap) and values.tolist() == ["a", "bb"]
+    assert not any(f.endswith(".tmp") for f in os.listdir(tmp_path / "refs"))
+
+
+def test_store_should_allow_concurrent_writers(tmp_path):
+    file_path = str(tmp_path / "refs" / "c.npy")
+    with ThreadPoolExecutor(8) as executor:
+        for f in [
+            executor.submit(r.store, np.arange(1000), file_path) for _ in range(32)
+        ]:
+            f.result()
+    assert np.load(file_path).tolist() == list(range(1000))
+    assert os.listdir(tmp_path / "refs") == ["c.npy"]
+
+
+def test_ref_should_return_same_reference():
+    assert r.ref("t1", "id") is r.ref("t1", "id")
+    assert r.ref("t1", "id") is not r.ref("t1", "id", weights="w")
+
+
+def test_sample_should_draw_parent_values():
+    ref = r.Reference("t1", "id")
+    assert isinstance(ref.values, np.memmap)
+    assert ref.sample() in range(1, 11)
+    values = ref.sample(1000, np.random.default_rng(1))
+    assert len(values) == 1000 and set(values.tolist()) == set(range(1, 11))
+
+
+def test_sample_should_draw_by_weights():
+    ref = r.Reference("t1", "id", weights="w")
+    assert ref.sample() == 10
+    assert set(ref.sample(100).tolist()) == {10}
+
+
+def test_zipf_should_prefer_first_rows():
+    ref = r.Reference("t1", "id")
+    values = ref.zipf(2.0, 10000, np.random.default_rng(1))
+    counts = np.bincount(values)
+    assert counts[1] > counts[2] > counts[5]
+    assert ref.zipf(2.0) in range(1, 11)
+
+
+def test_reference_should_be_column_generator():
+    ctx = ColumnContext(20, np.arange(20), rng=np.random.default_rng(1))
+    data = generate({"owner": r.Reference("t1", "id")}, ctx)
+    assert len(data["owner"]) == 20
+
+
+def test_sample_should_fail_if_reference_is_not_exported():
+    with pytest.raises(KeyError, match="t2.id"):
+        r.Reference("t2", "id").sample()
+    with pytest.raises(KeyError, match="t1.id,x"):
+        r.Reference("t1", "id", weights="x").sample()
+
+
+@pytest.mark.parametrize("weights", [None, "w"])
+def test_sample_should_fail_if_parent_column_is_empty(tmp_path, weights):
+    paths = [str(tmp_path / "e.npy"), str(tmp_path / "ew.npy")]
+    r.store(np.array([], dtype=int), paths[0])
+    r.store(np.array([], dtype=int), paths[1])
+    r.bind({("t2", "id"): paths[:1], ("t2", "id", "w"): paths})
+    ref = r.Reference("t2", "id", weights=weights)
+    for draw in [ref.sample, lambda: ref.sample(5), ref.zipf]:
+        with pytest.raises(ValueError, match="parent node `t2` has no rows"):
+            draw()
+
+
+def test_find_refs_should_find_literal_references():
+    source = """
+import lokii
+from lokii import ref
+
+owners = lokii.ref("employees", "employee_number")
+def item(args):
+    return {"office": ref("offices", column="code", weights="size")}
+dynamic = lokii.ref(name, "id")
+"""
+    assert r.find_refs(source) == [
+        ("employees", "employee_number"),
+        ("offices", "code", "size"),
+    ]
+    assert r.find_refs(source, "lookup", ("table", "key")) == []
+    source = 'customers = lookup("customers", key="id")'
+    assert r.find_refs(source, "lookup", ("table", "key")) == [("customers", "id")]
+
+
+def test_find_refs_should_fail_if_weights_is_not_literal():
+    assert r.find_refs('ref("t1", "id", weights=None)') == [("t1", "id")]
+    with pytest.raises(ValueError, match="`weights` of reference `t1.id`"):
+        r.find_refs('ref("t1", "id", weights=column)')
+    with pytest.raises(ValueError, match="line 2"):
+        r.find_refs('import lokii\nlokii.ref("t1", "id", cfg.weights)')
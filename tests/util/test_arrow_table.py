@@ -0,0 +1,23 @@
+import pyarrow as pa
+import pytest
+
+from lokii.util.arrow_table import to_table, as_table, merge_tables
+
+
+def test_to_table_should_fill_missing_keys_with_nulls():
+    table = to_table([{"a": 1}, {"b": "x"}])
+    assert table.to_pylist() == [{"a": 1, "b": None}, {"a": None, "b": "x"}]
+
+
+def test_as_table_should_raise_error_for_unsupported_types():
+    with pytest.raises(TypeError) as err:
+        as_table([{"a": 1}])
+    assert "Unsupported vectorized result type" in str(err.value)
+
+
+def test_merge_tables_should_unify_columns_and_null_types():
+    t1 = pa.table({"a": [1], "b": [None]})
+    t2 = pa.table({"b": ["x"], "c": [1.5]})
+    merged = merge_tables([t1, pa.table({}), t2])
+    assert merged.column_names == ["a", "b", "c"]
+    assert merged.to_pylist()[1] == {"a": None, "b": "x", "c": 1.5}
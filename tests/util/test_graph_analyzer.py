@@ -23,3 +23,32 @@ def test_execution_order_should_return_run_ids_in_correct_order():
     analyzer = GraphAnalyzer([n1, n2, n3, n4])
     order = analyzer.execution_order()
     assert order == [n3[0], n1[0], n2[0], n4[0]]
+
+
+def test_check_cyclic_should_report_cycle_path():
+    n1, n2, n3, n4 = (("n1", ["n3"]), ("n2", ["n1"]), ("n3", ["n2"]), ("n4", ["n1"]))
+    analyzer = GraphAnalyzer([n1, n2, n3, n4])
+    with pytest.raises(AssertionError) as err:
+        analyzer.check_cyclic()
+    assert "n1 -> n3 -> n2 -> n1" in str(err.value)
+
+
+def test_init_should_raise_error_if_dependency_not_found():
+    with pytest.raises(AssertionError) as err:
+        GraphAnalyzer([("n1", ["n2"])])
+    assert "Dependency `n2` is not found" in str(err.value)
+
+
+def test_levels_should_group_independent_nodes():
+    n1, n2, n3, n4 = (("n1", ["n3"]), ("n2", ["n1", "n3"]), ("n3", []), ("n4", []))
+    analyzer = GraphAnalyzer([n1, n2, n3, n4])
+    assert analyzer.levels() == [["n3", "n4"], ["n1"], ["n2"]]
+
+
+def test_analyzer_should_handle_deep_chains_without_recursion():
+    size = 20000
+    nodes = [("n0", [])] + [("n%d" % i, ["n%d" % (i - 1)]) for i in range(1, size)]
+    analyzer = GraphAnalyzer(nodes[::-1])
+    assert analyzer.execution_order()[0] == "n0"
+    assert len(analyzer.levels()) == size
+    assert len(analyzer.dependencies("n%d" % (size - 1))) == size
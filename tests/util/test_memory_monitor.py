@@ -0,0 +1,30 @@
+from lokii.util.memory_monitor import available_memory, memory_pressure
+
+MEMINFO = (
+    "MemTotal:       16000000 kB\n"
+    "MemFree:          500000 kB\n"
+    "MemAvailable:    8000000 kB\n"
+)
+
+
+def test_available_memory_should_include_reclaimable_cache(tmp_path, mocker):
+    meminfo = tmp_path / "meminfo"
+    meminfo.write_text(MEMINFO)
+    mocker.patch("lokii.util.memory_monitor.MEMINFO_PATH", str(meminfo))
+    assert available_memory() == 8000000 * 1024
+
+
+def test_available_memory_should_fallback_to_free_pages(tmp_path, mocker):
+    mocker.patch("lokii.util.memory_monitor.MEMINFO_PATH", str(tmp_path / "none"))
+    sysconf = mocker.patch("os.sysconf", side_effect=[100, 4096])
+    assert available_memory() == 100 * 4096
+    assert sysconf.call_count == 2
+
+
+def test_memory_pressure_should_not_count_page_cache_as_used(tmp_path, mocker):
+    meminfo = tmp_path / "meminfo"
+    meminfo.write_text(MEMINFO)
+    mocker.patch("lokii.util.memory_monitor.MEMINFO_PATH", str(meminfo))
+    mocker.patch("lokii.util.memory_monitor.total_memory", return_value=16000000 * 1024)
+    assert not memory_pressure(0.1)
+    assert memory_pressure(0.6)
@@ -1,3 +1,4 @@
+import sys
 import pytest
 from typing import Any
 
@@ -29,3 +30,16 @@ def test_load_should_exec_loaded_module(mock_source_file_loader):
     loader = ModuleFileLoader("/test/path/any.py")
     loader.load()
     assert loader.module.conf == {"test_env": {}}
+
+
+def test_load_should_register_modules_with_same_filename_separately(tmp_path):
+    loaders = []
+    for group in ["g1", "g2"]:
+        (tmp_path / group).mkdir()
+        file_path = tmp_path / group / "t1.node.py"
+        file_path.write_text("group = %r\n" % group)
+        loader = ModuleFileLoader(str(file_path))
+        loader.load()
+        loaders.append(loader)
+    assert loaders[0].name != loaders[1].name
+    assert [sys.modules[lo.name].group for lo in loaders] == ["g1", "g2"]
@@ -0,0 +1,27 @@
+import random
+import sys
+
+import numpy as np
+
+from lokii.util.seed import derive_seed, seed_all
+
+
+def test_derive_seed_should_be_stable_for_same_parts():
+    assert derive_seed(1, "n1", 0) == derive_seed(1, "n1", 0)
+    assert derive_seed(1, "n1", 0) != derive_seed(1, "n1", 200)
+    assert derive_seed(1, "n1", 0) != derive_seed(2, "n1", 0)
+    assert 0 <= derive_seed("n1") < 2**64
+
+
+def test_seed_all_should_seed_random_and_numpy():
+    rng = seed_all(derive_seed(1))
+    first = (random.random(), np.random.random(), rng.random())
+    rng = seed_all(derive_seed(1))
+    assert (random.random(), np.random.random(), rng.random()) == first
+
+
+def test_seed_all_should_seed_faker_if_imported(mocker):
+    faker = mocker.MagicMock()
+    mocker.patch.dict(sys.modules, {"faker": faker})
+    seed_all(7)
+    faker.Faker.seed.assert_called_once_with(7)